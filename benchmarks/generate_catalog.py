@@ -0,0 +1,91 @@
+"""Generate a large synthetic recipe catalog from data/Recipes.csv.
+
+    python benchmarks/generate_catalog.py 100000
+    python benchmarks/generate_catalog.py 1000000 --max-steps-chars 200
+
+Every generated recipe is a copy of a real one with a new id, a numbered
+name and a reshuffled ingredient list. Some ingredients get numbered
+variants, so the ingredient vocabulary keeps growing with the catalog like a
+real one would. The output only depends on the row count and the seed.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_CSV = os.path.join(REPO_ROOT, 'data', 'Recipes.csv')
+OUTPUT_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'data')
+
+# Share of ingredients replaced by a numbered variant in generated recipes
+VARIANT_RATE = 0.1
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def generate_rows(count, seed=0, max_steps_chars=0, source=SOURCE_CSV):
+    """Yield `count` synthetic recipe rows (dicts) derived from the source CSV."""
+    with open(source, encoding='utf-8', newline='') as file:
+        base_rows = list(csv.DictReader(file))
+    rng = random.Random(seed)
+    # About one variant per ingredient for every thousand recipes
+    variants = max(1, count // 1000)
+    for number in range(count):
+        base = base_rows[number % len(base_rows)]
+        copy = number // len(base_rows)
+        ingredients = split_list(base['ingredients'])
+        if copy:
+            rng.shuffle(ingredients)
+            ingredients = ingredients[:max(1, round(len(ingredients) * rng.uniform(0.6, 1.0)))]
+            ingredients = [
+                f'{ingredient} {rng.randrange(variants)}' if rng.random() < VARIANT_RATE else ingredient
+                for ingredient in ingredients
+            ]
+        steps = base['steps']
+        if max_steps_chars:
+            steps = steps[:max_steps_chars]
+        yield {
+            'id': str(number + 1),
+            'name': base['name'] if not copy else f"{base['name']} {copy}",
+            'ingredients': ', '.join(sorted(set(ingredients))),
+            'steps': steps,
+            'diet': base['diet'],
+            'meal_type': base['meal_type'],
+        }
+
+
+def write_catalog(path, count, seed=0, max_steps_chars=0):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['id', 'name', 'ingredients', 'steps', 'diet', 'meal_type'])
+        writer.writeheader()
+        writer.writerows(generate_rows(count, seed, max_steps_chars))
+
+
+def default_output(count):
+    return os.path.join(OUTPUT_DIR, f'recipes_{count}.csv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic recipe catalog for benchmarks.")
+    parser.add_argument('count', type=int, nargs='*', default=[10_000, 100_000],
+                        help="Number of recipes, several sizes may be given (default: 10000 100000)")
+    parser.add_argument('-o', '--output', help="Output CSV (only with a single count)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-steps-chars', type=int, default=0,
+                        help="Truncate the steps text to keep very large catalogs small (default: keep it)")
+    args = parser.parse_args()
+    if args.output and len(args.count) > 1:
+        sys.exit("--output can only be used with a single count")
+
+    for count in args.count:
+        path = args.output or default_output(count)
+        write_catalog(path, count, args.seed, args.max_steps_chars)
+        print(f"Wrote {path}: {count} recipes, {os.path.getsize(path)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Concurrent HTTP load driver reporting latency percentiles and throughput.
+
+    python benchmarks/load.py --url http://127.0.0.1:8001 --concurrency 16 --duration 10
+    python benchmarks/load.py --start --csv benchmarks/data/recipes_100000.csv --workers 4
+
+Each client thread keeps its own connection (reconnecting when the server
+closes it) and its own shopping list session, and sends a weighted mix of
+catalog, search and shopping list requests for the given duration. With
+--start the server is launched with serve.py on the given CSV first.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from stats import compare_results, print_table, summarize, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (weight, name, method, path, query, JSON body); '{session}' is replaced per client
+SCENARIO = [
+    (10, 'get_recipes', 'GET', '/get_recipes', {'per_page': 20, 'fields': 'id,name'}, None),
+    (15, 'search_diet', 'GET', '/search_recipes', {'diet': 'vegetarian'}, None),
+    (15, 'search_name', 'GET', '/search_recipes', {'name': 'polévka'}, None),
+    (15, 'search_ingredients', 'GET', '/search_recipes',
+     {'includes_ingredients': 'cibule,máslo', 'excludes_ingredients': 'mléko'}, None),
+    (5, 'search_ranked', 'GET', '/search_recipes', {'name': 'gulsh', 'sort': 'relevance'}, None),
+    (5, 'what_can_i_cook', 'GET', '/what_can_i_cook', {'pantry': 'Cibule,Mléko,Sůl,Vejce', 'limit': 5}, None),
+    (5, 'get_all_ingredients', 'GET', '/get_all_ingredients', {}, None),
+    (10, 'add_ingredients', 'POST', '/sessions/{session}/add_ingredients', {},
+     {'ingredients': ['Mléko', 'Cibule', 'Chléb']}),
+    (10, 'get_shopping_list', 'GET', '/sessions/{session}/get_shopping_list', {}, None),
+    (5, 'remove_ingredients', 'POST', '/sessions/{session}/remove_ingredients', {}, {'ingredients': ['Mléko']}),
+    (5, 'batch', 'POST', '/sessions/{session}/batch', {}, {'operations': [
+        {'op': 'search_recipes', 'params': {'diet': 'vegan', 'fields': 'id,name'}},
+        {'op': 'add_recipes', 'params': {'recipe_ids': ['1']}},
+        {'op': 'get_shopping_list'},
+    ]}),
+]
+
+
+class Client(threading.Thread):
+    """One simulated agent sending requests until the deadline."""
+
+    def __init__(self, number, host, port, deadline, seed):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.deadline = deadline
+        self.session = f'load-{number}'
+        self.random = random.Random(seed + number)
+        self.connection = None
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, method, path, body):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        return response.status
+
+    def run(self):
+        weights = [entry[0] for entry in SCENARIO]
+        while time.monotonic() < self.deadline:
+            _, name, method, path, query, body = self.random.choices(SCENARIO, weights)[0]
+            path = path.format(session=self.session)
+            if query:
+                path = f'{path}?{urlencode(query)}'
+            start = time.perf_counter()
+            try:
+                status = self.request(method, path, body)
+            except (OSError, http.client.HTTPException):
+                self.errors[name] += 1
+                continue
+            self.latencies[name].append(time.perf_counter() - start)
+            if status >= 400:
+                self.errors[name] += 1
+
+
+def start_server(args, port):
+    env = dict(os.environ)
+    if args.csv:
+        env['RECIPES_CSV'] = os.path.abspath(args.csv)
+    if args.workers > 1 and not env.get('SHOPPING_LIST_DB'):
+        # serve.py only runs several workers with shopping lists they all share
+        env['SHOPPING_LIST_DB'] = os.path.join(tempfile.mkdtemp(prefix='load-'), 'shopping_lists.db')
+    # The request log would only slow the server down, keep it out of the terminal
+    log = open(args.server_log, 'ab')
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, 'shopping_list_mcp_server', 'serve.py'),
+         '--port', str(port), '--workers', str(args.workers)],
+        env=env, cwd=REPO_ROOT, stdout=log, stderr=log
+    )
+    log.close()
+    # Loading a large catalog for the first time builds its snapshot, give it time
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit("The server exited during startup")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/get_all_diets')
+            connection.getresponse().read()
+            connection.close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit("The server did not start in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent load against the HTTP API.")
+    parser.add_argument('--url', default='http://127.0.0.1:8001')
+    parser.add_argument('--concurrency', type=int, default=16, help="Client threads (default: 16)")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds to run (default: 10)")
+    parser.add_argument('--warmup', type=float, default=1, help="Seconds of unmeasured load first (default: 1)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', action='store_true', help="Start the server with serve.py first")
+    parser.add_argument('--csv', help="With --start: recipe CSV to serve")
+    parser.add_argument('--workers', type=int, default=2, help="With --start: server worker processes")
+    parser.add_argument('--server-log', default=os.devnull, help="With --start: file for the server's output")
+    parser.add_argument('--startup-timeout', type=float, default=600)
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Baseline results written with --json")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed p99 slowdown against the baseline (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    server = start_server(args, port) if args.start else None
+    try:
+        if args.warmup:
+            warmup = [Client(n, host, port, time.monotonic() + args.warmup, args.seed) for n in range(args.concurrency)]
+            for client in warmup:
+                client.start()
+            for client in warmup:
+                client.join()
+
+        deadline = time.monotonic() + args.duration
+        clients = [Client(n, host, port, deadline, args.seed) for n in range(args.concurrency)]
+        started = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for client in clients:
+        for name, values in client.latencies.items():
+            latencies[name].extend(values)
+        for name, count in client.errors.items():
+            errors[name] += count
+
+    results = {}
+    for name in sorted(latencies):
+        results[name] = dict(summarize(latencies[name]), errors=errors[name])
+    everything = [value for values in latencies.values() for value in values]
+    results['all'] = dict(summarize(everything), errors=sum(errors.values()),
+                          requests_per_second=len(everything) / elapsed)
+
+    print_table(list(results.items()), ['count', 'errors', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'])
+    print(f"{len(everything)} requests in {elapsed:.1f}s with {args.concurrency} clients: "
+          f"{results['all']['requests_per_second']:.0f} req/s")
+    if args.json:
+        write_results(args.json, results)
+    failed = args.compare and compare_results(args.compare, results, 'p99_ms', args.tolerance)
+    if failed or results['all']['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
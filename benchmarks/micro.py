@@ -0,0 +1,162 @@
+"""Micro-benchmarks of catalog loading, searching, serialization and shopping list operations.
+
+    python benchmarks/micro.py --csv benchmarks/data/recipes_100000.csv
+    python benchmarks/micro.py --json after.json --compare before.json
+
+Times every stage in-process, without HTTP, and prints the per-call
+latency of each benchmark. With --compare, benchmarks whose p50 got slower
+than in the baseline by more than --tolerance are reported and the script
+exits with status 1.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'shopping_list_mcp_server'))
+
+from catalog import load_catalog  # noqa: E402
+from compression import compress  # noqa: E402
+from query_cache import normalize_filters  # noqa: E402
+from recipe_index import RecipeIndex  # noqa: E402
+from recipe_json import RecipeFragments, listing  # noqa: E402
+from recipe_loader import fold, load_recipes  # noqa: E402
+from snapshot import file_sha256, write_snapshot  # noqa: E402
+from stats import compare_results, print_table, summarize, write_results  # noqa: E402
+from storage import InMemoryBackend, SQLiteBackend  # noqa: E402
+
+# Every /search_recipes filter alone and in the combinations agents use
+SEARCHES = {
+    'diet': {'diet': 'vegetarian'},
+    'meal_type': {'meal_type': 'hlavní chod'},
+    'name': {'name': 'polévka'},
+    'name_short': {'name': 'po'},
+    'includes': {'includes_ingredients': ['cibule']},
+    'includes_many': {'includes_ingredients': ['cibule', 'máslo', 'sůl']},
+    'excludes': {'excludes_ingredients': ['mléko', 'vejce']},
+    'diet_meal_type': {'diet': 'vegetarian', 'meal_type': 'polévka'},
+    'all_filters': {'diet': 'vegetarian', 'meal_type': 'hlavní chod', 'name': 'a',
+                    'includes_ingredients': ['cibule'], 'excludes_ingredients': ['maso']},
+}
+
+RANKED_SEARCHES = {
+    'name_typo': {'name': 'gulsh'},
+    'ingredients_typo': {'includes_ingredients': ['cibul', 'mlekko', 'brambory']},
+}
+
+PANTRY = ['Cibule', 'Mléko', 'Sůl', 'Vejce', 'Máslo', 'Hladká mouka', 'Brambory']
+
+SHOPPING_ITEMS = [f'Položka {number}' for number in range(20)]
+
+
+def measure(function, repeat):
+    """Call `function` `repeat` times and return the duration of every call."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def bench_loading(csv_path, temp_dir, repeat):
+    results = {}
+    results['load_recipes'] = measure(lambda: load_recipes(csv_path), repeat)
+    store = load_recipes(csv_path)
+    results['index_build'] = measure(lambda: RecipeIndex.build(store), repeat)
+    index = RecipeIndex.build(store)
+    snapshot_path = os.path.join(temp_dir, 'recipes.snapshot')
+    digest = file_sha256(csv_path)
+    results['snapshot_write'] = measure(lambda: write_snapshot(snapshot_path, store, index, digest), repeat)
+    results['snapshot_load'] = measure(lambda: load_catalog(csv_path, snapshot_path), repeat)
+    return results, load_catalog(csv_path, snapshot_path)
+
+
+def bench_search(catalog, repeat):
+    results = {}
+    for name, filters in SEARCHES.items():
+        normalized = normalize_filters(**filters)
+        results[f'search_{name}'] = measure(lambda: catalog.index.search(*normalized), repeat)
+    for name, filters in RANKED_SEARCHES.items():
+        normalized = normalize_filters(**filters)
+        results[f'rank_{name}'] = measure(lambda: catalog.index.rank(*normalized, limit=10), repeat)
+    rows = sorted({catalog.index.ingredient_row(fold(item)) for item in PANTRY} - {None})
+    results['pantry_coverage'] = measure(lambda: catalog.index.pantry_coverage(rows, 10), repeat)
+    return results
+
+
+def bench_serialization(catalog, repeat, per_page=100):
+    """Encode a page of full recipes as JSON: per request from dicts, and from pre-encoded fragments."""
+    store = catalog.store
+    positions = range(min(per_page, len(store)))
+    results = {}
+    results['serialize_dicts'] = measure(
+        lambda: json.dumps({'recipes': [store.recipe(position) for position in positions]}).encode(), repeat)
+    fragments = RecipeFragments(store)
+    page = listing(fragments.recipe(position) for position in positions)
+    results['serialize_fragments'] = measure(
+        lambda: listing(fragments.recipe(position) for position in positions), repeat)
+    results['compress_gzip'] = measure(lambda: compress(page, 'gzip'), repeat)
+    return results
+
+
+def bench_shopping_list(backend, label, repeat):
+    results = {}
+    counter = iter(range(10 ** 9))
+
+    def add():
+        backend.add(f'bench-{next(counter)}', SHOPPING_ITEMS)
+
+    results[f'{label}_add'] = measure(add, repeat)
+    backend.add('bench', SHOPPING_ITEMS)
+    results[f'{label}_items'] = measure(lambda: backend.items('bench'), repeat)
+
+    def add_remove():
+        backend.remove('bench', SHOPPING_ITEMS[:5])
+        backend.add('bench', SHOPPING_ITEMS[:5])
+
+    results[f'{label}_remove_add'] = measure(add_remove, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the in-process micro-benchmarks.")
+    parser.add_argument('--csv', default=os.path.join(REPO_ROOT, 'data', 'Recipes.csv'),
+                        help="Recipe CSV to benchmark with (default: data/Recipes.csv)")
+    parser.add_argument('--repeat', type=int, default=50, help="Calls per query benchmark (default: 50)")
+    parser.add_argument('--load-repeat', type=int, default=3, help="Calls per loading benchmark (default: 3)")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Baseline results written with --json")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed p50 slowdown against the baseline (default: 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        durations, catalog = bench_loading(os.path.abspath(args.csv), temp_dir, args.load_repeat)
+        print(f"Catalog: {len(catalog.store)} recipes, {len(catalog.store.ingredient_vocab)} ingredients")
+        durations.update(bench_search(catalog, args.repeat))
+        durations.update(bench_serialization(catalog, args.repeat))
+        durations.update(bench_shopping_list(InMemoryBackend(), 'memory', args.repeat))
+        sqlite_backend = SQLiteBackend(os.path.join(temp_dir, 'shopping_lists.db'))
+        try:
+            durations.update(bench_shopping_list(sqlite_backend, 'sqlite', args.repeat))
+        finally:
+            sqlite_backend.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+    results = {name: summarize(values) for name, values in durations.items()}
+    print_table(list(results.items()), ['count', 'p50_ms', 'p99_ms', 'mean_ms', 'min_ms'])
+    if args.json:
+        write_results(args.json, results)
+    if args.compare and compare_results(args.compare, results, 'p50_ms', args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Timing statistics shared by the benchmark scripts."""
+import json
+import math
+
+
+def percentile(sorted_values, fraction):
+    """Return the value below which `fraction` of the sorted values lie (nearest rank)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(durations):
+    """Summarize durations in seconds as milliseconds."""
+    values = sorted(durations)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': sum(values) / len(values) * 1000,
+        'min_ms': values[0] * 1000,
+        'p50_ms': percentile(values, 0.50) * 1000,
+        'p90_ms': percentile(values, 0.90) * 1000,
+        'p99_ms': percentile(values, 0.99) * 1000,
+        'max_ms': values[-1] * 1000,
+    }
+
+
+def print_table(rows, columns):
+    """Print result rows (name, summary dict) as an aligned table."""
+    width = max([len('benchmark')] + [len(name) for name, _ in rows])
+    print(f"{'benchmark':<{width}}  " + '  '.join(f'{column:>10}' for column in columns))
+    for name, summary in rows:
+        cells = []
+        for column in columns:
+            value = summary.get(column)
+            cells.append(f'{value:>10.3f}' if isinstance(value, float) else f'{value!s:>10}')
+        print(f'{name:<{width}}  ' + '  '.join(cells))
+
+
+def write_results(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+
+def compare_results(baseline_path, results, metric, tolerance):
+    """Print benchmarks whose `metric` got worse than the baseline by more than `tolerance`.
+
+    Returns the number of regressions.
+    """
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = json.load(file)
+    regressions = 0
+    for name, summary in results.items():
+        before = baseline.get(name, {}).get(metric)
+        after = summary.get(metric)
+        if not before or after is None:
+            continue
+        change = after / before - 1
+        if change > tolerance:
+            regressions += 1
+            print(f"REGRESSION {name}: {metric} {before:.3f} -> {after:.3f} ({change:+.0%})")
+    return regressions
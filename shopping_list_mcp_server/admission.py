@@ -0,0 +1,98 @@
+"""Admission control: per-client rate limits and a bounded queue for expensive work.
+
+RateLimiter gives every client a token bucket; a request finding its bucket
+empty is turned away (429) with the time until the next token. WorkQueue
+caps how many expensive requests run at once: the rest wait in a bounded
+queue for a limited time and are shed (503) beyond that, so a burst of heavy
+searches can't occupy every thread while cheap calls, which never queue,
+keep being served. Both are per process.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """A request was shed; `retry_after` suggests when to try again, in seconds."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token buckets per client, refilled at `rate` tokens per second up to `burst`.
+
+    Only the `max_clients` most recently seen clients are tracked; a client
+    forgotten in between starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst=None, max_clients=10_000):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.max_clients = max_clients
+        # client -> [tokens, time of the last update]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client, cost=1, now=None):
+        """Take `cost` tokens from the client's bucket; return 0 if it had them, else the seconds to wait."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0
+            return (cost - bucket[0]) / self.rate
+
+
+class WorkQueue:
+    """Lets at most `concurrency` requests run at once and `max_waiting` more wait up to `timeout` seconds.
+
+    `kind` names the requests in the messages of shed requests.
+    """
+
+    def __init__(self, concurrency, max_waiting, timeout, kind='expensive requests'):
+        self.concurrency = concurrency
+        self.kind = kind
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.waiting = 0
+        self.running = 0
+        self._slots = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the duration of the block; raises Overloaded if none frees up in time."""
+        if not self._slots.acquire(blocking=False):
+            retry_after = max(1, math.ceil(self.timeout))
+            with self._lock:
+                if self.waiting >= self.max_waiting:
+                    raise Overloaded(f"Server is busy with {self.kind}, try again later", retry_after)
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                raise Overloaded(f"Timed out waiting for a slot among {self.kind}, try again later", retry_after)
+        with self._lock:
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+            self._slots.release()
@@ -0,0 +1,142 @@
+"""ASGI entry point exposing the Flask app to asyncio servers.
+
+Run it with any ASGI server, for example:
+
+    cd shopping_list_mcp_server && uvicorn asgi:app --port 8001
+
+The event loop only accepts connections and shuttles bytes; each request runs
+the unchanged Flask routes on a bounded thread pool, so slow requests never
+block the loop and all routes and JSON contracts stay the same. When the
+client disconnects, the request's `asgi.disconnected` environ event is set and
+the response iterator is closed, so long-polls and change streams give their
+thread back instead of waiting for their timeout.
+"""
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from server import app as flask_app
+
+# Threads running Flask handlers, per process
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+
+
+class WsgiToAsgi:
+    """Minimal adapter running a WSGI application under ASGI."""
+
+    def __init__(self, wsgi_app, max_workers=ASGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asgi-worker')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise RuntimeError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        environ = self._environ(scope, bytes(body))
+        disconnected = environ['asgi.disconnected'] = threading.Event()
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self._run_wsgi, loop, environ, send)
+        finally:
+            # Also stops the handler if the server cancelled this call while it runs
+            disconnected.set()
+            watcher.cancel()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _run_wsgi(self, loop, environ, send):
+        """Run the WSGI app in a worker thread, streaming its output to the loop."""
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start['status'] = int(status.split(' ', 1)[0])
+            response_start['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+            return lambda data: None
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            started = False
+            for chunk in result:
+                if environ['asgi.disconnected'].is_set():
+                    # Nobody is listening any more; closing the iterator ends the response
+                    return
+                if not started:
+                    send_from_thread(dict(response_start, type='http.response.start'))
+                    started = True
+                if chunk:
+                    send_from_thread({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                send_from_thread(dict(response_start, type='http.response.start'))
+            send_from_thread({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    @staticmethod
+    def _environ(scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+app = WsgiToAsgi(flask_app)
@@ -0,0 +1,280 @@
+"""The live recipe catalog and its reloading.
+
+A Catalog is one immutable generation of recipes together with its search
+index. Request handlers grab `CatalogManager.current` once and use that
+generation for the whole request; a reload builds the next generation off to
+the side and publishes it with a single reference swap, so requests never
+see a half-updated catalog and serving never stops.
+
+The catalog path is a CSV file, or a directory or manifest of CSV files that
+are parsed in parallel and merged into one catalog (see resolve_sources).
+"""
+import os
+import threading
+import time
+
+from recipe_loader import (IngestReport, RecipeStore, fold, load_sources, resolve_data_path, resolve_sources,
+                           source_name)
+from recipe_index import RecipeIndex
+from recipe_json import RecipeFragments
+from snapshot import SnapshotError, read_snapshot, snapshot_path_for, sources_sha256, write_snapshot
+
+
+class Catalog:
+    """One generation of the recipe catalog."""
+
+    def __init__(self, store, index, digest=b'', report=None):
+        self.store = store
+        self.index = index
+        self.digest = digest
+        # Identifies the generation, stable across processes loading the same CSV
+        self.version = digest.hex()[:16]
+        self.report = report or IngestReport().to_dict()
+        # Cache all unique ingredients and diet types for fast lookup
+        self.all_ingredients = set(store.ingredient_vocab.terms)
+        self.all_diet_types = set(store.diet_vocab.terms)
+        self._positions = None
+        self._name_positions = None
+        self._memory_usage = None
+        # Recipes encoded as JSON once per generation
+        self.fragments = RecipeFragments(store)
+        # Seconds spent in each phase of loading this generation
+        self.load_timings = {}
+
+    def memory_usage(self):
+        """Approximate bytes held by the recipe store, computed once per generation."""
+        if self._memory_usage is None:
+            self._memory_usage = self.store.memory_usage()
+        return self._memory_usage
+
+    def position_of(self, recipe_id):
+        """Return the position of the recipe with the given id, or None."""
+        if self._positions is None:
+            self._positions = {rid: position for position, rid in enumerate(self.store.ids)}
+        return self._positions.get(recipe_id)
+
+    def position_of_name(self, name):
+        """Return the position of the recipe with the given name (ignoring case and accents), or None."""
+        if self._name_positions is None:
+            name_positions = {}
+            for position, recipe_name in enumerate(self.store.names):
+                name_positions.setdefault(fold(recipe_name), position)
+            self._name_positions = name_positions
+        return self._name_positions.get(fold(name.strip()))
+
+    def ingredients_of(self, positions):
+        """Return the sorted union of the ingredients of the recipes at the given positions."""
+        ingredient_ids = set()
+        for position in positions:
+            ingredient_ids.update(self.store.ingredient_ids_of(position))
+        terms = self.store.ingredient_vocab.terms
+        return sorted(terms[ingredient_id] for ingredient_id in ingredient_ids)
+
+
+def load_catalog(csv_path, snapshot_path=None, workers=None):
+    """Return the Catalog for the CSV(s), mapping its snapshot when it is current.
+
+    The snapshot is rebuilt whenever the SHA-256 of the sources no longer
+    matches the one recorded in it. If the snapshot cannot be written the
+    catalog is served from memory. `workers` caps the processes parsing
+    several sources. The seconds spent in each loading phase are kept in the
+    catalog's `load_timings`.
+    """
+    timings = {}
+    start = time.perf_counter()
+    snapshot_path = snapshot_path or snapshot_path_for(resolve_data_path(csv_path))
+    try:
+        sources, missing, digest = _hash_sources(csv_path)
+    except OSError as e:
+        # The directory or manifest itself can't be read, serve an empty catalog
+        print(f"Error loading recipes: {e}")
+        report = IngestReport()
+        report.reject(None, None, f"Unreadable source: {e}", source_name(resolve_data_path(csv_path)))
+        return empty_catalog(report)
+    timings['hash_csv'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        store, index, meta = read_snapshot(snapshot_path, expected_digest=digest)
+    except (OSError, SnapshotError):
+        return _build_catalog(sources, snapshot_path, digest, timings, workers, missing)
+    timings['map_snapshot'] = time.perf_counter() - start
+    catalog = Catalog(store, index, digest, meta)
+    catalog.load_timings = timings
+    return catalog
+
+
+def empty_catalog(report=None):
+    """A catalog without recipes."""
+    store = RecipeStore()
+    return Catalog(store, RecipeIndex.build(store), report=report.to_dict() if report else None)
+
+
+def _hash_sources(csv_path):
+    """Return the catalog's existing source files, the missing ones and the digest of the existing ones.
+
+    Raises OSError if the directory or manifest can't be read.
+    """
+    sources = resolve_sources(csv_path)
+    existing = [path for path in sources if os.path.isfile(path)]
+    missing = [path for path in sources if not os.path.isfile(path)]
+    return existing, missing, sources_sha256(existing)
+
+
+def _build_catalog(sources, snapshot_path, digest, timings=None, workers=None, missing=()):
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    report = IngestReport()
+    for path in missing:
+        print(f"Recipe source not found: {path}")
+        report.reject(None, None, "Source file not found", source_name(path))
+    store = load_sources(sources, report, workers)
+    timings['parse_csv'] = time.perf_counter() - start
+    start = time.perf_counter()
+    index = RecipeIndex.build(store)
+    timings['build_index'] = time.perf_counter() - start
+    catalog = None
+    if len(store):
+        start = time.perf_counter()
+        try:
+            write_snapshot(snapshot_path, store, index, digest, report.to_dict())
+            store, index, meta = read_snapshot(snapshot_path, expected_digest=digest)
+            catalog = Catalog(store, index, digest, meta)
+        except (OSError, TypeError, ValueError, SnapshotError) as e:
+            print(f"Error writing recipe snapshot: {e}")
+        timings['write_snapshot'] = time.perf_counter() - start
+    if catalog is None:
+        catalog = Catalog(store, index, digest, report.to_dict())
+    catalog.load_timings = timings
+    return catalog
+
+
+def diff_catalogs(old, new):
+    """Count recipes added, removed and changed between two generations, matched by id.
+
+    Recipes are compared field by field on the stores' columns: list fields
+    by their terms, steps as encoded bytes, so no recipe is materialized.
+    """
+    added = changed = 0
+    new_ids = set()
+    # new term id -> old term id, per vocabulary
+    term_maps = ({}, {}, {})
+    for position, recipe_id in enumerate(new.store.ids):
+        new_ids.add(recipe_id)
+        old_position = old.position_of(recipe_id)
+        if old_position is None:
+            added += 1
+        elif not _same_recipe(old.store, old_position, new.store, position, term_maps):
+            changed += 1
+    removed = sum(1 for recipe_id in old.store.ids if recipe_id not in new_ids)
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def _same_recipe(old, old_position, new, position, term_maps):
+    if old.names[old_position] != new.names[position]:
+        return False
+    for (old_ids_of, new_ids_of, old_vocab, new_vocab), term_map in zip((
+        (old.ingredient_ids_of, new.ingredient_ids_of, old.ingredient_vocab, new.ingredient_vocab),
+        (old.diet_ids_of, new.diet_ids_of, old.diet_vocab, new.diet_vocab),
+        (old.meal_type_ids_of, new.meal_type_ids_of, old.meal_type_vocab, new.meal_type_vocab),
+    ), term_maps):
+        old_ids, new_ids = old_ids_of(old_position), new_ids_of(position)
+        if len(old_ids) != len(new_ids):
+            return False
+        for old_id, new_id in zip(old_ids, new_ids):
+            if new_id not in term_map:
+                term_map[new_id] = old_vocab.ids.get(new_vocab.terms[new_id])
+            if term_map[new_id] != old_id:
+                return False
+    old_steps = old.steps_blob[old.steps_offsets[old_position]:old.steps_offsets[old_position + 1]]
+    new_steps = new.steps_blob[new.steps_offsets[position]:new.steps_offsets[position + 1]]
+    return old_steps == new_steps
+
+
+class CatalogManager:
+    """Holds the current Catalog and swaps in new generations on reload.
+
+    With `load=False` it starts from an empty catalog until the first reload.
+    """
+
+    def __init__(self, csv_path, snapshot_path=None, workers=None, load=True):
+        self.csv_path = csv_path
+        self.snapshot_path = snapshot_path or snapshot_path_for(resolve_data_path(csv_path))
+        self.workers = workers
+        self.current = load_catalog(csv_path, self.snapshot_path, workers) if load else empty_catalog()
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+
+    def on_reload(self, callback):
+        """Register `callback(catalog)` to run after a new generation is published."""
+        self._listeners.append(callback)
+
+    def reload(self):
+        """Re-read the CSV(s) and publish the catalog if anything changed.
+
+        The new generation is parsed, indexed and snapshotted in the calling
+        thread; meanwhile every other thread keeps serving the current one.
+        Returns a summary dict. A CSV that can't be read or yields no valid
+        rows never replaces a non-empty catalog.
+        """
+        with self._reload_lock:
+            current = self.current
+            try:
+                sources, missing, digest = _hash_sources(self.csv_path)
+            except OSError as e:
+                return {'reloaded': False, 'version': current.version, 'error': str(e)}
+            if digest == current.digest:
+                return {'reloaded': False, 'version': current.version, 'report': current.report}
+
+            try:
+                # Another process (e.g. a sibling worker) may have built this generation already
+                store, index, meta = read_snapshot(self.snapshot_path, expected_digest=digest)
+                candidate = Catalog(store, index, digest, meta)
+            except (OSError, SnapshotError):
+                candidate = _build_catalog(sources, self.snapshot_path, digest, workers=self.workers,
+                                           missing=missing)
+            if not len(candidate.store) and len(current.store):
+                return {'reloaded': False, 'version': current.version, 'report': candidate.report,
+                        'error': "No valid recipes in the new CSV, keeping the current catalog"}
+
+            changes = diff_catalogs(current, candidate)
+            self.current = candidate
+            for callback in self._listeners:
+                callback(candidate)
+            return {'reloaded': True, 'version': candidate.version, 'changes': changes,
+                    'report': candidate.report}
+
+    def watch(self, interval):
+        """Poll the sources' modification times every `interval` seconds and reload on change."""
+        # A watcher inherited through fork is not running in this process
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        def poll():
+            last_mtime = _mtime(self.csv_path)
+            while True:
+                time.sleep(interval)
+                mtime = _mtime(self.csv_path)
+                if mtime != last_mtime:
+                    last_mtime = mtime
+                    result = self.reload()
+                    if result['reloaded']:
+                        print(f"Reloaded recipes: {result['changes']}")
+
+        self._watcher = threading.Thread(target=poll, name='catalog-watcher', daemon=True)
+        self._watcher.start()
+
+
+def _mtime(csv_path):
+    """Modification times of the catalog path and all of its sources."""
+    try:
+        paths = [resolve_data_path(csv_path)] + resolve_sources(csv_path)
+    except OSError:
+        return None
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return mtimes
@@ -0,0 +1,39 @@
+"""Response compression negotiated with the client's Accept-Encoding.
+
+gzip is always available; brotli is preferred when the `brotli` package is
+installed. Bodies compressed per request use fast levels; bodies that are
+cached for a whole catalog version are compressed once with the best ones.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies aren't worth the CPU and the header overhead
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain')
+
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+CACHED_GZIP_LEVEL = 9
+CACHED_BROTLI_QUALITY = 11
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings):
+    """Return the best supported encoding in a werkzeug Accept header, or None to send the body as is."""
+    return accept_encodings.best_match(supported_encodings())
+
+
+def compress(body, encoding, cached=False):
+    """Compress `body`; with `cached` as small as possible, for bodies compressed only once."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=CACHED_BROTLI_QUALITY if cached else BROTLI_QUALITY)
+    # A fixed mtime keeps the output, and ETags derived from it, identical across workers
+    return gzip.compress(body, compresslevel=CACHED_GZIP_LEVEL if cached else GZIP_LEVEL, mtime=0)
@@ -0,0 +1,256 @@
+"""Lightweight in-process metrics exposed in the Prometheus text format.
+
+Histograms and counters are updated on the request path, so they only take
+a lock and bump a few numbers. Gauges are callbacks evaluated when /metrics
+is scraped. Every worker process keeps its own metrics; scrape each worker
+(or aggregate them in Prometheus) when running several.
+
+The Profiler runs a sampled fraction of requests under cProfile and merges
+their statistics, so the hot functions of a live server can be inspected
+without restarting it.
+"""
+import cProfile
+import io
+import math
+import os
+import pstats
+import random
+import resource
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Upper bounds of the candidate count histogram buckets
+COUNT_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def process_memory_bytes():
+    """Return the resident memory of this process, or its peak where the current value is unavailable."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # One count per bucket plus +Inf, then the sum
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def snapshot(self):
+        """Return {label values: (bucket counts, sum)} for all series."""
+        with self._lock:
+            return {labels: (series[:-1], series[-1]) for labels, series in self._series.items()}
+
+    def render(self):
+        lines = []
+        for label_values, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, label_values, [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonically increasing count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}'
+                for labels, value in values]
+
+
+class Gauge:
+    """Value read from a callback at scrape time.
+
+    The callback returns a number, or a dict mapping label value tuples to
+    numbers for a gauge with labels.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, read, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.label_names = tuple(label_names)
+
+    def render(self):
+        value = self.read()
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(number)}'
+                for labels, number in sorted(values) if number is not None]
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together for /metrics."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, read, label_names=()):
+        return self._register(Gauge(name, help_text, read, label_names))
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.render()
+            except Exception as e:
+                print(f"Error reading metric {metric.name}: {e}")
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+# Held while a request is profiled. Since Python 3.12 only one cProfile profile
+# may be active in the whole process, so sampled requests are profiled one at a time
+_profiling = threading.Lock()
+
+
+class Profiler:
+    """Profiles a random sample of requests with cProfile and aggregates the results.
+
+    Disabled while `sample_rate` is 0. At most one request per process is
+    profiled at a time; sampled requests arriving meanwhile run unprofiled.
+    Requests nested in a profiled request (batch operations) are part of the
+    outer profile.
+    """
+
+    def __init__(self, sample_rate=0.0):
+        self.sample_rate = sample_rate
+        self.profiled = 0
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def configure(self, sample_rate=None, reset=False):
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        if reset:
+            with self._lock:
+                self._stats = None
+                self.profiled = 0
+
+    def start(self):
+        """Start profiling the current request if it is sampled; return the profile or None."""
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return None
+        if not _profiling.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool (e.g. a debugger) is active in this process
+            _profiling.release()
+            return None
+        return profile
+
+    def stop(self, profile):
+        profile.disable()
+        _profiling.release()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.profiled += 1
+
+    def report(self, sort='cumulative', limit=30):
+        """Return the aggregated statistics as text."""
+        with self._lock:
+            if self._stats is None:
+                return "No requests profiled yet\n"
+            output = io.StringIO()
+            self._stats.stream = output
+            self._stats.sort_stats(sort).print_stats(limit)
+            return f"{self.profiled} requests profiled\n" + output.getvalue()
@@ -0,0 +1,72 @@
+import base64
+import json
+from bisect import bisect_right
+
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 100
+
+
+class CursorError(ValueError):
+    """Raised for a cursor token that is malformed or from another catalog version."""
+
+
+def encode_cursor(version, position):
+    """Opaque token pointing just after the recipe at `position` in catalog order."""
+    payload = json.dumps({'v': version, 'p': position}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, version):
+    """Return the position encoded in `token`, checking it belongs to `version`."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        cursor_version, position = payload['v'], payload['p']
+    except (ValueError, TypeError, KeyError):
+        raise CursorError("Invalid cursor")
+    if cursor_version != version or not isinstance(position, int):
+        raise CursorError("Cursor is no longer valid because the recipe catalog changed, start again from the first page")
+    return position
+
+
+def clamp_per_page(per_page):
+    """Keep a requested page size within 1..MAX_PER_PAGE."""
+    if per_page is None:
+        return DEFAULT_PER_PAGE
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def paginate(positions, version, page=1, per_page=DEFAULT_PER_PAGE, cursor=None):
+    """Select one page from sorted recipe positions.
+
+    With a cursor the page starts right after the recipe it points to, found
+    by binary search, so it stays correct however the earlier pages were
+    sized. Otherwise `page` is used as a 1-based page number.
+
+    Returns the positions on the page and the pagination info for the response.
+    """
+    total = len(positions)
+    if cursor is not None:
+        start_index = bisect_right(positions, decode_cursor(cursor, version))
+        page = start_index // per_page + 1
+    else:
+        start_index = (page - 1) * per_page
+    end_index = start_index + per_page
+    page_positions = positions[start_index:end_index]
+
+    # Calculate pagination info
+    total_pages = (total + per_page - 1) // per_page  # Ceiling division
+    has_next = end_index < total if cursor is not None else page < total_pages
+    has_prev = start_index > 0 if cursor is not None else page > 1
+    next_cursor = None
+    if has_next and len(page_positions):
+        next_cursor = encode_cursor(version, page_positions[-1])
+
+    return page_positions, {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "total_pages": total_pages,
+        "has_next": has_next,
+        "has_prev": has_prev,
+        "next_cursor": next_cursor
+    }
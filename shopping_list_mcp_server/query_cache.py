@@ -0,0 +1,93 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+from recipe_loader import fold
+
+
+def normalize_filters(diet=None, meal_type=None, name=None,
+                      includes_ingredients=None, excludes_ingredients=None):
+    """Canonical, hashable form of /search_recipes filters.
+
+    Case, diacritics and the order or repetition of ingredient fragments
+    don't change the result, so they don't change the key either. This is
+    where a query's strings get folded, once per request. An empty ingredient list is
+    kept distinct from no list at all because it still filters.
+    """
+    return (
+        fold(diet) if diet else None,
+        fold(meal_type) if meal_type else None,
+        fold(name) if name else None,
+        frozenset(map(fold, includes_ingredients)) if includes_ingredients is not None else None,
+        frozenset(map(fold, excludes_ingredients)) if excludes_ingredients is not None else None
+    )
+
+
+class QueryCache:
+    """Bounded LRU cache mapping normalized search filters to matching recipe positions.
+
+    Both the number of entries and the total number of cached positions are
+    capped; the least recently used results are evicted first. Positions are
+    stored as compact `array('I')` so any page can be sliced from them.
+    """
+
+    def __init__(self, max_entries=1024, max_positions=2_000_000):
+        self.max_entries = max_entries
+        self.max_positions = max_positions
+        self._entries = OrderedDict()
+        self._positions = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached positions for `key`, or None on a miss."""
+        with self._lock:
+            positions = self._entries.get(key)
+            if positions is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return positions
+
+    def put(self, key, positions):
+        """Cache `positions` (a sorted sequence of ints) and return them as an array."""
+        positions = array('I', positions)
+        if len(positions) > self.max_positions:
+            return positions
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._positions -= len(previous)
+            self._entries[key] = positions
+            self._positions += len(positions)
+            while len(self._entries) > self.max_entries or self._positions > self.max_positions:
+                _, evicted = self._entries.popitem(last=False)
+                self._positions -= len(evicted)
+                self.evictions += 1
+        return positions
+
+    def get_or_compute(self, key, compute):
+        positions = self.get(key)
+        if positions is None:
+            positions = self.put(key, compute())
+        return positions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._positions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'positions': self._positions,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,628 @@
+import heapq
+import time
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+
+from recipe_loader import fold, fold_tokens
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, pantry coverage then counts in pure Python
+    numpy = None
+
+# Length of the n-grams used to answer substring queries
+NGRAM_SIZE = 3
+
+# Separator between terms in the text blob scanned for short fragments
+TERM_SEPARATOR = '\0'
+
+# Words less similar than this (Dice coefficient of their trigrams) are not a fuzzy match
+MIN_SIMILARITY = 0.4
+
+# Share of the name match and the ingredient coverage in the ranked score
+NAME_WEIGHT = 0.5
+INGREDIENT_WEIGHT = 0.5
+
+
+def ngrams(text, size=NGRAM_SIZE):
+    """Return the set of all substrings of the given length."""
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def word_ngrams(word):
+    """Return the trigrams of a word padded with spaces, so its start and end count too."""
+    return ngrams(f' {word} ')
+
+
+class DeadlineExceeded(Exception):
+    """A query ran past the deadline of its StageTimings."""
+
+
+class StageTimings:
+    """Records how long each stage of one query took and how many candidates it produced.
+
+    Pass one as `stages` to RecipeIndex.search or rank; every stage is then
+    appended as a (stage, seconds, candidates) tuple to `stages`. With a
+    `deadline` (a time.perf_counter() value) the query is abandoned with
+    DeadlineExceeded at the first stage boundary past it.
+    """
+    __slots__ = ('stages', 'deadline', '_last')
+
+    def __init__(self, deadline=None):
+        self.stages = []
+        self.deadline = deadline
+        self._last = time.perf_counter()
+
+    def lap(self, stage, candidates):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last, candidates))
+        self._last = now
+        if self.deadline is not None and now > self.deadline:
+            raise DeadlineExceeded(f"Query exceeded its deadline after stage {stage}")
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has passed, within a stage."""
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise DeadlineExceeded("Query exceeded its deadline")
+
+
+class PostingLists:
+    """Sorted integer lists stored back to back in two flat arrays (CSR layout).
+
+    The arrays are plain `array('I')` objects when built in memory and
+    memoryviews over the mapped file when loaded from a snapshot.
+    """
+    __slots__ = ('offsets', 'values')
+
+    def __init__(self, offsets=None, values=None):
+        self.offsets = array('I', [0]) if offsets is None else offsets
+        self.values = array('I') if values is None else values
+
+    @classmethod
+    def from_sets(cls, sets):
+        postings = cls()
+        for items in sets:
+            postings.values.extend(sorted(items))
+            postings.offsets.append(len(postings.values))
+        return postings
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+
+def _prefixes_distinct_tokens(words, tokens):
+    """Whether every word starts a different one of the tokens.
+
+    The tokens starting two words are either nested (one word is a prefix of
+    the other) or disjoint, so giving the longest words their token first
+    never takes one a shorter word needed.
+    """
+    free = list(tokens)
+    for word in sorted(words, key=len, reverse=True):
+        for i, token in enumerate(free):
+            if token.startswith(word):
+                del free[i]
+                break
+        else:
+            return False
+    return True
+
+
+class SubstringIndex:
+    """Answers "fragment in text" queries over a vocabulary of folded strings.
+
+    Every distinct folded string is stored once together with the posting
+    list of recipe positions it belongs to. An n-gram index over the vocabulary
+    narrows a query down to a few candidate terms which are then verified
+    directly; fragments shorter than an n-gram are located with a single
+    scan over the joined vocabulary text.
+
+    Name searches also let a fragment of several words match terms that
+    contain a different word starting with each of them, in any order
+    ("kur paprik" finds "kureci paprikas").
+    """
+
+    def __init__(self, terms, postings, gram_keys, gram_postings):
+        self.terms = terms
+        self.postings = postings
+        self.gram_keys = gram_keys
+        self.gram_rows = {gram: row for row, gram in enumerate(gram_keys)}
+        self.gram_postings = gram_postings
+        self._scan_text = None
+        self._tokens = None
+        self._words = None
+
+    @classmethod
+    def build(cls, terms, position_sets):
+        """Build the index from folded terms and their recipe position sets."""
+        grams = defaultdict(set)
+        for term_id, term in enumerate(terms):
+            for gram in ngrams(term):
+                grams[gram].add(term_id)
+        gram_keys = list(grams)
+        return cls(
+            terms,
+            PostingLists.from_sets(position_sets),
+            gram_keys,
+            PostingLists.from_sets(grams[gram] for gram in gram_keys)
+        )
+
+    def _joined_text(self):
+        """The vocabulary joined into one text, with the offset each term starts at.
+
+        Built on the first short query and published in one assignment, so
+        concurrent first queries never see the text without its offsets.
+        """
+        if self._scan_text is None:
+            offsets, start = [], 0
+            for term in self.terms:
+                offsets.append(start)
+                start += len(term) + 1
+            self._scan_text = (TERM_SEPARATOR.join(self.terms), offsets)
+        return self._scan_text
+
+    def _scan_terms(self, fragment):
+        """Find terms containing the fragment by scanning the joined vocabulary."""
+        text, offsets = self._joined_text()
+        if TERM_SEPARATOR in fragment:
+            return []
+        term_ids = []
+        start = text.find(fragment)
+        while start != -1:
+            term_id = bisect_right(offsets, start) - 1
+            term_ids.append(term_id)
+            # Continue after the end of this term, each term is reported once
+            start = text.find(fragment, offsets[term_id] + len(self.terms[term_id]) + 1)
+        return term_ids
+
+    def matching_terms(self, fragment):
+        """Return ids of all terms containing the (already folded) fragment."""
+        if len(fragment) < NGRAM_SIZE:
+            return self._scan_terms(fragment)
+        gram_lists = []
+        for gram in ngrams(fragment):
+            row = self.gram_rows.get(gram)
+            if row is None:
+                return []
+            gram_lists.append(self.gram_postings[row])
+        gram_lists.sort(key=len)
+        candidates = set(gram_lists[0])
+        for term_ids in gram_lists[1:]:
+            candidates.intersection_update(term_ids)
+        return [term_id for term_id in candidates if fragment in self.terms[term_id]]
+
+    def matching_prefix_terms(self, words):
+        """Return ids of all terms having, for every word, a distinct word starting with it."""
+        if self._tokens is None:
+            self._tokens = [fold_tokens(term) for term in self.terms]
+        # Every word is a substring of a matching term, so the longest one narrows the candidates
+        candidates = self.matching_terms(max(words, key=len))
+        return [term_id for term_id in candidates if _prefixes_distinct_tokens(words, self._tokens[term_id])]
+
+    def _word_index(self):
+        """Distinct words of all terms, the terms containing each, and a trigram index over them.
+
+        Built on the first fuzzy query, it is much smaller than the term index
+        because words repeat across terms.
+        """
+        if self._words is None:
+            if self._tokens is None:
+                self._tokens = [fold_tokens(term) for term in self.terms]
+            word_ids = {}
+            word_terms = []
+            for term_id, tokens in enumerate(self._tokens):
+                for token in tokens:
+                    word_id = word_ids.get(token)
+                    if word_id is None:
+                        word_id = word_ids[token] = len(word_terms)
+                        word_terms.append([])
+                    if not word_terms[word_id] or word_terms[word_id][-1] != term_id:
+                        word_terms[word_id].append(term_id)
+            words = list(word_ids)
+            grams = defaultdict(list)
+            for word_id, word in enumerate(words):
+                for gram in word_ngrams(word):
+                    grams[gram].append(word_id)
+            gram_counts = [len(word_ngrams(word)) for word in words]
+            self._words = (words, word_terms, dict(grams), gram_counts)
+        return self._words
+
+    def similar_words(self, word, min_similarity=MIN_SIMILARITY):
+        """Yield (word id, similarity) of indexed words similar to the folded word.
+
+        Candidates are the words sharing a trigram with it; the similarity is
+        the Dice coefficient of the two trigram sets, and 1.0 for words the
+        query word is a prefix of.
+        """
+        words, _, grams, gram_counts = self._word_index()
+        query_grams = word_ngrams(word)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for word_id in grams.get(gram, ()):
+                shared[word_id] += 1
+        for word_id, count in shared.items():
+            if words[word_id].startswith(word):
+                yield word_id, 1.0
+                continue
+            similarity = 2 * count / (len(query_grams) + gram_counts[word_id])
+            if similarity >= min_similarity:
+                yield word_id, similarity
+
+    def score_terms(self, fragment, min_similarity=MIN_SIMILARITY):
+        """Return {term id: score} of terms matching the folded fragment, tolerating typos.
+
+        A term containing the fragment scores 1.0. Otherwise every word of the
+        fragment is matched to its most similar word of the term and the
+        score is their average similarity.
+        """
+        scores = dict.fromkeys(self.matching_terms(fragment), 1.0)
+        query_words = fold_tokens(fragment)
+        if not query_words:
+            return scores
+        _, word_terms, _, _ = self._word_index()
+        totals = defaultdict(float)
+        for query_word in query_words:
+            best = {}
+            for word_id, similarity in self.similar_words(query_word, min_similarity):
+                for term_id in word_terms[word_id]:
+                    if similarity > best.get(term_id, 0.0):
+                        best[term_id] = similarity
+            for term_id, similarity in best.items():
+                totals[term_id] += similarity
+        for term_id, total in totals.items():
+            score = total / len(query_words)
+            if score >= min_similarity and score > scores.get(term_id, 0.0):
+                scores[term_id] = score
+        return scores
+
+    def score_positions(self, fragment, closeness=False):
+        """Return {position: score} of recipes matching the folded fragment, tolerating typos.
+
+        With `closeness` a match is also weighted by how much of the term the
+        fragment covers, so an exact name ranks above a longer one containing it.
+        """
+        positions = {}
+        for term_id, score in self.score_terms(fragment).items():
+            if closeness:
+                term_length = len(self.terms[term_id])
+                score *= 0.5 + 0.5 * min(len(fragment), term_length) / max(len(fragment), term_length)
+            for position in self.postings[term_id]:
+                if score > positions.get(position, 0.0):
+                    positions[position] = score
+        return positions
+
+    def estimate_matches(self, fragment, fuzzy=False):
+        """Roughly estimate the postings `match(fragment)` visits, from n-gram frequencies only.
+
+        Short fragments are scanned against every term, and fuzzy matching
+        may reach any of them, so both are assumed to visit all postings.
+        """
+        total = len(self.postings.values)
+        if fuzzy or len(fragment) < NGRAM_SIZE:
+            return total
+        rarest = len(self.terms)
+        for gram in ngrams(fragment):
+            row = self.gram_rows.get(gram)
+            rarest = min(rarest, 0 if row is None else len(self.gram_postings[row]))
+        return total * rarest // max(1, len(self.terms))
+
+    def match(self, fragment, word_prefixes=False):
+        """Return positions of all recipes with a string containing the (already folded) fragment.
+
+        With `word_prefixes`, a fragment of several words also matches strings
+        with a different word starting with each of them, in any order.
+        """
+        term_ids = set(self.matching_terms(fragment))
+        words = fold_tokens(fragment)
+        if word_prefixes and len(words) > 1:
+            term_ids.update(self.matching_prefix_terms(words))
+        positions = set()
+        for term_id in term_ids:
+            positions.update(self.postings[term_id])
+        return positions
+
+
+class RecipeIndex:
+    """Prebuilt inverted index answering /search_recipes filters with set operations.
+
+    Built from a RecipeStore: postings are keyed by the folded form of each
+    vocabulary term (see recipe_loader.fold), so every distinct diet, meal type
+    and ingredient string is normalized once at startup instead of on every
+    request. All postings live
+    in flat arrays so the whole index can be written to and mapped from a
+    snapshot file.
+    """
+
+    def __init__(self, size, diet_keys, diet_postings, meal_type_keys, meal_type_postings,
+                 names, ingredients, with_ingredients):
+        self.size = size
+        self.diet_keys = diet_keys
+        self.diet_rows = {key: row for row, key in enumerate(diet_keys)}
+        self.diet_postings = diet_postings
+        self.meal_type_keys = meal_type_keys
+        self.meal_type_rows = {key: row for row, key in enumerate(meal_type_keys)}
+        self.meal_type_postings = meal_type_postings
+        self.names = names
+        self.ingredients = ingredients
+        # Recipes without ingredients never pass an ingredient filter
+        self.with_ingredients = with_ingredients
+        self._with_ingredients_set = None
+        self._ingredient_rows = None
+        self._ingredient_totals = None
+
+    @classmethod
+    def build(cls, store):
+        size = len(store)
+        diets = defaultdict(set)
+        meal_types = defaultdict(set)
+        name_ids = {}
+        name_positions = []
+        ingredient_ids = {}
+        ingredient_positions = []
+        with_ingredients = array('I')
+
+        diet_keys = store.diet_vocab.keys()
+        meal_type_keys = store.meal_type_vocab.keys()
+        ingredient_terms = []
+        for key in store.ingredient_vocab.keys():
+            if key not in ingredient_ids:
+                ingredient_ids[key] = len(ingredient_positions)
+                ingredient_positions.append(set())
+            ingredient_terms.append(ingredient_ids[key])
+
+        for position in range(size):
+            for diet_id in store.diet_ids_of(position):
+                diets[diet_keys[diet_id]].add(position)
+            for meal_type_id in store.meal_type_ids_of(position):
+                meal_types[meal_type_keys[meal_type_id]].add(position)
+            name = store.names[position]
+            if name:
+                key = fold(name)
+                if key not in name_ids:
+                    name_ids[key] = len(name_positions)
+                    name_positions.append(set())
+                name_positions[name_ids[key]].add(position)
+            recipe_ingredients = store.ingredient_ids_of(position)
+            if recipe_ingredients:
+                with_ingredients.append(position)
+                for ingredient_id in recipe_ingredients:
+                    ingredient_positions[ingredient_terms[ingredient_id]].add(position)
+
+        return cls(
+            size,
+            list(diets), PostingLists.from_sets(diets.values()),
+            list(meal_types), PostingLists.from_sets(meal_types.values()),
+            SubstringIndex.build(list(name_ids), name_positions),
+            SubstringIndex.build(list(ingredient_ids), ingredient_positions),
+            with_ingredients
+        )
+
+    def _has_ingredients(self):
+        if self._with_ingredients_set is None:
+            self._with_ingredients_set = frozenset(self.with_ingredients)
+        return self._with_ingredients_set
+
+    def search(self, diet=None, meal_type=None, name=None,
+               includes_ingredients=None, excludes_ingredients=None, stages=None):
+        """Return sorted positions of recipes matching all given filters.
+
+        Matching ignores case and diacritics. `includes_ingredients` and
+        `excludes_ingredients` are lists of fragments already normalized with
+        `fold`; an empty list still restricts the result to recipes that have
+        ingredients, mirroring the original linear filters. `stages` is an
+        optional StageTimings.
+        """
+        candidates = []
+        if diet:
+            row = self.diet_rows.get(fold(diet))
+            candidates.append(set() if row is None else set(self.diet_postings[row]))
+            if stages is not None:
+                stages.lap('diet', len(candidates[-1]))
+        if meal_type:
+            row = self.meal_type_rows.get(fold(meal_type))
+            candidates.append(set() if row is None else set(self.meal_type_postings[row]))
+            if stages is not None:
+                stages.lap('meal_type', len(candidates[-1]))
+        if name:
+            candidates.append(self.names.match(fold(name), word_prefixes=True))
+            if stages is not None:
+                stages.lap('name', len(candidates[-1]))
+        if includes_ingredients:
+            # Any ingredient match already implies the recipe has ingredients
+            for fragment in includes_ingredients:
+                candidates.append(self.ingredients.match(fragment))
+                if stages is not None:
+                    stages.lap('includes_ingredients', len(candidates[-1]))
+        elif includes_ingredients is not None or excludes_ingredients is not None:
+            candidates.append(self._has_ingredients())
+
+        if not candidates:
+            return list(range(self.size))
+
+        # Intersect starting from the most selective filter
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for positions in candidates[1:]:
+            if not result:
+                break
+            result &= positions
+        if stages is not None:
+            stages.lap('intersect', len(result))
+
+        if excludes_ingredients and result:
+            for fragment in excludes_ingredients:
+                result -= self.ingredients.match(fragment)
+                if not result:
+                    break
+                if stages is not None:
+                    stages.check()
+            if stages is not None:
+                stages.lap('excludes_ingredients', len(result))
+
+        result = sorted(result)
+        if stages is not None:
+            stages.lap('sort', len(result))
+        return result
+
+    def estimate_cost(self, diet=None, meal_type=None, name=None,
+                      includes_ingredients=None, excludes_ingredients=None, fuzzy=False):
+        """Roughly estimate how many postings a query visits, without running it.
+
+        Cheap enough to decide on admission before a query runs. `fuzzy`
+        estimates a `rank` query instead of a `search`.
+        """
+        cost = 0
+        if diet:
+            row = self.diet_rows.get(fold(diet))
+            cost += 0 if row is None else len(self.diet_postings[row])
+        if meal_type:
+            row = self.meal_type_rows.get(fold(meal_type))
+            cost += 0 if row is None else len(self.meal_type_postings[row])
+        if name:
+            cost += self.names.estimate_matches(fold(name), fuzzy)
+        for fragment in includes_ingredients or ():
+            cost += self.ingredients.estimate_matches(fragment, fuzzy)
+        for fragment in excludes_ingredients or ():
+            cost += self.ingredients.estimate_matches(fragment)
+        return cost
+
+    def rank(self, diet=None, meal_type=None, name=None,
+             includes_ingredients=None, excludes_ingredients=None, limit=10, stages=None):
+        """Return the `limit` best matching recipes as (position, score) pairs, and the number of matches.
+
+        `diet`, `meal_type` and `excludes_ingredients` filter exactly as in
+        `search`. `name` and `includes_ingredients` tolerate typos and decide
+        the score instead: how close the name is, and which share of the
+        requested ingredients the recipe covers. A recipe must match the name
+        (if given) and at least one requested ingredient (if any). Ties keep
+        catalog order. Only the top `limit` are selected, the rest of the
+        matches are never sorted. `stages` is an optional StageTimings.
+        """
+        filters = []
+        if diet:
+            row = self.diet_rows.get(fold(diet))
+            filters.append(set() if row is None else set(self.diet_postings[row]))
+        if meal_type:
+            row = self.meal_type_rows.get(fold(meal_type))
+            filters.append(set() if row is None else set(self.meal_type_postings[row]))
+
+        # Scores range from 0 to 1 whichever of name and ingredients are given
+        name_weight = NAME_WEIGHT if name else 0.0
+        ingredient_weight = INGREDIENT_WEIGHT if includes_ingredients else 0.0
+        total_weight = name_weight + ingredient_weight
+        scores = None
+        if name:
+            name_scores = self.names.score_positions(fold(name), closeness=True)
+            weight = name_weight / total_weight
+            scores = {position: weight * score for position, score in name_scores.items()}
+            if stages is not None:
+                stages.lap('fuzzy_name', len(scores))
+        if includes_ingredients:
+            coverage = defaultdict(float)
+            for fragment in includes_ingredients:
+                for position, score in self.ingredients.score_positions(fragment).items():
+                    coverage[position] += score
+                if stages is not None:
+                    stages.check()
+            weight = ingredient_weight / total_weight / len(includes_ingredients)
+            if scores is None:
+                scores = {position: weight * total for position, total in coverage.items()}
+            else:
+                scores = {position: score + weight * coverage.get(position, 0.0)
+                          for position, score in scores.items() if position in coverage}
+            if stages is not None:
+                stages.lap('fuzzy_ingredients', len(scores))
+        elif includes_ingredients is not None or excludes_ingredients is not None:
+            filters.append(self._has_ingredients())
+
+        if scores is not None:
+            matches = set(scores)
+        elif filters:
+            matches = set(filters.pop())
+        else:
+            matches = set(range(self.size))
+        for positions in filters:
+            matches &= positions
+        if excludes_ingredients:
+            for fragment in excludes_ingredients:
+                matches -= self.ingredients.match(fragment)
+        if stages is not None:
+            stages.lap('filter', len(matches))
+
+        if scores is None:
+            best = [(position, 0.0) for position in heapq.nsmallest(limit, matches)]
+        else:
+            best = [(position, scores[position]) for position in
+                    heapq.nsmallest(limit, matches, key=lambda position: (-scores[position], position))]
+        if stages is not None:
+            stages.lap('top_k', len(best))
+        return best, len(matches)
+
+    def ingredient_row(self, key):
+        """Return the posting row of the ingredient with the given folded key, or None."""
+        if self._ingredient_rows is None:
+            self._ingredient_rows = {term: row for row, term in enumerate(self.ingredients.terms)}
+        return self._ingredient_rows.get(key)
+
+    def ingredient_totals(self):
+        """Return the number of distinct ingredients of every recipe, by position."""
+        if self._ingredient_totals is None:
+            totals = array('I', bytes(4 * self.size))
+            postings = self.ingredients.postings
+            for row in range(len(postings)):
+                for position in postings[row]:
+                    totals[position] += 1
+            self._ingredient_totals = totals
+        return self._ingredient_totals
+
+    def pantry_coverage(self, rows, limit=10):
+        """Rank recipes by how much of them the pantry covers.
+
+        `rows` are the distinct ingredient rows of the pantry (see `ingredient_row`).
+        Their postings are accumulated into a count of available ingredients
+        per recipe, so only recipes using at least one pantry ingredient are
+        ever looked at. Returns the top `limit` as (position, available, total)
+        triples, fewest missing ingredients first, then highest coverage, and
+        the number of recipes using any pantry ingredient.
+        """
+        if not rows:
+            return [], 0
+        totals = self.ingredient_totals()
+        if numpy is not None:
+            return self._pantry_coverage_numpy(rows, totals, limit)
+
+        postings = self.ingredients.postings
+        available = defaultdict(int)
+        for row in rows:
+            for position in postings[row]:
+                available[position] += 1
+        best = heapq.nsmallest(limit, available, key=lambda position: (
+            totals[position] - available[position], -available[position] / totals[position], position
+        ))
+        return [(position, available[position], totals[position]) for position in best], len(available)
+
+    def _pantry_coverage_numpy(self, rows, totals, limit):
+        postings = self.ingredients.postings
+        positions = numpy.concatenate([numpy.frombuffer(postings[row], dtype=numpy.uint32) for row in rows])
+        available = numpy.bincount(positions, minlength=self.size)
+        candidates = numpy.flatnonzero(available)
+        have = available[candidates]
+        total = numpy.frombuffer(totals, dtype=numpy.uint32)[candidates].astype(numpy.int64)
+        missing = total - have
+        coverage = have / total
+        if len(candidates) > limit:
+            # Coverage is at most 1, so this orders by missing count first and
+            # coverage second; keep everything up to the limit-th key, ties included
+            key = missing - coverage / 2
+            kth = numpy.partition(key, limit - 1)[limit - 1]
+            selected = numpy.flatnonzero(key <= kth)
+            candidates, have, total = candidates[selected], have[selected], total[selected]
+            missing, coverage = missing[selected], coverage[selected]
+        order = numpy.lexsort((candidates, -coverage, missing))[:limit]
+        return [
+            (int(candidates[i]), int(have[i]), int(total[i])) for i in order
+        ], int(numpy.count_nonzero(available))
@@ -0,0 +1,75 @@
+"""Fast JSON encoding of recipe listings.
+
+Recipes never change within a catalog generation, so the short recipe fields
+are encoded to JSON bytes once, the first time they are served, and kept with
+the catalog. Listing responses are assembled by joining those fragments into
+the response envelope instead of re-serializing each recipe dict on every
+request. The long steps text is encoded per request straight from the store's
+(memory-mapped, shared) steps bytes rather than copied into every worker's
+heap. orjson is used for encoding when installed.
+"""
+import json
+
+from recipe_loader import RECIPE_FIELDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value):
+    """Encode a JSON-ready value as compact UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# Fields encoded on every request instead of cached: their encoded bytes would
+# duplicate the bulk of the shared snapshot in each worker's private memory
+UNCACHED_FIELDS = ('steps',)
+
+
+def _members(values):
+    # The `"key":value,...` inside of an encoded object
+    return dumps(values)[1:-1]
+
+
+class RecipeFragments:
+    """Encoded recipe fields of one catalog generation, filled in on first use.
+
+    Each field is kept separately as its `"field":value` bytes, so any
+    selection of fields is served from the same fragments. Fields in
+    UNCACHED_FIELDS are encoded on every use.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._columns = {}
+
+    def recipe(self, position, fields=None, extra=None):
+        """Return the recipe at `position` as an encoded JSON object, with the `extra` members appended."""
+        pieces = []
+        for field in fields or RECIPE_FIELDS:
+            if field in UNCACHED_FIELDS:
+                pieces.append(_members(self.store.recipe(position, (field,))))
+                continue
+            column = self._columns.get(field)
+            if column is None:
+                column = self._columns.setdefault(field, [None] * len(self.store))
+            piece = column[position]
+            if piece is None:
+                # Concurrent requests may both encode it; they store equal bytes
+                piece = column[position] = _members(self.store.recipe(position, (field,)))
+            pieces.append(piece)
+        if extra:
+            pieces.append(_members(extra))
+        return b'{' + b','.join(pieces) + b'}'
+
+
+def listing(recipes, **members):
+    """Return the encoded {"recipes": [...], **members} object for encoded recipe objects."""
+    body = b'{"recipes":[' + b','.join(recipes) + b']'
+    if members:
+        body += b',' + _members(members)
+    return body + b'}'
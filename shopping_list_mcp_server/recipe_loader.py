@@ -1,34 +1,461 @@
 import csv
+import multiprocessing
 import os
+import re
+import sys
+import unicodedata
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-def load_recipes(csv_path):
-    """Load recipes from a CSV file."""
-    recipes = []
+
+# Fields of a recipe as returned by the API, in CSV column order
+RECIPE_FIELDS = ('id', 'name', 'ingredients', 'steps', 'diet', 'meal_type')
+
+# Anything that isn't a letter or digit separates words
+TOKEN_SEPARATOR = re.compile(r'\W+')
+
+
+def fold(text):
+    """Return the matching key of a string: case-folded, without diacritics.
+
+    "Máslo", "MASLO" and "maslo" all fold to "maslo", so searches ignore both
+    case and Czech accents.
+    """
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def fold_tokens(folded):
+    """Split an already folded string into its words."""
+    return [token for token in TOKEN_SEPARATOR.split(folded) if token]
+
+
+class Vocabulary:
+    """Interns strings so every distinct value is stored once and referenced by id.
+
+    The folded matching key of every term is computed once, on first use, and
+    kept next to the terms.
+    """
+    __slots__ = ('terms', 'ids', '_keys')
+
+    def __init__(self):
+        self.terms = []
+        self.ids = {}
+        self._keys = []
+
+    @classmethod
+    def from_terms(cls, terms):
+        vocab = cls()
+        vocab.terms = terms
+        vocab.ids = {term: term_id for term_id, term in enumerate(terms)}
+        return vocab
+
+    def keys(self):
+        """Return the fold() key of every term, by term id."""
+        keys = self._keys
+        if len(keys) != len(self.terms):
+            # Terms are only ever appended, so just fold the new ones. The longer
+            # list replaces the old one in one step, so concurrent callers never
+            # extend the same list twice
+            keys = keys + [fold(term) for term in self.terms[len(keys):]]
+            self._keys = keys
+        return keys
+
+    def intern(self, term):
+        """Return the id of the term, adding it to the vocabulary if needed."""
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.ids[term] = term_id
+            self.terms.append(term)
+        return term_id
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __getitem__(self, term_id):
+        return self.terms[term_id]
+
+
+class RecipeStore:
+    """Compact, column-oriented recipe storage.
+
+    Ingredients, diets and meal types are interned into vocabularies and kept
+    as flat arrays of integer ids with per-recipe offsets. The long `steps`
+    text is kept UTF-8 encoded in a single buffer and only decoded when a
+    recipe is actually returned. Indexing the store yields the same dicts the
+    list-based loader used to produce, so responses are unchanged.
+    """
+    __slots__ = (
+        'ids', 'names',
+        'ingredient_vocab', 'ingredient_offsets', 'ingredient_ids',
+        'diet_vocab', 'diet_offsets', 'diet_ids',
+        'meal_type_vocab', 'meal_type_offsets', 'meal_type_ids',
+        'steps_offsets', 'steps_blob'
+    )
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.ingredient_vocab = Vocabulary()
+        self.ingredient_offsets = array('I', [0])
+        self.ingredient_ids = array('I')
+        self.diet_vocab = Vocabulary()
+        self.diet_offsets = array('I', [0])
+        self.diet_ids = array('I')
+        self.meal_type_vocab = Vocabulary()
+        self.meal_type_offsets = array('I', [0])
+        self.meal_type_ids = array('I')
+        self.steps_offsets = array('Q', [0])
+        self.steps_blob = bytearray()
+
+    def append(self, recipe_id, name, ingredients, steps, diet, meal_type):
+        """Append one recipe given its already split list fields."""
+        self.ids.append(recipe_id)
+        self.names.append(name)
+        self.ingredient_ids.extend(self.ingredient_vocab.intern(i) for i in ingredients)
+        self.ingredient_offsets.append(len(self.ingredient_ids))
+        self.diet_ids.extend(self.diet_vocab.intern(d) for d in diet)
+        self.diet_offsets.append(len(self.diet_ids))
+        self.meal_type_ids.extend(self.meal_type_vocab.intern(m) for m in meal_type)
+        self.meal_type_offsets.append(len(self.meal_type_ids))
+        self.steps_blob += steps.encode('utf-8')
+        self.steps_offsets.append(len(self.steps_blob))
+
+    def append_row(self, row):
+        """Append one raw CSV row (values as read by csv.DictReader)."""
+        self.append(
+            row.get('id'),
+            row.get('name'),
+            _split(row.get('ingredients')),
+            row.get('steps') or '',
+            _split(row.get('diet')),
+            _split(row.get('meal_type'))
+        )
+
+    def extend(self, other, positions):
+        """Append the recipes at `positions` of another store, re-interning its terms into this one's vocabularies."""
+        ingredient_map, diet_map, meal_type_map = {}, {}, {}
+        for position in positions:
+            self.ids.append(other.ids[position])
+            self.names.append(other.names[position])
+            self.ingredient_ids.extend(_translate(
+                other.ingredient_ids_of(position), ingredient_map, other.ingredient_vocab, self.ingredient_vocab))
+            self.ingredient_offsets.append(len(self.ingredient_ids))
+            self.diet_ids.extend(_translate(other.diet_ids_of(position), diet_map, other.diet_vocab, self.diet_vocab))
+            self.diet_offsets.append(len(self.diet_ids))
+            self.meal_type_ids.extend(_translate(
+                other.meal_type_ids_of(position), meal_type_map, other.meal_type_vocab, self.meal_type_vocab))
+            self.meal_type_offsets.append(len(self.meal_type_ids))
+            # The steps are copied as encoded bytes, never decoded
+            self.steps_blob += other.steps_blob[other.steps_offsets[position]:other.steps_offsets[position + 1]]
+            self.steps_offsets.append(len(self.steps_blob))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.recipe(position)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.recipe(position) for position in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('recipe index out of range')
+        return self.recipe(key)
+
+    def ingredient_ids_of(self, position):
+        return self.ingredient_ids[self.ingredient_offsets[position]:self.ingredient_offsets[position + 1]]
+
+    def diet_ids_of(self, position):
+        return self.diet_ids[self.diet_offsets[position]:self.diet_offsets[position + 1]]
+
+    def meal_type_ids_of(self, position):
+        return self.meal_type_ids[self.meal_type_offsets[position]:self.meal_type_offsets[position + 1]]
+
+    def steps(self, position):
+        """Decode the steps text of a single recipe."""
+        start, end = self.steps_offsets[position], self.steps_offsets[position + 1]
+        return str(self.steps_blob[start:end], 'utf-8')
+
+    def recipe(self, position, fields=None):
+        """Materialize the recipe at the given position as a JSON-ready dict.
+
+        `fields` optionally limits the dict to a subset of RECIPE_FIELDS; the
+        steps text is only decoded when it is requested.
+        """
+        recipe = {}
+        for field in fields or RECIPE_FIELDS:
+            if field == 'id':
+                recipe['id'] = self.ids[position]
+            elif field == 'name':
+                recipe['name'] = self.names[position]
+            elif field == 'ingredients':
+                # A row without ingredients kept its empty string in the old loader
+                recipe['ingredients'] = [self.ingredient_vocab[i] for i in self.ingredient_ids_of(position)] or ''
+            elif field == 'steps':
+                recipe['steps'] = self.steps(position)
+            elif field == 'diet':
+                recipe['diet'] = [self.diet_vocab[d] for d in self.diet_ids_of(position)]
+            elif field == 'meal_type':
+                recipe['meal_type'] = [self.meal_type_vocab[m] for m in self.meal_type_ids_of(position)]
+        return recipe
+
+    def memory_usage(self):
+        """Approximate number of bytes held by the store, including string payloads."""
+        total = sys.getsizeof(self.steps_blob)
+        for strings in (self.ids, self.names, self.ingredient_vocab.terms,
+                        self.diet_vocab.terms, self.meal_type_vocab.terms):
+            total += sys.getsizeof(strings) + sum(sys.getsizeof(s) for s in strings)
+        for vocab in (self.ingredient_vocab, self.diet_vocab, self.meal_type_vocab):
+            total += sys.getsizeof(vocab.ids)
+        for column in (self.ingredient_offsets, self.ingredient_ids, self.diet_offsets,
+                       self.diet_ids, self.meal_type_offsets, self.meal_type_ids,
+                       self.steps_offsets):
+            total += sys.getsizeof(column)
+        return total
+
+
+def _translate(term_ids, mapping, source_vocab, target_vocab):
+    """Map term ids of `source_vocab` to ids of `target_vocab`, memoized in `mapping`."""
+    translated = []
+    for term_id in term_ids:
+        target_id = mapping.get(term_id)
+        if target_id is None:
+            target_id = mapping[term_id] = target_vocab.intern(source_vocab[term_id])
+        translated.append(target_id)
+    return translated
+
+
+def _split(value):
+    """Split a comma-separated CSV field into stripped values."""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',')]
+
+
+# Number of rows parsed before they are handed over to the store
+CHUNK_SIZE = 1000
+
+# Columns without which a CSV file cannot be loaded at all
+REQUIRED_COLUMNS = ('id', 'name')
+
+
+# Lines of a sources manifest starting with this are comments
+MANIFEST_COMMENT = '#'
+
+
+class IngestReport:
+    """Outcome of loading recipe CSVs: how many rows were loaded and which were rejected.
+
+    When several source files are merged, rejected rows name their source and
+    `sources` lists how many recipes each file contributed.
+    """
+
+    # Rejected rows listed in to_dict(), the count always covers all of them
+    MAX_LISTED_REJECTIONS = 100
+
+    def __init__(self):
+        self.loaded = 0
+        self.rejected = []
+        self.sources = []
+
+    def reject(self, line, recipe_id, reason, source=None):
+        rejection = {'line': line, 'id': recipe_id, 'reason': reason}
+        if source is not None:
+            rejection['source'] = source
+        self.rejected.append(rejection)
+
+    def to_dict(self):
+        report = {
+            'loaded': self.loaded,
+            'rejected': len(self.rejected),
+            'rejected_rows': self.rejected[:self.MAX_LISTED_REJECTIONS]
+        }
+        if self.sources:
+            report['sources'] = self.sources
+        return report
+
+
+def resolve_data_path(path):
+    """Resolve a path relative to the repository root."""
+    # Get absolute path relative to the script location
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, path)
+
+
+def source_name(path):
+    """Name a source file in reports: its path relative to the repository root."""
+    return os.path.relpath(path, resolve_data_path(''))
+
+
+def resolve_sources(path):
+    """Return the absolute paths of the recipe CSVs a catalog path names.
+
+    The path is either a CSV file, a directory whose `*.csv` files are all
+    loaded (in name order), or a manifest: a text file listing one CSV file
+    or directory per line, relative to the manifest, with `#` comments.
+    Raises OSError if the directory or manifest can't be read.
+    """
+    full_path = resolve_data_path(path)
+    if os.path.isdir(full_path):
+        return sorted(
+            os.path.join(full_path, name) for name in os.listdir(full_path)
+            if name.lower().endswith('.csv') and os.path.isfile(os.path.join(full_path, name))
+        )
+    if full_path.lower().endswith('.csv'):
+        return [full_path]
+    sources = []
+    with open(full_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith(MANIFEST_COMMENT):
+                continue
+            entry = os.path.join(os.path.dirname(full_path), line)
+            sources.extend(resolve_sources(entry) if os.path.isdir(entry) else [entry])
+    return sources
+
+
+def validate_row(row, seen_ids):
+    """Return the reason a parsed CSV row can't be loaded, or None if it is valid."""
+    if None in row:
+        return "Too many fields"
+    if any(value is None for value in row.values()):
+        return "Too few fields"
+    if any('\ufffd' in value for value in row.values()):
+        return "Invalid UTF-8"
+    if not row['id'].strip():
+        return "Missing id"
+    if row['id'] in seen_ids:
+        return "Duplicate id"
+    if not row['name'].strip():
+        return "Missing name"
+    return None
+
+
+def iter_recipe_rows(csv_path, report):
+    """Stream valid rows from a recipe CSV, recording rejected ones in the report.
+
+    Raises OSError if the file can't be read and ValueError if its header lacks
+    a required column. A malformed row only rejects that row.
+    """
+    # Undecodable bytes are replaced so they reject a single row in validate_row
+    with open(resolve_data_path(csv_path), 'r', encoding='utf-8', errors='replace') as file:
+        reader = csv.DictReader(file)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+        seen_ids = set()
+        while True:
+            line = reader.line_num + 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                report.reject(line, None, f"Malformed CSV: {e}")
+                continue
+            reason = validate_row(row, seen_ids)
+            if reason:
+                report.reject(line, row.get('id'), reason)
+                continue
+            seen_ids.add(row['id'])
+            yield row
+
+
+def iter_recipe_chunks(csv_path, report, chunk_size=CHUNK_SIZE):
+    """Group the streamed rows into lists of at most `chunk_size` rows."""
+    chunk = []
+    for row in iter_recipe_rows(csv_path, report):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_recipes(csv_path, report=None):
+    """Load recipes from a CSV file into a RecipeStore.
+
+    Invalid rows are skipped and listed in `report` (an IngestReport) when one
+    is given; only an unreadable file yields an empty store.
+    """
+    report = report if report is not None else IngestReport()
+    store = RecipeStore()
     try:
-        # Get absolute path relative to the script location
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        full_path = os.path.join(base_dir, csv_path)
-        
-        with open(full_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Convert ingredients string to list if it exists and is not None
-                if 'ingredients' in row and row['ingredients']:
-                    row['ingredients'] = [i.strip() for i in row['ingredients'].split(',')]
-                # Convert diet and meal_type to lists if they exist and are not None
-                if 'diet' in row and row['diet']:
-                    row['diet'] = [t.strip() for t in row['diet'].split(',')]
-                # Ensure diet exists even if empty
-                if 'diet' not in row or not row['diet']:
-                    row['diet'] = []
-                    
-                if 'meal_type' in row and row['meal_type']:
-                    row['meal_type'] = [t.strip() for t in row['meal_type'].split(',')]
-                # Ensure meal_type exists even if empty
-                if 'meal_type' not in row or not row['meal_type']:
-                    row['meal_type'] = []
-                recipes.append(row)
-        return recipes
-    except Exception as e:
+        for chunk in iter_recipe_chunks(csv_path, report):
+            for row in chunk:
+                store.append_row(row)
+            report.loaded += len(chunk)
+    except (OSError, ValueError) as e:
         print(f"Error loading recipes: {e}")
-        return []
\ No newline at end of file
+        return RecipeStore()
+    if report.rejected:
+        print(f"Skipped {len(report.rejected)} invalid recipe rows")
+    return store
+
+
+def _load_source(csv_path):
+    report = IngestReport()
+    return load_recipes(csv_path, report), report
+
+
+def _pool_context():
+    """Start loader processes from a fork server, never by forking this process.
+
+    Reloads run in a threaded server, and forking a process while other threads
+    hold locks can deadlock the child.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def load_sources(csv_paths, report=None, workers=None):
+    """Load several recipe CSVs, parsed in parallel processes, into one RecipeStore.
+
+    A recipe id is kept from the first source (in the given order) that has
+    it; its later copies are rejected as duplicates. `workers` caps the
+    processes (default: one per core); a single file is loaded in-process.
+    The processes re-import the main script before parsing, so a script
+    calling this at import time must not do so when run as `__mp_main__`.
+    """
+    report = report if report is not None else IngestReport()
+    if len(csv_paths) == 1:
+        return load_recipes(csv_paths[0], report)
+
+    workers = min(len(csv_paths), workers or os.cpu_count() or 1)
+    results = None
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+                results = list(pool.map(_load_source, csv_paths))
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Error loading recipes in parallel, loading them one by one: {e}")
+    if results is None:
+        results = [_load_source(csv_path) for csv_path in csv_paths]
+
+    store = RecipeStore()
+    seen_ids = set()
+    for csv_path, (source_store, source_report) in zip(csv_paths, results):
+        source = source_name(csv_path)
+        for rejection in source_report.rejected:
+            report.reject(rejection['line'], rejection['id'], rejection['reason'], source)
+        kept = []
+        for position, recipe_id in enumerate(source_store.ids):
+            if recipe_id in seen_ids:
+                # Line numbers aren't kept after parsing
+                report.reject(None, recipe_id, "Duplicate id", source)
+            else:
+                seen_ids.add(recipe_id)
+                kept.append(position)
+        store.extend(source_store, kept)
+        report.loaded += len(kept)
+        report.sources.append({'path': source, 'loaded': len(kept)})
+    return store
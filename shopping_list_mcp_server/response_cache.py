@@ -0,0 +1,46 @@
+import hashlib
+import threading
+
+
+class ResponseCache:
+    """Serialized response bodies computed once per catalog version.
+
+    Entries are keyed by (catalog version, key) so a reloaded catalog never
+    serves a stale body; `clear` drops the old generation's entries eagerly.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key, build):
+        """Return (body, etag), calling `build()` for the body bytes on a miss."""
+        entry = self._entries.get((version, key))
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get((version, key))
+                if entry is None:
+                    self.misses += 1
+                    body = build()
+                    # A content hash keeps the ETag identical across worker processes
+                    entry = (body, hashlib.sha256(body).hexdigest()[:32])
+                    self._entries[(version, key)] = entry
+                    return entry
+        # Counted without the lock; an occasional lost update is fine for statistics
+        self.hits += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,223 @@
+"""Production launcher running several worker processes on one port.
+
+    python shopping_list_mcp_server/serve.py --workers 4 --port 8001
+
+The recipe catalog is loaded once in the parent before the workers are
+forked. Its arrays are memory-mapped from the read-only snapshot, so every
+worker shares the same physical pages instead of holding a private copy.
+Each worker serves the listening socket it inherited with waitress, a
+production WSGI server, on --threads threads. Without waitress installed the
+workers fall back to werkzeug's development server, which is not meant for
+production and says so on startup. Workers that die are restarted, with a
+growing delay while they keep dying right after starting. With --asgi the ASGI
+app from asgi.py is served by uvicorn (if installed) instead.
+
+Shopping lists kept in memory are private to each worker, so more than one
+worker needs SHOPPING_LIST_DB set to share them in SQLite.
+
+All workers serve the same catalog generation. A worker that reloads the
+catalog (POST /admin/reload_recipes or its watcher) sends SIGHUP to the
+parent, which reloads its own copy, so restarted workers fork from the new
+catalog, and forwards SIGHUP to every worker; they then map the snapshot the
+first one wrote. `kill -HUP <launcher pid>` reloads all workers the same way.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+# A worker exiting sooner than this many seconds after it started counts as a failed start
+MIN_WORKER_LIFETIME = 5
+# Longest delay, in seconds, before restarting a worker that keeps failing to start
+MAX_RESTART_DELAY = 30
+# Seconds between checks of the parent for exited workers and reload requests
+SUPERVISE_INTERVAL = 0.2
+
+
+def serve_wsgi(app, listening_socket, args):
+    try:
+        import waitress
+    except ImportError:
+        print("waitress is not installed, falling back to werkzeug's development server; "
+              "do not use it in production: pip install waitress", file=sys.stderr)
+    else:
+        waitress.serve(app, sockets=[listening_socket], threads=args.threads)
+        return
+    from werkzeug.serving import make_server
+    http_server = make_server(args.host, args.port, app, threaded=True,
+                              fd=listening_socket.fileno())
+    http_server.serve_forever()
+
+
+def run_worker(listening_socket, args):
+    import server
+
+    # Threads don't survive fork, restart the catalog watcher in this worker
+    watch_interval = float(os.environ.get('RECIPES_WATCH_INTERVAL', 0))
+    if watch_interval > 0:
+        server.catalog_manager.watch(watch_interval)
+
+    # The parent stops workers with SIGTERM; ignore the terminal's Ctrl-C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # Reload when the parent says the catalog changed, off the signal handler; a
+    # reload that happens here asks the parent to bring the other workers along
+    signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(
+        target=server.catalog_manager.reload, name='catalog-reload', daemon=True).start())
+    parent = os.getppid()
+
+    def notify_parent(catalog):
+        try:
+            os.kill(parent, signal.SIGHUP)
+        except ProcessLookupError:
+            pass
+
+    server.catalog_manager.on_reload(notify_parent)
+    serve_wsgi(server.app, listening_socket, args)
+
+
+def run_prefork(args):
+    # Load the catalog (and map the snapshot) before forking so workers share it
+    import server
+
+    listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listening_socket.bind((args.host, args.port))
+    listening_socket.listen(args.backlog)
+    listening_socket.set_inheritable(True)
+
+    # pid -> time the worker started
+    workers = {}
+    # monotonic() times at which to replace workers that died
+    restarts = []
+    stopping = False
+    reload_requested = False
+    failed_starts = 0
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                run_worker(listening_socket, args)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def request_reload(signum, frame):
+        nonlocal reload_requested
+        reload_requested = True
+
+    def reload_workers():
+        result = server.catalog_manager.reload()
+        if not result['reloaded']:
+            return
+        print(f"Reloaded recipes: {result['changes']}, reloading the workers", file=sys.stderr)
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    def reap(pid, status):
+        nonlocal failed_starts
+        started = workers.pop(pid, None)
+        # Not a worker, e.g. the catalog loader's fork server
+        if stopping or started is None:
+            return
+        code = os.waitstatus_to_exitcode(status)
+        reason = f"was killed by signal {-code}" if code < 0 else f"exited with status {code}"
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            failed_starts += 1
+        else:
+            failed_starts = 0
+        delay = min(MAX_RESTART_DELAY, 0.5 * 2 ** (failed_starts - 1)) if failed_starts else 0
+        print(f"Worker {pid} {reason}, restarting in {delay:g}s", file=sys.stderr)
+        restarts.append(time.monotonic() + delay)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, request_reload)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+
+    # Signal handlers only set flags; the work happens here, between polls
+    while workers or (restarts and not stopping):
+        if reload_requested and not stopping:
+            reload_requested = False
+            reload_workers()
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid:
+            reap(pid, status)
+            continue
+        now = time.monotonic()
+        for due in [due for due in restarts if due <= now]:
+            restarts.remove(due)
+            if not stopping:
+                spawn()
+        time.sleep(SUPERVISE_INTERVAL)
+    listening_socket.close()
+
+
+def run_asgi(args):
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("ASGI mode needs uvicorn: pip install uvicorn")
+    uvicorn.run('asgi:app', host=args.host, port=args.port, workers=args.workers,
+                backlog=args.backlog, app_dir=os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shopping list MCP server with several workers.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--workers', type=int,
+                        help="Worker processes (default: one per core with SHOPPING_LIST_DB set, else 1)")
+    parser.add_argument('--backlog', type=int, default=1024)
+    # Streams and long-polls hold a thread each, keep CHANGE_WAITS below this
+    parser.add_argument('--threads', type=int, default=32, help="Request threads per worker")
+    parser.add_argument('--asgi', action='store_true', help="Serve asgi:app with uvicorn")
+    args = parser.parse_args()
+
+    shared_lists = bool(os.environ.get('SHOPPING_LIST_DB'))
+    if args.workers is None:
+        args.workers = (os.cpu_count() or 1) if shared_lists else 1
+    elif args.workers > 1 and not shared_lists:
+        # Each worker would keep its own in-memory lists and a client's list would
+        # depend on which worker accepted the connection
+        parser.error("several workers need SHOPPING_LIST_DB set to share shopping lists, "
+                     "set it or run with --workers 1")
+
+    if args.asgi:
+        run_asgi(args)
+    else:
+        run_prefork(args)
+
+
+if __name__ == '__main__':
+    main()
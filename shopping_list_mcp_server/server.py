@@ -1,86 +1,480 @@
-from flask import Flask, request, jsonify
-from shopping_list_manager import ShoppingListManager
-from recipe_loader import load_recipes
+import math
+import os
+import time
+from contextlib import ExitStack, nullcontext
+
+# Startup is timed from the first import on
+startup_started = time.perf_counter()
+
+from flask import Flask, g, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from shopping_list_manager import DEFAULT_SESSION, ShoppingListRegistry
+from storage import InMemoryBackend, SQLiteBackend, TimedBackend
+from catalog import CatalogManager
+from response_cache import ResponseCache
+from query_cache import QueryCache, normalize_filters
+from pagination import CursorError, clamp_per_page, paginate
+from recipe_loader import RECIPE_FIELDS, fold
+from recipe_index import DeadlineExceeded, StageTimings
+from admission import Overloaded, RateLimiter, WorkQueue
+from recipe_json import dumps, listing
+from compression import COMPRESSIBLE_MIMETYPES, MIN_COMPRESS_SIZE, choose_encoding, compress
+from metrics import COUNT_BUCKETS, MetricsRegistry, Profiler, process_memory_bytes
+
+# Request, search stage, serialization and shopping list timings, served on /metrics
+metrics = MetricsRegistry()
+request_duration = metrics.histogram(
+    'http_request_duration_seconds', "Time to handle a request, by route", ('route', 'method', 'status'))
+search_stage_duration = metrics.histogram(
+    'search_stage_duration_seconds', "Time spent in each stage of a recipe search", ('stage',))
+search_stage_candidates = metrics.histogram(
+    'search_stage_candidates', "Candidate recipes left after each stage of a recipe search", ('stage',),
+    buckets=COUNT_BUCKETS)
+serialization_duration = metrics.histogram(
+    'json_serialization_duration_seconds', "Time to serialize a JSON response")
+shopping_list_duration = metrics.histogram(
+    'shopping_list_operation_duration_seconds', "Time of shopping list storage operations", ('operation',))
+
+# A sampled share of requests can be profiled, see /admin/profiling
+profiler = Profiler(float(os.environ.get('PROFILE_SAMPLE_RATE', 0)))
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing every response it serializes."""
+
+    def response(self, *args, **kwargs):
+        with serialization_duration.time():
+            return super().response(*args, **kwargs)
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
+
+# Initialize the shopping lists and load recipes
+# Shopping lists live in SQLite when SHOPPING_LIST_DB is set, otherwise in memory
+shopping_list_db = os.environ.get('SHOPPING_LIST_DB')
+shopping_lists = ShoppingListRegistry(TimedBackend(
+    SQLiteBackend(shopping_list_db) if shopping_list_db else InMemoryBackend(),
+    shopping_list_duration.observe
+))
+# RECIPES_CSV serves another catalog: a CSV, or a directory or manifest of CSVs to merge,
+# parsed by up to RECIPES_LOAD_WORKERS processes (default: one per core)
+# Its loader processes re-run the main script as __mp_main__ before parsing; when that
+# is this file (`python server.py`) they only need its imports, not a catalog of their own
+loader_process = __name__ == '__mp_main__'
+catalog_manager = CatalogManager(
+    os.environ.get('RECIPES_CSV', 'data/Recipes.csv'),
+    workers=int(os.environ.get('RECIPES_LOAD_WORKERS', 0)) or None,
+    load=not loader_process
+)
+
+# Catalog-wide responses are serialized once per catalog version
+response_cache = ResponseCache()
+catalog_manager.on_reload(lambda catalog: response_cache.clear())
+
+# Matching recipe positions of recent searches, so paging doesn't re-run the filters
+search_cache = QueryCache()
+catalog_manager.on_reload(lambda catalog: search_cache.clear())
+
+# Each client (by address) may make RATE_LIMIT requests per second, in bursts of up to
+# RATE_LIMIT_BURST; off unless RATE_LIMIT is set
+rate_limit = float(os.environ.get('RATE_LIMIT', 0))
+rate_limiter = None
+if rate_limit > 0:
+    rate_limiter = RateLimiter(rate_limit, float(os.environ.get('RATE_LIMIT_BURST', 0)) or None)
+# Paths that are never rate limited
+RATE_LIMIT_EXEMPT = ('/metrics',)
+
+# Searches estimated to visit at least SEARCH_EXPENSIVE_COST postings run at most
+# SEARCH_CONCURRENCY at a time; up to SEARCH_QUEUE more wait SEARCH_QUEUE_TIMEOUT seconds for a turn
+expensive_search_cost = int(os.environ.get('SEARCH_EXPENSIVE_COST', 10_000))
+search_queue = WorkQueue(
+    int(os.environ.get('SEARCH_CONCURRENCY', 0)) or os.cpu_count() or 1,
+    int(os.environ.get('SEARCH_QUEUE', 32)),
+    float(os.environ.get('SEARCH_QUEUE_TIMEOUT', 1.0))
+)
+# At most CHANGE_WAITS change streams and long-polls are open at once, each holding a
+# thread; keep it below ASGI_THREADS (or serve.py --threads) so other routes always
+# find one. Beyond it they get 503
+change_waits = WorkQueue(int(os.environ.get('CHANGE_WAITS', 16)), 0, 1, 'change streams and long-polls')
+
+# Seconds from the arrival of a request after which its search is abandoned, 0 for no limit
+search_timeout = float(os.environ.get('SEARCH_TIMEOUT', 5.0))
+
+# Poll the CSV for changes when RECIPES_WATCH_INTERVAL (seconds) is set
+watch_interval = float(os.environ.get('RECIPES_WATCH_INTERVAL', 0))
+if watch_interval > 0 and not loader_process:
+    catalog_manager.watch(watch_interval)
+
+startup_duration = time.perf_counter() - startup_started
+
+def startup_phases():
+    phases = {('catalog_' + phase,): seconds for phase, seconds in catalog_manager.current.load_timings.items()}
+    phases[('total',)] = startup_duration
+    return phases
+
+metrics.gauge('startup_phase_duration_seconds', "Time spent in each startup phase (catalog phases of the current generation)",
+              startup_phases, ('phase',))
+metrics.gauge('catalog_recipes', "Recipes in the current catalog", lambda: len(catalog_manager.current.store))
+metrics.gauge('catalog_ingredients', "Distinct ingredients in the current catalog",
+              lambda: len(catalog_manager.current.all_ingredients))
+metrics.gauge('catalog_store_bytes', "Approximate memory held by the current recipe store",
+              lambda: catalog_manager.current.memory_usage())
+metrics.gauge('process_resident_memory_bytes', "Resident memory of this worker process", process_memory_bytes)
+metrics.gauge('cache_entries', "Entries in the response caches", lambda: {
+    ('search',): search_cache.stats()['entries'], ('response',): response_cache.stats()['entries']
+}, ('cache',))
+metrics.gauge('cache_hit_ratio', "Share of cache lookups answered from the cache", lambda: {
+    ('search',): search_cache.stats()['hit_ratio'], ('response',): response_cache.stats()['hit_ratio']
+}, ('cache',))
+shed_requests = metrics.counter(
+    'requests_shed_total', "Requests turned away by rate limiting, a full search queue or a search deadline",
+    ('reason',))
+metrics.gauge('search_queue_waiting', "Expensive searches waiting for a slot", lambda: search_queue.waiting)
+metrics.gauge('search_queue_running', "Expensive searches running", lambda: search_queue.running)
+metrics.gauge('change_waits_open', "Change streams and long-polls holding a thread", lambda: change_waits.running)
+metrics.gauge('profile_sample_rate', "Share of requests profiled", lambda: profiler.sample_rate)
+
+def record_stages(stages):
+    for stage, seconds, candidates in stages.stages:
+        search_stage_duration.observe(seconds, stage)
+        search_stage_candidates.observe(candidates, stage)
+
+@app.before_request
+def start_request_timer():
+    # Stored in the environ rather than `g`, which batch operations share with their batch
+    request.environ['metrics.start'] = time.perf_counter()
+    request.environ['metrics.profile'] = profiler.start()
+
+@app.before_request
+def limit_client_rate():
+    """Answer 429 once the client has used up its token bucket."""
+    if rate_limiter is None or request.path in RATE_LIMIT_EXEMPT:
+        return None
+    # Operations of a batch count against the client that sent the batch
+    client = g.setdefault('client', request.remote_addr)
+    wait = rate_limiter.acquire(client)
+    if wait:
+        shed_requests.inc('rate_limited')
+        return retry_later_response(429, "Rate limit exceeded, slow down", wait)
+    return None
+
+@app.after_request
+def record_request_duration(response):
+    start = request.environ.get('metrics.start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_duration.observe(time.perf_counter() - start, route, request.method, response.status_code)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON and text bodies for clients accepting gzip (or brotli, when installed)."""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    body = response.get_data()
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # The compressed body is no longer byte-identical to the tagged one
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.teardown_request
+def stop_profile(error):
+    profile = request.environ.pop('metrics.profile', None)
+    if profile is not None:
+        profiler.stop(profile)
+
+class InvalidRequestError(Exception):
+    pass
+
+class InvalidSessionError(InvalidRequestError):
+    pass
+
+@app.errorhandler(InvalidRequestError)
+def invalid_request(error):
+    return jsonify({"error": str(error)}), 400
+
+def retry_later_response(status, message, retry_after):
+    response = jsonify({"error": message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+@app.errorhandler(Overloaded)
+def overloaded(error):
+    shed_requests.inc('overloaded')
+    return retry_later_response(503, str(error), error.retry_after)
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(error):
+    shed_requests.inc('deadline')
+    return retry_later_response(503, f"Search took longer than {search_timeout:g} seconds, narrow it down", 1)
+
+@app.url_value_preprocessor
+def pull_session_id(endpoint, values):
+    """Take the session from the /sessions/<session_id>/... path or the X-Session-Id header."""
+    session_id = (values or {}).pop('session_id', None)
+    g.session_id = session_id or request.headers.get('X-Session-Id') or DEFAULT_SESSION
+
+def current_catalog():
+    """Return the catalog generation used for the whole request (and all operations of a batch)."""
+    if 'catalog' not in g:
+        g.catalog = catalog_manager.current
+    return g.catalog
+
+def session_shopping_list():
+    """Return the shopping list of the calling session."""
+    if not shopping_lists.is_valid_session_id(g.session_id):
+        raise InvalidSessionError("Session id must be 1-128 characters of letters, digits, '.', '_' or '-'")
+    return shopping_lists.get(g.session_id)
 
-# Initialize the shopping list manager and load recipes
-shopping_list_manager = ShoppingListManager()
-recipes = load_recipes('data/Recipes.csv')
+def require_encodable(items):
+    """Reject strings that can't be stored as UTF-8, such as lone surrogates that JSON allows."""
+    for item in items:
+        if isinstance(item, str):
+            try:
+                item.encode('utf-8')
+            except UnicodeEncodeError:
+                raise InvalidRequestError("Ingredients must be valid Unicode text") from None
 
-# Cache all unique ingredients for fast lookup
-all_ingredients = set()
-for recipe in recipes:
-    if recipe.get('ingredients'):
-        all_ingredients.update(recipe['ingredients'])
+def cached_json_response(key, build_payload):
+    """Serve a catalog-wide JSON payload serialized once per catalog version.
 
-# Cache all unique diet types for fast lookup
-all_diet_types = set()
-for recipe in recipes:
-    if recipe.get('diet'):
-        all_diet_types.update(recipe['diet'])
+    The response carries a strong ETag and answers If-None-Match with 304.
+    Bodies compressed for the client's Accept-Encoding are cached as well.
+    """
+    catalog = current_catalog()
+    body, etag = response_cache.get(catalog.version, key, lambda: dumps(build_payload(catalog)))
+    encoding = choose_encoding(request.accept_encodings)
+    if len(body) < MIN_COMPRESS_SIZE:
+        encoding = None
+    if encoding is not None:
+        # Compressed bodies are cached too, each with its own ETag
+        plain = body
+        body, etag = response_cache.get(
+            catalog.version, (key, encoding), lambda: compress(plain, encoding, cached=True)
+        )
+    response = app.response_class(body, mimetype=app.json.mimetype)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 @app.route('/get_all_ingredients', methods=['GET'])
 def get_all_ingredients():
     """Get all unique ingredients from all recipes."""
-    return jsonify({
-        "count": len(all_ingredients),
-        "ingredients": sorted(all_ingredients)
-    }), 200
+    return cached_json_response('all_ingredients', lambda catalog: {
+        "count": len(catalog.all_ingredients),
+        "ingredients": sorted(catalog.all_ingredients)
+    })
 
 @app.route('/get_all_diets', methods=['GET'])
 def get_all_diets():
     """Get all unique diet types from all recipes."""
-    return jsonify({
-        "count": len(all_diet_types),
-        "diets": sorted(all_diet_types)
-    }), 200
+    return cached_json_response('all_diets', lambda catalog: {
+        "count": len(catalog.all_diet_types),
+        "diets": sorted(catalog.all_diet_types)
+    })
 
 @app.route('/get_recipe_names', methods=['GET'])
 def get_recipe_names():
     """Get all recipe names from all recipes."""
-    recipe_names = [recipe['name'] for recipe in recipes if recipe.get('name')]
-    return jsonify({
-        "count": len(recipe_names),
-        "recipe_names": sorted(recipe_names)
-    }), 200
+    def build_payload(catalog):
+        recipe_names = [name for name in catalog.store.names if name]
+        return {
+            "count": len(recipe_names),
+            "recipe_names": sorted(recipe_names)
+        }
+    return cached_json_response('recipe_names', build_payload)
+
+def shopping_list_state(shopping_list_manager):
+    """The list with its revision, for syncing with /shopping_list_changes from there."""
+    # Read the revision first: the list may then be newer than it, never older
+    revision = shopping_list_manager.revision()
+    return {"shopping_list": shopping_list_manager.get_list(), "revision": revision}
 
 @app.route('/get_shopping_list', methods=['GET'])
+@app.route('/sessions/<session_id>/get_shopping_list', methods=['GET'])
 def get_shopping_list():
-    return jsonify({"shopping_list": shopping_list_manager.get_list()}), 200
+    return jsonify(shopping_list_state(session_shopping_list())), 200
+
+# Longest wait of a /shopping_list_changes long-poll, in seconds
+MAX_CHANGES_WAIT = 30
+# Seconds between keep-alive comments on an idle change stream
+STREAM_KEEPALIVE = 15
+# Seconds after which a change stream ends; EventSource clients reconnect with Last-Event-ID
+STREAM_DURATION = 300
+
+def client_disconnected():
+    """Event set once the client has gone away, when the server reports it (the ASGI adapter does)."""
+    return request.environ.get('asgi.disconnected')
+
+@app.route('/shopping_list_changes', methods=['GET'])
+@app.route('/sessions/<session_id>/shopping_list_changes', methods=['GET'])
+def shopping_list_changes():
+    """What changed on the shopping list after the `since` revision, waiting up to `wait` seconds for a change."""
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "Provide the 'since' revision, e.g. from /get_shopping_list"}), 400
+    wait = request.args.get('wait', 0, type=float)
+    if not math.isfinite(wait):
+        return jsonify({"error": f"wait must be a number of seconds up to {MAX_CHANGES_WAIT}"}), 400
+    wait = min(max(wait, 0), MAX_CHANGES_WAIT)
+    shopping_list_manager = session_shopping_list()
+    if wait:
+        with change_waits.admit():
+            shopping_list_manager.wait_for_change(since, wait, client_disconnected())
+    return jsonify(shopping_list_manager.changes_since(since)), 200
+
+@app.route('/shopping_list_changes/stream', methods=['GET'])
+@app.route('/sessions/<session_id>/shopping_list_changes/stream', methods=['GET'])
+def stream_shopping_list_changes():
+    """Server-Sent Events stream of shopping list changes after `since` (or Last-Event-ID, or now)."""
+    since = request.args.get('since', type=int)
+    if since is None:
+        since = request.headers.get('Last-Event-ID', type=int)
+    shopping_list_manager = session_shopping_list()
+    if since is None or since < 0:
+        since = shopping_list_manager.revision()
+    disconnected = client_disconnected()
+    # The stream holds its slot until the response is closed
+    slot = ExitStack()
+    slot.enter_context(change_waits.admit())
+
+    def events():
+        revision = since
+        ends = time.monotonic() + STREAM_DURATION
+        yield f"retry: 1000\nid: {revision}\n\n".encode()
+        while time.monotonic() < ends:
+            timeout = min(STREAM_KEEPALIVE, ends - time.monotonic())
+            current = shopping_list_manager.wait_for_change(revision, timeout, disconnected)
+            if disconnected is not None and disconnected.is_set():
+                return
+            if current == revision:
+                yield b": keepalive\n\n"
+                continue
+            change = shopping_list_manager.changes_since(revision)
+            revision = change["revision"]
+            yield f"id: {revision}\nevent: change\ndata: ".encode() + dumps(change) + b"\n\n"
+
+    response = app.response_class(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    response.call_on_close(slot.close)
+    return response
+
+def requested_fields():
+    """Return the recipe fields selected by the `fields` query parameter, or None for all."""
+    if not request.args.get('fields'):
+        return None
+    fields = list(dict.fromkeys(field.strip() for field in request.args['fields'].split(',') if field.strip()))
+    unknown = [field for field in fields if field not in RECIPE_FIELDS]
+    if unknown or not fields:
+        raise InvalidRequestError(f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(RECIPE_FIELDS)}")
+    return fields
+
+def encoded_response(body):
+    """Respond with an already encoded JSON body."""
+    return app.response_class(body, mimetype=app.json.mimetype)
+
+def recipes_response(recipes, **members):
+    """Respond with encoded recipe objects in a {"recipes": [...], **members} envelope."""
+    with serialization_duration.time():
+        return encoded_response(listing(recipes, **members))
+
+def recipe_listing(catalog, positions):
+    """Respond with one page of the recipes at the given sorted positions.
+
+    Understands the `page`, `per_page` (or `limit`), `cursor` and `fields`
+    query parameters shared by all recipe listings.
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = clamp_per_page(
+        request.args.get('per_page', type=int) or request.args.get('limit', type=int)
+    )
+    cursor = request.args.get('cursor') or None
+
+    fields = requested_fields()
+    try:
+        page_positions, pagination = paginate(positions, catalog.version, page, per_page, cursor)
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return recipes_response(
+        (catalog.fragments.recipe(position, fields) for position in page_positions),
+        pagination=pagination
+    )
 
 @app.route('/get_recipes', methods=['GET'])
 def get_recipes_route():
-    # Get pagination parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = 10  # Fixed limit of 10 recipes per page
-    
-    # Calculate pagination
-    total_recipes = len(recipes)
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    
-    # Get paginated recipes
-    paginated_recipes = recipes[start_index:end_index]
-    
-    # Calculate pagination info
-    total_pages = (total_recipes + per_page - 1) // per_page  # Ceiling division
-    has_next = page < total_pages
-    has_prev = page > 1
-    
-    return jsonify({
-        "recipes": paginated_recipes,
-        "pagination": {
-            "page": page,
-            "per_page": per_page,
-            "total": total_recipes,
-            "total_pages": total_pages,
-            "has_next": has_next,
-            "has_prev": has_prev
-        }
-    }), 200
+    catalog = current_catalog()
+    return recipe_listing(catalog, range(len(catalog.store)))
+
+@app.route('/get_recipe', methods=['GET'])
+def get_recipe():
+    """Get one recipe by its id."""
+    recipe_id = request.args.get('id')
+    if not recipe_id:
+        return jsonify({"error": "Please provide the recipe 'id'"}), 400
+    fields = requested_fields()
+    catalog = current_catalog()
+    position = catalog.position_of(recipe_id)
+    if position is None:
+        return jsonify({"error": f"Recipe {recipe_id} not found"}), 404
+    return encoded_response(b'{"recipe":' + catalog.fragments.recipe(position, fields) + b'}')
+
+@app.route('/what_can_i_cook', methods=['GET'])
+@app.route('/sessions/<session_id>/what_can_i_cook', methods=['GET'])
+def what_can_i_cook():
+    """Rank recipes by how much of their ingredients the pantry (or the shopping list) covers."""
+    pantry = [item.strip() for item in request.args.get('pantry', '').split(',') if item.strip()]
+    use_shopping_list = request.args.get('use_shopping_list', '').lower() in ('1', 'true', 'yes')
+    if use_shopping_list or not pantry:
+        # Without a pantry, the ingredients already on the shopping list are used
+        pantry += session_shopping_list().get_list()
+    if not pantry:
+        return jsonify({"error": "Provide 'pantry' ingredients or add some to the shopping list"}), 400
+
+    limit = clamp_per_page(request.args.get('limit', type=int))
+    fields = requested_fields()
+    catalog = current_catalog()
+    keys = set()
+    rows = set()
+    unknown = []
+    for item in sorted(set(pantry)):
+        key = fold(item)
+        row = catalog.index.ingredient_row(key)
+        if row is None:
+            unknown.append(item)
+        else:
+            keys.add(key)
+            rows.add(row)
+    ranked, total = catalog.index.pantry_coverage(sorted(rows), limit)
+
+    ingredient_keys = catalog.store.ingredient_vocab.keys()
+    ingredient_terms = catalog.store.ingredient_vocab.terms
+    recipes = []
+    for position, available, needed in ranked:
+        missing = sorted({
+            ingredient_terms[ingredient_id] for ingredient_id in catalog.store.ingredient_ids_of(position)
+            if ingredient_keys[ingredient_id] not in keys
+        })
+        recipes.append(catalog.fragments.recipe(position, fields, {
+            'coverage': round(available / needed, 4),
+            'missing_count': needed - available,
+            'missing_ingredients': missing
+        }))
+
+    return recipes_response(recipes, total=total, unknown_ingredients=unknown)
 
 @app.route('/add_ingredients', methods=['POST'])
+@app.route('/sessions/<session_id>/add_ingredients', methods=['POST'])
 def add_ingredients():
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
@@ -98,15 +492,117 @@ def add_ingredients():
     
     if not ingredients:
         return jsonify({"error": "Ingredients array is empty"}), 400
-    
-    for ingredient in ingredients:
-        shopping_list_manager.add_ingredient(ingredient)
+
+    require_encodable(ingredients)
+    shopping_list_manager = session_shopping_list()
+    shopping_list_manager.add_ingredients(ingredients)
     
     return jsonify({
         "message": f"{len(ingredients)} ingredients added",
-        "shopping_list": shopping_list_manager.get_list()
+        **shopping_list_state(shopping_list_manager)
+    }), 200
+
+@app.route('/add_recipes', methods=['POST'])
+@app.route('/sessions/<session_id>/add_recipes', methods=['POST'])
+def add_recipes():
+    """Add the ingredients of whole recipes, given by id or name, to the shopping list."""
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid JSON"}), 400
+
+    recipe_ids = data.get('recipe_ids') or []
+    recipe_names = data.get('recipe_names') or []
+    if not isinstance(recipe_ids, list) or not isinstance(recipe_names, list):
+        return jsonify({"error": "recipe_ids and recipe_names must be arrays"}), 400
+    if not recipe_ids and not recipe_names:
+        return jsonify({"error": "No recipes provided, use 'recipe_ids' or 'recipe_names'"}), 400
+
+    catalog = current_catalog()
+    positions = []
+    not_found = []
+    for recipe_id in recipe_ids:
+        position = catalog.position_of(str(recipe_id))
+        if position is None:
+            not_found.append(recipe_id)
+        else:
+            positions.append(position)
+    for recipe_name in recipe_names:
+        position = catalog.position_of_name(recipe_name) if isinstance(recipe_name, str) else None
+        if position is None:
+            not_found.append(recipe_name)
+        else:
+            positions.append(position)
+
+    shopping_list_manager = session_shopping_list()
+    # One write for all recipes, returning only the items that weren't on the list yet
+    added = shopping_list_manager.add_ingredients(catalog.ingredients_of(positions))
+
+    return jsonify({
+        "recipes": sorted({catalog.store.ids[position] for position in positions}),
+        "not_found": not_found,
+        "added": added,
+        "revision": shopping_list_manager.revision()
     }), 200
 
+def admit_search(cost):
+    """Queue for a slot if the search is estimated to be expensive; cheap ones run right away."""
+    return search_queue.admit() if cost >= expensive_search_cost else nullcontext()
+
+def search_deadline():
+    """The perf_counter() time the current request's search must finish by, or None."""
+    if search_timeout <= 0:
+        return None
+    # Time spent queueing counts towards the deadline
+    return request.environ.get('metrics.start', time.perf_counter()) + search_timeout
+
+def search_positions(catalog, filters):
+    """Return positions of recipes matching normalized filters, served from the result cache."""
+    def compute():
+        with admit_search(catalog.index.estimate_cost(*filters)):
+            stages = StageTimings(search_deadline())
+            positions = catalog.index.search(*filters, stages=stages)
+        record_stages(stages)
+        return positions
+
+    return search_cache.get_or_compute((catalog.version, filters), compute)
+
+def ranked_listing(catalog, filters):
+    """Respond with one page of the best matching recipes, most relevant first.
+
+    Only the recipes up to the end of the requested page are selected from
+    the matches, so deep result sets are never fully sorted.
+    """
+    if request.args.get('cursor'):
+        return jsonify({"error": "cursor can't be used with sort=relevance, use page instead"}), 400
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = clamp_per_page(
+        request.args.get('per_page', type=int) or request.args.get('limit', type=int)
+    )
+    fields = requested_fields()
+
+    with admit_search(catalog.index.estimate_cost(*filters, fuzzy=True)):
+        stages = StageTimings(search_deadline())
+        ranked, total = catalog.index.rank(*filters, limit=page * per_page, stages=stages)
+    record_stages(stages)
+    recipes = (
+        catalog.fragments.recipe(position, fields, {'score': round(score, 4)})
+        for position, score in ranked[(page - 1) * per_page:]
+    )
+
+    total_pages = (total + per_page - 1) // per_page
+    return recipes_response(recipes, pagination={
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "total_pages": total_pages,
+        "has_next": page < total_pages,
+        "has_prev": page > 1,
+        "next_cursor": None
+    })
+
 @app.route('/search_recipes', methods=['GET'])
 def search_recipes():
     diet = request.args.get('diet')
@@ -115,85 +611,47 @@ def search_recipes():
     includes_ingredients = request.args.get('includes_ingredients')
     excludes_ingredients = request.args.get('excludes_ingredients')
     
-    # Get pagination parameters
-    page = request.args.get('page', 1, type=int)
-    per_page = 10  # Fixed limit of 10 recipes per page
-    
     if not any([diet, meal_type, name, includes_ingredients, excludes_ingredients]):
         return jsonify({"error": "Please provide at least one search parameter: 'diet', 'meal_type', 'name', 'includes_ingredients', or 'excludes_ingredients'"}), 400
     
-    filtered_recipes = recipes.copy()
-    
-    if diet:
-        filtered_recipes = [
-            recipe for recipe in filtered_recipes 
-            if recipe.get('diet') and any(d.lower() == diet.lower() for d in recipe['diet'])
-        ]
-    
-    if meal_type:
-        filtered_recipes = [
-            recipe for recipe in filtered_recipes 
-            if recipe.get('meal_type') and any(m.lower() == meal_type.lower() for m in recipe['meal_type'])
-        ]
-    
-    if name:
-        filtered_recipes = [
-            recipe for recipe in filtered_recipes 
-            if 'name' in recipe and recipe['name'] and name.lower() in recipe['name'].lower()
-        ]
-    
+    required_ingredients = None
     if includes_ingredients:
-        # Parse comma-separated ingredients and normalize case
-        required_ingredients = [ing.strip().lower() for ing in includes_ingredients.split(',') if ing.strip()]
-        filtered_recipes = [
-            recipe for recipe in filtered_recipes
-            if recipe.get('ingredients') and all(
-                any(req_ing in recipe_ing.lower() for recipe_ing in recipe['ingredients'])
-                for req_ing in required_ingredients
-            )
-        ]
-    
+        # Parse comma-separated ingredients, normalize_filters folds case and accents
+        required_ingredients = [ing.strip() for ing in includes_ingredients.split(',') if ing.strip()]
+
+    excluded_ingredients = None
     if excludes_ingredients:
-        # Parse comma-separated ingredients and normalize case
-        excluded_ingredients = [ing.strip().lower() for ing in excludes_ingredients.split(',') if ing.strip()]
-        filtered_recipes = [
-            recipe for recipe in filtered_recipes
-            if recipe.get('ingredients') and not any(
-                any(excl_ing in recipe_ing.lower() for recipe_ing in recipe['ingredients'])
-                for excl_ing in excluded_ingredients
-            )
-        ]
-    
-    # Apply pagination to filtered results
-    total_filtered = len(filtered_recipes)
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    paginated_recipes = filtered_recipes[start_index:end_index]
-    
-    # Calculate pagination info
-    total_pages = (total_filtered + per_page - 1) // per_page  # Ceiling division
-    has_next = page < total_pages
-    has_prev = page > 1
-    
-    return jsonify({
-        "recipes": paginated_recipes,
-        "pagination": {
-            "page": page,
-            "per_page": per_page,
-            "total": total_filtered,
-            "total_pages": total_pages,
-            "has_next": has_next,
-            "has_prev": has_prev
-        }
-    }), 200
+        # Parse comma-separated ingredients, normalize_filters folds case and accents
+        excluded_ingredients = [ing.strip() for ing in excludes_ingredients.split(',') if ing.strip()]
+
+    sort = request.args.get('sort')
+    if sort and sort != 'relevance':
+        return jsonify({"error": "sort must be 'relevance' or left out for catalog order"}), 400
+
+    catalog = current_catalog()
+    filters = normalize_filters(
+        diet=diet,
+        meal_type=meal_type,
+        name=name,
+        includes_ingredients=required_ingredients,
+        excludes_ingredients=excluded_ingredients
+    )
+    if sort == 'relevance':
+        return ranked_listing(catalog, filters)
+
+    matching_positions = search_positions(catalog, filters)
+    return recipe_listing(catalog, matching_positions)
 
 @app.route('/clear_shopping_list', methods=['POST'])
+@app.route('/sessions/<session_id>/clear_shopping_list', methods=['POST'])
 def clear_shopping_list():
+    shopping_list_manager = session_shopping_list()
     shopping_list_manager.clear_list()
-    return jsonify({"message": "Shopping list cleared"}), 200
+    return jsonify({"message": "Shopping list cleared", "revision": shopping_list_manager.revision()}), 200
 
 # New endpoint to remove ingredients from the shopping list
 @app.route('/remove_ingredients', methods=['POST'])
+@app.route('/sessions/<session_id>/remove_ingredients', methods=['POST'])
 def remove_ingredients():
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
@@ -212,11 +670,123 @@ def remove_ingredients():
     if not ingredients:
         return jsonify({"error": "Ingredients array is empty"}), 400
 
+    require_encodable(ingredients)
+    shopping_list_manager = session_shopping_list()
     shopping_list_manager.remove_ingredients(ingredients)
 
+    return jsonify(shopping_list_state(shopping_list_manager)), 200
+
+# Operations allowed in a batch, with the HTTP method they are run with
+BATCH_OPERATIONS = {
+    'get_shopping_list': 'GET',
+    'shopping_list_changes': 'GET',
+    'get_recipes': 'GET',
+    'get_recipe': 'GET',
+    'search_recipes': 'GET',
+    'what_can_i_cook': 'GET',
+    'get_all_ingredients': 'GET',
+    'get_all_diets': 'GET',
+    'get_recipe_names': 'GET',
+    'add_ingredients': 'POST',
+    'add_recipes': 'POST',
+    'remove_ingredients': 'POST',
+    'clear_shopping_list': 'POST',
+}
+MAX_BATCH_OPERATIONS = 50
+
+def run_batch_operation(operation):
+    """Run one batch operation through its endpoint and return its result entry."""
+    if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+        return {"status": 400, "error": f"Unknown operation. Available operations: {', '.join(BATCH_OPERATIONS)}"}
+    params = operation.get('params') or {}
+    if not isinstance(params, dict):
+        return {"status": 400, "error": "Operation params must be an object"}
+
+    name = operation['op']
+    method = BATCH_OPERATIONS[name]
+    options = {'method': method, 'headers': {'X-Session-Id': g.session_id}}
+    if method == 'GET':
+        options['query_string'] = {
+            key: ','.join(map(str, value)) if isinstance(value, list) else value
+            for key, value in params.items()
+        }
+    else:
+        options['json'] = params
+    # The nested request shares this request's app context, and so its pinned catalog
+    try:
+        with app.test_request_context(f'/{name}', **options):
+            response = app.full_dispatch_request()
+    except Exception as e:
+        print(f"Error in batch operation {name}: {e}")
+        return {"status": 500, "error": "Internal server error"}
+    payload = response.get_json(silent=True) or {}
+    if response.status_code >= 400:
+        return {"status": response.status_code, "error": payload.get("error", response.status)}
+    return {"status": response.status_code, "result": payload}
+
+@app.route('/batch', methods=['POST'])
+@app.route('/sessions/<session_id>/batch', methods=['POST'])
+def batch():
+    """Run several operations in one request, in order, against one catalog generation."""
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    data = request.get_json()
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"error": "Provide a non-empty 'operations' array"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"error": f"At most {MAX_BATCH_OPERATIONS} operations per batch"}), 400
+
+    session_shopping_list()
+    catalog = current_catalog()
     return jsonify({
-        "shopping_list": shopping_list_manager.get_list()
+        "version": catalog.version,
+        "results": [run_batch_operation(operation) for operation in operations]
     }), 200
 
+@app.route('/admin/reload_recipes', methods=['POST'])
+def reload_recipes():
+    """Re-read the recipe CSV and swap in the new catalog if it changed."""
+    result = catalog_manager.reload()
+    return jsonify(result), 500 if 'error' in result else 200
+
+@app.route('/admin/cache_stats', methods=['GET'])
+def cache_stats():
+    """Report hit/miss counters and size of the search result and response caches."""
+    return jsonify({"search_cache": search_cache.stats(), "response_cache": response_cache.stats()}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrics of this worker process in the Prometheus text format."""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profiling', methods=['POST'])
+def configure_profiling():
+    """Change the share of profiled requests at runtime, e.g. {"sample_rate": 0.01}; 0 turns it off."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request must be a JSON object"}), 400
+    sample_rate = data.get('sample_rate')
+    if sample_rate is not None and (isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float))):
+        return jsonify({"error": "sample_rate must be a number between 0 and 1"}), 400
+    profiler.configure(sample_rate, reset=bool(data.get('reset')))
+    return jsonify({"sample_rate": profiler.sample_rate, "profiled_requests": profiler.profiled}), 200
+
+@app.route('/admin/profile', methods=['GET'])
+def profile_report():
+    """Aggregated cProfile statistics of the sampled requests, as text."""
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'calls'):
+        return jsonify({"error": "sort must be one of cumulative, tottime, calls"}), 400
+    limit = request.args.get('limit', 30, type=int)
+    return app.response_class(profiler.report(sort, limit), mimetype='text/plain')
+
+@app.route('/admin/ingest_report', methods=['GET'])
+def ingest_report():
+    """Report loaded and rejected rows of the current catalog."""
+    catalog = current_catalog()
+    return jsonify({"version": catalog.version, "report": catalog.report}), 200
+
 if __name__ == '__main__':
     app.run(debug=True, port=8001)
\ No newline at end of file
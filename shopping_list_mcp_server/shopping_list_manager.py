@@ -1,26 +1,148 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from storage import InMemoryBackend
+
+# Session used by clients that don't identify themselves
+DEFAULT_SESSION = 'default'
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,128}$')
+
+# Seconds between revision checks while waiting for a change; changes made by
+# other processes sharing the backend are only noticed this way
+CHANGE_POLL_INTERVAL = 0.5
+
+
 class ShoppingListManager:
-    def __init__(self):
-        self.shopping_list = set()
+    """The shopping list of one session, stored in a pluggable backend.
+
+    The backend does the locking (InMemoryBackend) or transactions
+    (SQLiteBackend), so a manager is safe to use from several threads.
+    Every change bumps the list's revision; `changes_since` returns what
+    changed after a revision and `wait_for_change` blocks until it changes.
+    """
+
+    def __init__(self, session_id=DEFAULT_SESSION, backend=None):
+        self.session_id = session_id
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self._changed = threading.Condition()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
 
     def add_ingredient(self, ingredient):
         """Add an ingredient to the shopping list. No duplicates allowed."""
         if ingredient and isinstance(ingredient, str):
-            self.shopping_list.add(ingredient.strip())
+            self.backend.add(self.session_id, [ingredient.strip()])
+            self._notify()
             return True
         return False
 
+    def add_ingredients(self, ingredients):
+        """Add several ingredients in one write and return those that were newly added."""
+        valid = [i.strip() for i in ingredients if i and isinstance(i, str)]
+        if not valid:
+            return []
+        added = self.backend.add(self.session_id, valid)
+        self._notify()
+        return added
+
     def get_list(self):
         """Get the current shopping list as a sorted list."""
-        return sorted(self.shopping_list)
+        return self.backend.items(self.session_id)
 
     def clear_list(self):
         """Clear the shopping list."""
-        self.shopping_list = set()
+        self.backend.clear(self.session_id)
+        self._notify()
 
     def remove_ingredients(self, ingredients):
         """Remove specified ingredients from the shopping list. Ignore any not present."""
         if not isinstance(ingredients, list):
             return False
-        for ingredient in ingredients:
-            self.shopping_list.discard(ingredient)
-        return True
\ No newline at end of file
+        # Anything but a string can't be on the list
+        self.backend.remove(self.session_id, [i for i in ingredients if isinstance(i, str)])
+        self._notify()
+        return True
+
+    def revision(self):
+        """Return the current revision of the list."""
+        return self.backend.revision(self.session_id)
+
+    def changes_since(self, revision):
+        """Return the net change of the list after `revision`.
+
+        Gives {"revision", "added", "removed"} with sorted items, or
+        {"revision", "reset": True, "shopping_list"} when the change log no
+        longer reaches back to `revision` (or it is unknown). Applying a
+        change twice is harmless: adding an item already on the list or
+        removing one that isn't changes nothing.
+        """
+        current, changes = self.backend.changes(self.session_id, revision)
+        if changes is None:
+            return {"revision": current, "reset": True, "shopping_list": self.get_list()}
+        # An item added and removed again (or the reverse) since `revision` didn't change
+        first, last = {}, {}
+        for _, operation, items in changes:
+            for item in items:
+                first.setdefault(item, operation)
+                last[item] = operation
+        return {
+            "revision": current,
+            "added": sorted(item for item, operation in last.items() if operation == first[item] == 'add'),
+            "removed": sorted(item for item, operation in last.items() if operation == first[item] == 'remove')
+        }
+
+    def wait_for_change(self, revision, timeout, stop=None):
+        """Block until the list's revision differs from `revision` or `timeout` seconds passed; return it.
+
+        Also returns soon after the `stop` event (e.g. the client disconnected) is set.
+        """
+        # NaN would never compare as expired and turn the wait into a busy loop
+        if not timeout > 0:
+            return self.revision()
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                current = self.revision()
+                remaining = deadline - time.monotonic()
+                if current != revision or remaining <= 0 or (stop is not None and stop.is_set()):
+                    return current
+                self._changed.wait(min(remaining, CHANGE_POLL_INTERVAL))
+
+
+class ShoppingListRegistry:
+    """Shopping lists of all sessions, sharing one storage backend.
+
+    Managers of the `max_sessions` most recently used sessions are kept; a
+    forgotten one is recreated on its next use, its list stays in the backend.
+    A waiter still holding a forgotten manager notices changes by polling.
+    """
+
+    def __init__(self, backend=None, max_sessions=10_000):
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.max_sessions = max_sessions
+        self._lists = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_valid_session_id(session_id):
+        return isinstance(session_id, str) and bool(SESSION_ID_PATTERN.match(session_id))
+
+    def get(self, session_id=DEFAULT_SESSION):
+        """Return the shopping list of the session."""
+        with self._lock:
+            shopping_list = self._lists.get(session_id)
+            if shopping_list is None:
+                shopping_list = self._lists[session_id] = ShoppingListManager(session_id, self.backend)
+                if len(self._lists) > self.max_sessions:
+                    self._lists.popitem(last=False)
+            else:
+                self._lists.move_to_end(session_id)
+        return shopping_list
+
+    def __len__(self):
+        return len(self._lists)
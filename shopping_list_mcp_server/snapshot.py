@@ -0,0 +1,272 @@
+"""Versioned binary snapshot of the recipe catalog.
+
+The snapshot holds the RecipeStore columns and the RecipeIndex postings as raw
+arrays. At startup the file is memory-mapped and the arrays are used in place
+through memoryviews, so booting does not parse the CSV and every worker
+process shares the same page-cache pages.
+
+Build it offline with:
+
+    python shopping_list_mcp_server/snapshot.py data/Recipes.csv
+
+A catalog merged from several CSVs (a directory or manifest) gets a single
+snapshot, tagged with a digest over all of its source files.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from recipe_loader import IngestReport, RecipeStore, Vocabulary, load_sources, resolve_data_path, resolve_sources
+from recipe_index import PostingLists, RecipeIndex, SubstringIndex
+
+SNAPSHOT_MAGIC = b'RCPSNAP\0'
+SNAPSHOT_VERSION = 3
+
+# magic, format version, manifest length, SHA-256 of the source CSV
+_HEADER = struct.Struct('<8sII32s')
+_ALIGNMENT = 8
+_STRING_SEPARATOR = '\0'
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing, corrupt, stale or from another format version."""
+
+
+def snapshot_path_for(csv_path):
+    """Default snapshot location next to the CSV file (or the directory or manifest of sources)."""
+    csv_path = os.path.normpath(csv_path)
+    if os.path.isdir(csv_path):
+        return csv_path + '.snapshot'
+    return os.path.splitext(csv_path)[0] + '.snapshot'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def sources_sha256(paths):
+    """Digest of a catalog's source files; a single CSV keeps its plain file digest."""
+    if len(paths) == 1:
+        return file_sha256(paths[0])
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8') + b'\0' + file_sha256(path))
+    return digest.digest()
+
+
+class SnapshotWriter:
+    """Collects named sections and writes them as one aligned binary file."""
+
+    def __init__(self, meta=None):
+        self.meta = meta or {}
+        self.sections = []
+
+    def add_array(self, name, values, typecode):
+        data = values.tobytes() if hasattr(values, 'tobytes') else array(typecode, values).tobytes()
+        self.sections.append((name, {'kind': 'array', 'typecode': typecode}, data))
+
+    def add_strings(self, name, strings):
+        for string in strings:
+            if _STRING_SEPARATOR in string:
+                raise ValueError(f"Section {name!r} contains a NUL character")
+        data = _STRING_SEPARATOR.join(strings).encode('utf-8')
+        self.sections.append((name, {'kind': 'strings', 'count': len(strings)}, data))
+
+    def add_bytes(self, name, data):
+        self.sections.append((name, {'kind': 'bytes'}, bytes(data)))
+
+    def add_postings(self, name, postings):
+        self.add_array(f'{name}.offsets', postings.offsets, 'I')
+        self.add_array(f'{name}.values', postings.values, 'I')
+
+    def write(self, path, csv_digest):
+        """Write the snapshot atomically: readers see either the old or the new file."""
+        manifest = {
+            'byteorder': sys.byteorder,
+            'itemsizes': {typecode: array(typecode).itemsize for typecode in 'IQ'},
+            'meta': self.meta,
+            'sections': {}
+        }
+        # Section offsets are relative to the aligned end of the manifest
+        offset = 0
+        for name, entry, data in self.sections:
+            manifest['sections'][name] = dict(entry, offset=offset, length=len(data))
+            offset += _padded(len(data))
+        manifest_bytes = json.dumps(manifest).encode('utf-8')
+        padding = _padded(_HEADER.size + len(manifest_bytes)) - _HEADER.size - len(manifest_bytes)
+
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(manifest_bytes), csv_digest))
+            file.write(manifest_bytes)
+            file.write(b'\0' * padding)
+            for name, _, data in self.sections:
+                file.write(data)
+                file.write(b'\0' * (_padded(len(data)) - len(data)))
+        os.replace(temp_path, path)
+
+
+class SnapshotReader:
+    """Memory-maps a snapshot file and exposes its sections without copying."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            try:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise SnapshotError(f"Empty snapshot file {path}") from e
+        if len(self.map) < _HEADER.size:
+            raise SnapshotError(f"Truncated snapshot file {path}")
+        magic, version, manifest_length, self.csv_digest = _HEADER.unpack_from(self.map)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{path} is not a recipe snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Snapshot format version {version} is not supported")
+        try:
+            manifest = json.loads(self.map[_HEADER.size:_HEADER.size + manifest_length])
+        except ValueError as e:
+            raise SnapshotError(f"Corrupt snapshot manifest in {path}") from e
+        itemsizes = {typecode: array(typecode).itemsize for typecode in 'IQ'}
+        if manifest['byteorder'] != sys.byteorder or manifest['itemsizes'] != itemsizes:
+            raise SnapshotError(f"Snapshot {path} was built on an incompatible platform")
+        self.meta = manifest['meta']
+        self.sections = manifest['sections']
+        self.payload_start = _padded(_HEADER.size + manifest_length)
+        self.view = memoryview(self.map)
+
+    def _section(self, name, kind):
+        entry = self.sections.get(name)
+        if entry is None or entry['kind'] != kind:
+            raise SnapshotError(f"Snapshot is missing section {name!r}")
+        start = self.payload_start + entry['offset']
+        return entry, self.view[start:start + entry['length']]
+
+    def array(self, name):
+        entry, data = self._section(name, 'array')
+        return data.cast(entry['typecode'])
+
+    def strings(self, name):
+        entry, data = self._section(name, 'strings')
+        if not entry['count']:
+            return []
+        return str(data, 'utf-8').split(_STRING_SEPARATOR)
+
+    def bytes(self, name):
+        return self._section(name, 'bytes')[1]
+
+    def postings(self, name):
+        return PostingLists(self.array(f'{name}.offsets'), self.array(f'{name}.values'))
+
+
+def write_snapshot(path, store, index, csv_digest, meta=None):
+    """Serialize a RecipeStore and its RecipeIndex to `path`.
+
+    `meta` is a JSON-serializable dict stored alongside, e.g. the ingest report.
+    """
+    writer = SnapshotWriter(meta)
+    writer.add_strings('store.ids', store.ids)
+    writer.add_strings('store.names', store.names)
+    for column in ('ingredient', 'diet', 'meal_type'):
+        writer.add_strings(f'store.{column}_vocab', getattr(store, f'{column}_vocab').terms)
+        writer.add_array(f'store.{column}_offsets', getattr(store, f'{column}_offsets'), 'I')
+        writer.add_array(f'store.{column}_ids', getattr(store, f'{column}_ids'), 'I')
+    writer.add_array('store.steps_offsets', store.steps_offsets, 'Q')
+    writer.add_bytes('store.steps_blob', store.steps_blob)
+
+    writer.add_array('index.size', [index.size], 'Q')
+    writer.add_strings('index.diet_keys', index.diet_keys)
+    writer.add_postings('index.diet_postings', index.diet_postings)
+    writer.add_strings('index.meal_type_keys', index.meal_type_keys)
+    writer.add_postings('index.meal_type_postings', index.meal_type_postings)
+    for name in ('names', 'ingredients'):
+        substring_index = getattr(index, name)
+        writer.add_strings(f'index.{name}.terms', substring_index.terms)
+        writer.add_postings(f'index.{name}.postings', substring_index.postings)
+        writer.add_strings(f'index.{name}.gram_keys', substring_index.gram_keys)
+        writer.add_postings(f'index.{name}.gram_postings', substring_index.gram_postings)
+    writer.add_array('index.with_ingredients', index.with_ingredients, 'I')
+    writer.write(path, csv_digest)
+
+
+def read_snapshot(path, expected_digest=None):
+    """Map a snapshot and return the (store, index, meta) it holds.
+
+    Raises SnapshotError when the file is unusable or, if `expected_digest`
+    is given, when it was built from a different CSV.
+    """
+    reader = SnapshotReader(path)
+    if expected_digest is not None and reader.csv_digest != expected_digest:
+        raise SnapshotError(f"Snapshot {path} is stale")
+
+    store = RecipeStore()
+    store.ids = reader.strings('store.ids')
+    store.names = reader.strings('store.names')
+    for column in ('ingredient', 'diet', 'meal_type'):
+        setattr(store, f'{column}_vocab', Vocabulary.from_terms(reader.strings(f'store.{column}_vocab')))
+        setattr(store, f'{column}_offsets', reader.array(f'store.{column}_offsets'))
+        setattr(store, f'{column}_ids', reader.array(f'store.{column}_ids'))
+    store.steps_offsets = reader.array('store.steps_offsets')
+    store.steps_blob = reader.bytes('store.steps_blob')
+
+    substring_indexes = [
+        SubstringIndex(
+            reader.strings(f'index.{name}.terms'),
+            reader.postings(f'index.{name}.postings'),
+            reader.strings(f'index.{name}.gram_keys'),
+            reader.postings(f'index.{name}.gram_postings')
+        )
+        for name in ('names', 'ingredients')
+    ]
+    index = RecipeIndex(
+        reader.array('index.size')[0],
+        reader.strings('index.diet_keys'), reader.postings('index.diet_postings'),
+        reader.strings('index.meal_type_keys'), reader.postings('index.meal_type_postings'),
+        *substring_indexes,
+        reader.array('index.with_ingredients')
+    )
+    return store, index, reader.meta
+
+
+def build_snapshot(csv_path, snapshot_path=None):
+    """Compile the CSV (or directory or manifest of CSVs) into a snapshot and return the ingest report."""
+    snapshot_path = snapshot_path or snapshot_path_for(resolve_data_path(csv_path))
+    sources = resolve_sources(csv_path)
+    digest = sources_sha256(sources)
+    report = IngestReport()
+    store = load_sources(sources, report)
+    write_snapshot(snapshot_path, store, RecipeIndex.build(store), digest, report.to_dict())
+    return report
+
+
+def _padded(length):
+    return (length + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a recipe CSV into a binary snapshot.")
+    parser.add_argument('csv_path', nargs='?', default='data/Recipes.csv',
+                        help="CSV file, directory of CSVs or manifest, relative to the repository root "
+                             "(default: data/Recipes.csv)")
+    parser.add_argument('-o', '--output', help="Snapshot path (default: next to the CSV)")
+    args = parser.parse_args()
+
+    output = args.output or snapshot_path_for(resolve_data_path(args.csv_path))
+    report = build_snapshot(args.csv_path, output)
+    print(f"Wrote {output}: {report.loaded} recipes ({len(report.rejected)} rejected), "
+          f"{os.path.getsize(output)} bytes")
+    for rejected in report.rejected:
+        source = f"{rejected['source']} " if 'source' in rejected else ''
+        print(f"  {source}line {rejected['line']} (id {rejected['id']!r}): {rejected['reason']}")
+
+
+if __name__ == '__main__':
+    main()
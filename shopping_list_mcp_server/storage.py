@@ -0,0 +1,451 @@
+"""Storage backends for shopping lists.
+
+A backend keeps the items of every session's shopping list. Two are provided:
+
+- InMemoryBackend keeps the lists in process memory (lost on restart).
+- SQLiteBackend stores them in an SQLite database so they survive restarts
+  and are shared by every worker process using the same file. Writes are
+  group-committed by a single writer thread: all writes that queue up while
+  a transaction is being committed go into the next transaction together.
+
+Every write that changes a list bumps the session's revision and records the
+added or removed items under it in a change log, so clients can fetch only
+what changed since the revision they last saw. The log keeps the last
+CHANGE_LOG_SIZE revisions of each session.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+
+# Revisions kept in each session's change log
+CHANGE_LOG_SIZE = 1000
+
+
+class ShoppingListBackend:
+    """Interface of a shopping list store. Items are kept unique per session."""
+
+    def items(self, session_id):
+        """Return the session's items sorted by code point."""
+        raise NotImplementedError
+
+    def add(self, session_id, items):
+        """Add items and return those that weren't on the list yet, in input order."""
+        raise NotImplementedError
+
+    def remove(self, session_id, items):
+        """Remove items and return those that were on the list, in input order."""
+        raise NotImplementedError
+
+    def clear(self, session_id):
+        raise NotImplementedError
+
+    def revision(self, session_id):
+        """Return the session's revision, 0 for a list that never changed."""
+        raise NotImplementedError
+
+    def changes(self, session_id, since):
+        """Return (revision, changes) with the changes made after revision `since`.
+
+        `changes` is a list of (revision, operation, items) in revision order,
+        where operation is 'add' or 'remove' (a clear removes every item), or
+        None when the change log no longer reaches back to `since`.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _reachable(since, revision, oldest):
+    """Whether a log whose oldest kept revision is `oldest` holds every change after `since`."""
+    if since == revision:
+        return True
+    return since < revision and oldest is not None and oldest <= since + 1
+
+
+class SortedItemSet:
+    """Unique items kept in sorted order on every change, so reading is a copy instead of a sort.
+
+    Also holds the list's revision and its recent changes.
+    """
+
+    def __init__(self):
+        self.members = set()
+        self.sorted = []
+        self.revision = 0
+        self.log = deque(maxlen=CHANGE_LOG_SIZE)
+
+    def record(self, operation, items):
+        if items:
+            self.revision += 1
+            self.log.append((self.revision, operation, tuple(items)))
+
+    def add(self, item):
+        if item in self.members:
+            return False
+        self.members.add(item)
+        insort(self.sorted, item)
+        return True
+
+    def discard(self, item):
+        if item not in self.members:
+            return False
+        self.members.discard(item)
+        del self.sorted[bisect_left(self.sorted, item)]
+        return True
+
+
+class InMemoryBackend(ShoppingListBackend):
+    """Shopping lists held in process memory, guarded by one lock per session."""
+
+    def __init__(self):
+        self._lists = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _session(self, session_id):
+        """Return the session's items and lock, creating them for its first write."""
+        item_set = self._lists.get(session_id)
+        if item_set is None:
+            with self._lock:
+                # The lock is registered first, so a reader finding the items finds it too
+                self._locks.setdefault(session_id, threading.Lock())
+                item_set = self._lists.setdefault(session_id, SortedItemSet())
+        return item_set, self._locks[session_id]
+
+    def _existing(self, session_id):
+        """Like _session, but (None, None) for a session that was never written, without creating it."""
+        item_set = self._lists.get(session_id)
+        if item_set is None:
+            return None, None
+        return item_set, self._locks[session_id]
+
+    def items(self, session_id):
+        item_set, lock = self._existing(session_id)
+        if item_set is None:
+            return []
+        with lock:
+            return list(item_set.sorted)
+
+    def add(self, session_id, items):
+        item_set, lock = self._session(session_id)
+        with lock:
+            added = [item for item in items if item_set.add(item)]
+            item_set.record('add', added)
+            return added
+
+    def remove(self, session_id, items):
+        item_set, lock = self._session(session_id)
+        with lock:
+            removed = [item for item in items if item_set.discard(item)]
+            item_set.record('remove', removed)
+            return removed
+
+    def clear(self, session_id):
+        item_set, lock = self._session(session_id)
+        with lock:
+            item_set.record('remove', item_set.sorted)
+            item_set.members = set()
+            item_set.sorted = []
+
+    def revision(self, session_id):
+        item_set, _ = self._existing(session_id)
+        return item_set.revision if item_set is not None else 0
+
+    def changes(self, session_id, since):
+        item_set, lock = self._existing(session_id)
+        if item_set is None:
+            return 0, ([] if _reachable(since, 0, None) else None)
+        with lock:
+            oldest = item_set.log[0][0] if item_set.log else None
+            if not _reachable(since, item_set.revision, oldest):
+                return item_set.revision, None
+            return item_set.revision, [change for change in item_set.log if change[0] > since]
+
+
+class TimedBackend(ShoppingListBackend):
+    """Wraps a backend and reports how long each operation took to `observe(seconds, operation)`."""
+
+    def __init__(self, backend, observe):
+        self.backend = backend
+        self.observe = observe
+
+    def _timed(self, operation, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.observe(time.perf_counter() - start, operation)
+
+    def items(self, session_id):
+        return self._timed('items', self.backend.items, session_id)
+
+    def add(self, session_id, items):
+        return self._timed('add', self.backend.add, session_id, items)
+
+    def remove(self, session_id, items):
+        return self._timed('remove', self.backend.remove, session_id, items)
+
+    def clear(self, session_id):
+        return self._timed('clear', self.backend.clear, session_id)
+
+    def revision(self, session_id):
+        return self._timed('revision', self.backend.revision, session_id)
+
+    def changes(self, session_id, since):
+        return self._timed('changes', self.backend.changes, session_id, since)
+
+    def close(self):
+        self.backend.close()
+
+
+class _PendingWrite:
+    __slots__ = ('operation', 'session_id', 'items', 'result', 'error', 'done')
+
+    def __init__(self, operation, session_id, items):
+        self.operation = operation
+        self.session_id = session_id
+        self.items = items
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class SQLiteBackend(ShoppingListBackend):
+    """Durable shopping lists in an SQLite database with group-committed writes.
+
+    Each write waits until its transaction is committed, so once a request
+    returns its change is durable and visible to every worker. Reads use a
+    per-thread connection and, thanks to WAL mode, never wait for the writer.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS shopping_list_items (
+            session_id TEXT NOT NULL,
+            item TEXT NOT NULL,
+            PRIMARY KEY (session_id, item)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS shopping_list_revisions (
+            session_id TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS shopping_list_changes (
+            session_id TEXT NOT NULL,
+            revision INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            item TEXT NOT NULL,
+            PRIMARY KEY (session_id, revision, item)
+        ) WITHOUT ROWID
+        """,
+    )
+
+    def __init__(self, path, max_batch=256):
+        self.path = path
+        self.max_batch = max_batch
+        self.commits = 0
+        self.writes = 0
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        self._writer_pid = None
+        connection = self._connect()
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        connection.close()
+
+    def _ensure_writer(self):
+        """Start the writer thread in this process.
+
+        Started lazily so a backend created before the server forks its
+        workers gets a fresh queue, thread and connection in each of them.
+        """
+        if self._writer_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._writer_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._writer = threading.Thread(target=self._write_loop, name='shopping-list-writer', daemon=True)
+                self._writer.start()
+                self._writer_pid = os.getpid()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # With WAL, NORMAL keeps committed data across process crashes without an fsync per commit
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _reader(self):
+        connection = getattr(self._local, 'connection', None)
+        # Connections must not be shared with a forked child
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return connection
+
+    def items(self, session_id):
+        # The primary key index already yields items in code point order
+        # (BINARY collation of UTF-8), so this is a range scan without a sort
+        rows = self._reader().execute(
+            'SELECT item FROM shopping_list_items WHERE session_id = ? ORDER BY item',
+            (session_id,)
+        )
+        return [item for (item,) in rows]
+
+    def revision(self, session_id):
+        return self._revision(self._reader(), session_id)
+
+    @staticmethod
+    def _revision(connection, session_id):
+        row = connection.execute(
+            'SELECT revision FROM shopping_list_revisions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def changes(self, session_id, since):
+        connection = self._reader()
+        # One read transaction, so the revision and the log are from the same commit
+        connection.execute('BEGIN')
+        try:
+            revision = self._revision(connection, session_id)
+            (oldest,) = connection.execute(
+                'SELECT MIN(revision) FROM shopping_list_changes WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            if not _reachable(since, revision, oldest):
+                return revision, None
+            rows = connection.execute(
+                'SELECT revision, operation, item FROM shopping_list_changes '
+                'WHERE session_id = ? AND revision > ? ORDER BY revision, item',
+                (session_id, since)
+            ).fetchall()
+        finally:
+            connection.execute('COMMIT')
+        changes = []
+        for change_revision, operation, item in rows:
+            if changes and changes[-1][0] == change_revision:
+                changes[-1][2].append(item)
+            else:
+                changes.append((change_revision, operation, [item]))
+        return revision, changes
+
+    def add(self, session_id, items):
+        return self._submit('add', session_id, list(items))
+
+    def remove(self, session_id, items):
+        return self._submit('remove', session_id, list(items))
+
+    def clear(self, session_id):
+        self._submit('clear', session_id, [])
+
+    def _submit(self, operation, session_id, items):
+        self._ensure_writer()
+        write = _PendingWrite(operation, session_id, items)
+        self._queue.put(write)
+        write.done.wait()
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    def _write_loop(self):
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            # Everything that queued up during the previous commit joins this one
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            batch = [write for write in batch if write is not None]
+            if batch:
+                self._commit(connection, batch)
+            if stop:
+                connection.close()
+                return
+
+    def _commit(self, connection, batch):
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            for write in batch:
+                # A write that fails (e.g. an item that can't be encoded as UTF-8)
+                # is undone on its own, the rest of the group still commits
+                connection.execute('SAVEPOINT write')
+                try:
+                    write.result = self._apply(connection, write)
+                except Exception as e:
+                    connection.execute('ROLLBACK TO write')
+                    write.result = None
+                    write.error = e
+                connection.execute('RELEASE write')
+            connection.execute('COMMIT')
+            self.commits += 1
+            self.writes += len(batch)
+        except Exception as e:
+            # The transaction itself failed, so does every write in it; the
+            # writer thread must survive it and release the lock
+            try:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+            for write in batch:
+                write.result = None
+                write.error = e
+        finally:
+            for write in batch:
+                write.done.set()
+
+    @classmethod
+    def _apply(cls, connection, write):
+        if write.operation == 'clear':
+            removed = [item for (item,) in connection.execute(
+                'SELECT item FROM shopping_list_items WHERE session_id = ?', (write.session_id,)
+            )]
+            connection.execute('DELETE FROM shopping_list_items WHERE session_id = ?', (write.session_id,))
+            cls._record(connection, write.session_id, 'remove', removed)
+            return None
+        if write.operation == 'add':
+            statement = 'INSERT OR IGNORE INTO shopping_list_items (session_id, item) VALUES (?, ?)'
+        else:
+            statement = 'DELETE FROM shopping_list_items WHERE session_id = ? AND item = ?'
+        changed = []
+        for item in write.items:
+            if connection.execute(statement, (write.session_id, item)).rowcount:
+                changed.append(item)
+        cls._record(connection, write.session_id, write.operation, changed)
+        return changed
+
+    @classmethod
+    def _record(cls, connection, session_id, operation, items):
+        """Bump the session's revision and log the changed items under it."""
+        if not items:
+            return
+        revision = cls._revision(connection, session_id) + 1
+        connection.execute(
+            'INSERT OR REPLACE INTO shopping_list_revisions (session_id, revision) VALUES (?, ?)',
+            (session_id, revision)
+        )
+        connection.executemany(
+            'INSERT INTO shopping_list_changes (session_id, revision, operation, item) VALUES (?, ?, ?, ?)',
+            [(session_id, revision, operation, item) for item in items]
+        )
+        connection.execute(
+            'DELETE FROM shopping_list_changes WHERE session_id = ? AND revision <= ?',
+            (session_id, revision - CHANGE_LOG_SIZE)
+        )
+
+    def close(self):
+        """Commit outstanding writes and stop the writer thread."""
+        if self._writer_pid == os.getpid():
+            self._queue.put(None)
+            self._writer.join()
+            self._writer_pid = None
@@ -0,0 +1,134 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from admission import Overloaded, RateLimiter, WorkQueue
+import server
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_bucket_refills_at_rate(self):
+        limiter = RateLimiter(rate=2, burst=3)
+        self.assertEqual([limiter.acquire('a', now=0) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.acquire('a', now=0), 0.5)
+        # Other clients have their own bucket
+        self.assertEqual(limiter.acquire('b', now=0), 0)
+        self.assertEqual(limiter.acquire('a', now=0.5), 0)
+        self.assertAlmostEqual(limiter.acquire('a', now=0.5), 0.5)
+        # Never more than a full burst
+        self.assertEqual([limiter.acquire('a', now=100) for _ in range(4)], [0, 0, 0, 1 / 2])
+
+    def test_forgets_least_recent_clients(self):
+        limiter = RateLimiter(rate=1, burst=1, max_clients=2)
+        for client in ('a', 'b', 'c'):
+            limiter.acquire(client, now=0)
+        self.assertEqual(limiter.acquire('a', now=0), 0)
+        self.assertGreater(limiter.acquire('c', now=0), 0)
+
+
+class TestWorkQueue(unittest.TestCase):
+    def test_sheds_when_queue_is_full(self):
+        queue = WorkQueue(concurrency=1, max_waiting=0, timeout=1)
+        with queue.admit():
+            self.assertEqual(queue.running, 1)
+            with self.assertRaises(Overloaded) as caught:
+                with queue.admit():
+                    pass
+            self.assertEqual(caught.exception.retry_after, 1)
+        with queue.admit():
+            pass
+        self.assertEqual(queue.running, 0)
+
+    def test_waits_for_a_free_slot(self):
+        queue = WorkQueue(concurrency=1, max_waiting=1, timeout=5)
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            with queue.admit():
+                started.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        started.wait()
+        threading.Timer(0.05, release.set).start()
+        with queue.admit():
+            self.assertEqual(queue.running, 1)
+        holder.join()
+        self.assertEqual(queue.waiting, 0)
+
+    def test_times_out(self):
+        queue = WorkQueue(concurrency=1, max_waiting=1, timeout=0.01)
+        with queue.admit():
+            with self.assertRaises(Overloaded):
+                with queue.admit():
+                    pass
+        self.assertEqual(queue.waiting, 0)
+
+
+class TestServerAdmission(unittest.TestCase):
+    def setUp(self):
+        self.client = server.app.test_client()
+        self.saved = (server.rate_limiter, server.search_queue, server.expensive_search_cost, server.search_timeout,
+                      server.change_waits)
+        server.search_cache.clear()
+
+    def tearDown(self):
+        (server.rate_limiter, server.search_queue, server.expensive_search_cost, server.search_timeout,
+         server.change_waits) = self.saved
+        server.search_cache.clear()
+
+    def test_rate_limited_with_retry_after(self):
+        server.rate_limiter = RateLimiter(rate=0.5, burst=2)
+        statuses = [self.client.get('/get_shopping_list').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.client.get('/get_shopping_list')
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertIn('error', response.get_json())
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_batch_operations_count_against_the_client(self):
+        server.rate_limiter = RateLimiter(rate=0.01, burst=3)
+        response = self.client.post('/batch', json={"operations": [{"op": "get_shopping_list"}] * 3})
+        self.assertEqual([result["status"] for result in response.get_json()["results"]], [200, 200, 429])
+
+    def test_expensive_search_is_shed_when_busy(self):
+        server.expensive_search_cost = 1
+        server.search_queue = WorkQueue(concurrency=1, max_waiting=0, timeout=1)
+        with server.search_queue.admit():
+            response = self.client.get('/search_recipes', query_string={'includes_ingredients': 's'})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '1')
+            # Cheap calls don't queue
+            self.assertEqual(self.client.get('/get_shopping_list').status_code, 200)
+            self.assertEqual(self.client.get('/search_recipes', query_string={'diet': 'neexistuje'}).status_code, 200)
+        self.assertEqual(self.client.get('/search_recipes', query_string={'includes_ingredients': 's'}).status_code, 200)
+
+    def test_change_waits_are_capped(self):
+        server.change_waits = WorkQueue(concurrency=1, max_waiting=0, timeout=1)
+        with server.change_waits.admit():
+            response = self.client.get('/shopping_list_changes', query_string={'since': 0, 'wait': 1})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '1')
+            self.assertEqual(self.client.get('/shopping_list_changes/stream').status_code, 503)
+            # Without waiting nothing is held
+            self.assertEqual(self.client.get('/shopping_list_changes', query_string={'since': 0}).status_code, 200)
+        response = self.client.get('/shopping_list_changes/stream')
+        self.assertEqual(server.change_waits.running, 1)
+        response.close()
+        self.assertEqual(server.change_waits.running, 0)
+
+    def test_search_deadline(self):
+        server.search_timeout = 1e-9
+        response = self.client.get('/search_recipes', query_string={'name': 'gulas', 'diet': 'masité'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        response = self.client.get('/search_recipes', query_string={'name': 'gulas', 'sort': 'relevance'})
+        self.assertEqual(response.status_code, 503)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import json
+import threading
 import unittest
 import requests
 import time
@@ -213,6 +215,26 @@ class TestMCPServer(unittest.TestCase):
         # Verify names are sorted
         self.assertEqual(data["recipe_names"], sorted(data["recipe_names"]))
 
+    def test_catalog_endpoints_support_etags(self):
+        """Test ETag and If-None-Match handling on catalog-wide endpoints"""
+        for endpoint in ["get_all_ingredients", "get_all_diets", "get_recipe_names"]:
+            response = requests.get(f"{self.base_url}/{endpoint}")
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers.get("ETag")
+            self.assertTrue(etag)
+
+            # Same body and ETag when served from the cache
+            cached = requests.get(f"{self.base_url}/{endpoint}")
+            self.assertEqual(cached.headers.get("ETag"), etag)
+            self.assertEqual(cached.json(), response.json())
+
+            not_modified = requests.get(f"{self.base_url}/{endpoint}", headers={"If-None-Match": etag})
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified.content, b"")
+
+            modified = requests.get(f"{self.base_url}/{endpoint}", headers={"If-None-Match": '"stale"'})
+            self.assertEqual(modified.status_code, 200)
+
     def test_remove_ingredients(self):
         """Test removing ingredients from shopping list"""
         # Add ingredients first
@@ -254,5 +276,307 @@ class TestMCPServer(unittest.TestCase):
         self.assertEqual(data["pagination"]["per_page"], 10)
         self.assertLessEqual(len(data["recipes"]), 10)
 
+    def test_search_results_are_cached_across_pages(self):
+        """Test that paging through a search is served from the result cache"""
+        params = {"includes_ingredients": "Sůl,Cibule", "meal_type": "Hlavní chod"}
+        first = requests.get(f"{self.base_url}/search_recipes", params=dict(params, page=1)).json()
+        hits_before = requests.get(f"{self.base_url}/admin/cache_stats").json()["search_cache"]["hits"]
+
+        # Same filters in a different case and order, next page
+        params = {"includes_ingredients": "cibule,sůl", "meal_type": "hlavní chod", "page": 2}
+        second = requests.get(f"{self.base_url}/search_recipes", params=params).json()
+        hits_after = requests.get(f"{self.base_url}/admin/cache_stats").json()["search_cache"]["hits"]
+
+        self.assertEqual(hits_after, hits_before + 1)
+        self.assertEqual(second["pagination"]["total"], first["pagination"]["total"])
+        first_ids = {recipe["id"] for recipe in first["recipes"]}
+        self.assertFalse(first_ids & {recipe["id"] for recipe in second["recipes"]})
+
+    def test_reload_recipes_unchanged_csv(self):
+        """Test reloading recipes when the CSV did not change"""
+        response = requests.post(f"{self.base_url}/admin/reload_recipes")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertFalse(data["reloaded"])
+        self.assertEqual(data["report"]["rejected"], 0)
+
+        response = requests.get(f"{self.base_url}/admin/ingest_report")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], data["version"])
+
+    def test_cursor_pagination_covers_all_results(self):
+        """Test walking a search with cursors and a custom page size"""
+        params = {"includes_ingredients": "Sůl", "per_page": 7, "fields": "id,name"}
+        response = requests.get(f"{self.base_url}/search_recipes", params=params)
+        data = response.json()
+        total = data["pagination"]["total"]
+        self.assertGreater(total, 7)
+
+        seen = [recipe["id"] for recipe in data["recipes"]]
+        while data["pagination"]["next_cursor"]:
+            data = requests.get(f"{self.base_url}/search_recipes",
+                                params=dict(params, cursor=data["pagination"]["next_cursor"])).json()
+            self.assertLessEqual(len(data["recipes"]), 7)
+            seen.extend(recipe["id"] for recipe in data["recipes"])
+
+        self.assertEqual(len(seen), total)
+        self.assertEqual(len(set(seen)), total)
+        self.assertFalse(data["pagination"]["has_next"])
+
+    def test_per_page_is_bounded(self):
+        """Test that per_page/limit are clamped to the allowed range"""
+        data = requests.get(f"{self.base_url}/get_recipes", params={"per_page": 1000}).json()
+        self.assertEqual(data["pagination"]["per_page"], 100)
+        self.assertEqual(len(data["recipes"]), min(100, data["pagination"]["total"]))
+
+        data = requests.get(f"{self.base_url}/get_recipes", params={"limit": 3}).json()
+        self.assertEqual(data["pagination"]["per_page"], 3)
+        self.assertEqual(len(data["recipes"]), 3)
+
+    def test_field_projection(self):
+        """Test leaving out heavy fields with the fields parameter"""
+        data = requests.get(f"{self.base_url}/get_recipes", params={"fields": "id,name,ingredients"}).json()
+        for recipe in data["recipes"]:
+            self.assertEqual(set(recipe), {"id", "name", "ingredients"})
+
+        response = requests.get(f"{self.base_url}/get_recipes", params={"fields": "id,calories"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("calories", response.json()["error"])
+
+    def test_search_recipes_by_relevance(self):
+        """Test ranked search tolerating typos"""
+        response = requests.get(f"{self.base_url}/search_recipes",
+                                params={"name": "gulsh", "sort": "relevance", "per_page": 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn("guláš", data["recipes"][0]["name"])
+        self.assertIn("score", data["recipes"][0])
+        self.assertGreaterEqual(data["pagination"]["total"], 1)
+
+        response = requests.get(f"{self.base_url}/search_recipes", params={"name": "a", "sort": "random"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = requests.get(f"{self.base_url}/get_recipes", params={"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json())
+
+    def test_shopping_lists_are_per_session(self):
+        """Test that sessions identified by header or path have separate lists"""
+        requests.post(f"{self.base_url}/sessions/test-a/clear_shopping_list")
+        requests.post(f"{self.base_url}/clear_shopping_list", headers={"X-Session-Id": "test-b"})
+
+        requests.post(f"{self.base_url}/sessions/test-a/add_ingredients", json={"ingredients": ["Mléko"]})
+        requests.post(f"{self.base_url}/add_ingredients", json={"ingredients": ["Cibule"]},
+                      headers={"X-Session-Id": "test-b"})
+
+        # The header and the path address the same session
+        response = requests.get(f"{self.base_url}/get_shopping_list", headers={"X-Session-Id": "test-a"})
+        self.assertEqual(response.json()["shopping_list"], ["Mléko"])
+        response = requests.get(f"{self.base_url}/sessions/test-b/get_shopping_list")
+        self.assertEqual(response.json()["shopping_list"], ["Cibule"])
+        # The default session is untouched
+        response = requests.get(f"{self.base_url}/get_shopping_list")
+        self.assertEqual(response.json()["shopping_list"], [])
+
+    def test_invalid_session_id(self):
+        """Test that malformed session ids are rejected"""
+        response = requests.get(f"{self.base_url}/get_shopping_list", headers={"X-Session-Id": "bad id!"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json())
+
+    def test_unencodable_ingredients_rejected(self):
+        """Test that lone surrogates are rejected before reaching the storage backend"""
+        for endpoint in ("add_ingredients", "remove_ingredients"):
+            response = requests.post(f"{self.base_url}/{endpoint}", json={"ingredients": ["\ud800"]})
+            self.assertEqual(response.status_code, 400)
+        response = requests.post(f"{self.base_url}/add_ingredients", json={"ingredients": ["Mléko"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_recipe_by_id(self):
+        """Test looking up one recipe by its id"""
+        recipe = requests.get(f"{self.base_url}/get_recipes", params={"per_page": 1}).json()["recipes"][0]
+        response = requests.get(f"{self.base_url}/get_recipe", params={"id": recipe["id"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["recipe"], recipe)
+        response = requests.get(f"{self.base_url}/get_recipe", params={"id": "does-not-exist"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_add_recipes(self):
+        """Test adding the ingredients of whole recipes by id and name"""
+        recipes = requests.get(f"{self.base_url}/get_recipes", params={"per_page": 2}).json()["recipes"]
+        requests.post(f"{self.base_url}/add_ingredients", json={"ingredients": recipes[0]["ingredients"][:1]})
+
+        response = requests.post(
+            f"{self.base_url}/add_recipes",
+            json={"recipe_ids": [recipes[0]["id"], "does-not-exist"], "recipe_names": [recipes[1]["name"].upper()]}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        merged = set(recipes[0]["ingredients"]) | set(recipes[1]["ingredients"])
+        # Only the ingredients that weren't on the list yet are returned
+        self.assertEqual(data["added"], sorted(merged - set(recipes[0]["ingredients"][:1])))
+        self.assertEqual(data["recipes"], sorted([recipes[0]["id"], recipes[1]["id"]]))
+        self.assertEqual(data["not_found"], ["does-not-exist"])
+
+        response = requests.get(f"{self.base_url}/get_shopping_list")
+        self.assertEqual(response.json()["shopping_list"], sorted(merged))
+
+        response = requests.post(f"{self.base_url}/add_recipes", json={"recipe_ids": []})
+        self.assertEqual(response.status_code, 400)
+
+    def test_what_can_i_cook(self):
+        """Test ranking recipes by pantry coverage"""
+        recipe = requests.get(f"{self.base_url}/get_recipes", params={"per_page": 1}).json()["recipes"][0]
+        pantry = recipe["ingredients"][:-1]
+        response = requests.get(f"{self.base_url}/what_can_i_cook",
+                                params={"pantry": ",".join(pantry + ["Neexistuje"]), "limit": 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data["recipes"]), 3)
+        self.assertEqual(data["unknown_ingredients"], ["Neexistuje"])
+        best = data["recipes"][0]
+        self.assertLessEqual(best["missing_count"], 1)
+        self.assertEqual(len(best["missing_ingredients"]), best["missing_count"])
+
+        # Without a pantry the shopping list is used
+        requests.post(f"{self.base_url}/add_ingredients", json={"ingredients": pantry})
+        response = requests.get(f"{self.base_url}/what_can_i_cook", params={"limit": 3})
+        self.assertEqual(response.json()["recipes"], data["recipes"])
+
+        requests.post(f"{self.base_url}/clear_shopping_list")
+        response = requests.get(f"{self.base_url}/what_can_i_cook")
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch(self):
+        """Test running several operations in one request"""
+        search = {"diet": "vegan", "per_page": 2, "fields": ["id", "name"]}
+        response = requests.post(
+            f"{self.base_url}/sessions/test-batch/batch",
+            json={"operations": [
+                {"op": "clear_shopping_list"},
+                {"op": "search_recipes", "params": search},
+                {"op": "search_recipes", "params": {}},
+                {"op": "add_ingredients", "params": {"ingredients": ["Mléko", "Cibule"]}},
+                {"op": "get_shopping_list"},
+                {"op": "unknown"}
+            ]}
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [200, 200, 400, 200, 200, 400])
+
+        # Each result is what the endpoint itself returns
+        direct = requests.get(f"{self.base_url}/search_recipes",
+                              params={"diet": "vegan", "per_page": 2, "fields": "id,name"})
+        self.assertEqual(results[1]["result"], direct.json())
+        self.assertIn("error", results[2])
+        self.assertEqual(results[4]["result"]["shopping_list"], ["Cibule", "Mléko"])
+
+        # Mutations apply to the batch's session only
+        response = requests.get(f"{self.base_url}/sessions/test-batch/get_shopping_list")
+        self.assertEqual(response.json()["shopping_list"], ["Cibule", "Mléko"])
+        response = requests.get(f"{self.base_url}/get_shopping_list")
+        self.assertEqual(response.json()["shopping_list"], [])
+
+    def test_batch_invalid_request(self):
+        """Test that a batch needs a non-empty operations array"""
+        response = requests.post(f"{self.base_url}/batch", json={"operations": []})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("error", response.json())
+
+    def test_shopping_list_changes(self):
+        """Test fetching only what changed on the shopping list since a revision"""
+        url = f"{self.base_url}/sessions/test-sync"
+        requests.post(f"{url}/add_ingredients", json={"ingredients": ["Mléko", "Cibule"]})
+        revision = requests.get(f"{url}/get_shopping_list").json()["revision"]
+
+        response = requests.post(f"{url}/add_ingredients", json={"ingredients": ["Sůl"]})
+        self.assertEqual(response.json()["revision"], revision + 1)
+        requests.post(f"{url}/remove_ingredients", json={"ingredients": ["Mléko"]})
+        response = requests.get(f"{url}/shopping_list_changes", params={"since": revision})
+        self.assertEqual(response.json(), {"revision": revision + 2, "added": ["Sůl"], "removed": ["Mléko"]})
+
+        response = requests.get(f"{url}/shopping_list_changes", params={"since": revision + 100})
+        self.assertTrue(response.json()["reset"])
+        self.assertEqual(response.json()["shopping_list"], ["Cibule", "Sůl"])
+        self.assertEqual(requests.get(f"{url}/shopping_list_changes").status_code, 400)
+        for wait in ("nan", "inf"):
+            response = requests.get(f"{url}/shopping_list_changes", params={"since": revision, "wait": wait})
+            self.assertEqual(response.status_code, 400)
+
+    def test_shopping_list_changes_long_poll(self):
+        """Test that a long-poll returns as soon as the list changes"""
+        url = f"{self.base_url}/sessions/test-long-poll"
+        revision = requests.post(f"{url}/clear_shopping_list").json()["revision"]
+        threading.Timer(0.2, requests.post, args=(f"{url}/add_ingredients",),
+                        kwargs={"json": {"ingredients": ["Sůl"]}}).start()
+        start = time.monotonic()
+        response = requests.get(f"{url}/shopping_list_changes", params={"since": revision, "wait": 10})
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(response.json()["added"], ["Sůl"])
+
+    def test_shopping_list_change_stream(self):
+        """Test the Server-Sent Events stream of shopping list changes"""
+        url = f"{self.base_url}/sessions/test-stream"
+        revision = requests.post(f"{url}/clear_shopping_list").json()["revision"]
+        threading.Timer(0.2, requests.post, args=(f"{url}/add_ingredients",),
+                        kwargs={"json": {"ingredients": ["Pepř"]}}).start()
+        with requests.get(f"{url}/shopping_list_changes/stream", params={"since": revision},
+                          stream=True, timeout=10) as response:
+            self.assertTrue(response.headers["Content-Type"].startswith("text/event-stream"))
+            event = {}
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("data: "):
+                    event = json.loads(line[len("data: "):])
+                    break
+        self.assertEqual(event["added"], ["Pepř"])
+        self.assertEqual(event["revision"], revision + 1)
+
+    def test_compressed_responses(self):
+        """Test that listings are gzip-compressed only for clients accepting it"""
+        params = {"per_page": 50}
+        response = requests.get(f"{self.base_url}/get_recipes", params=params, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        plain = requests.get(f"{self.base_url}/get_recipes", params=params, headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertEqual(response.json(), plain.json())
+        self.assertLess(int(response.headers["Content-Length"]), int(plain.headers["Content-Length"]))
+
+        # Cached catalog-wide responses keep answering If-None-Match when compressed
+        response = requests.get(f"{self.base_url}/get_all_ingredients", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        response = requests.get(f"{self.base_url}/get_all_ingredients",
+                                headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_metrics(self):
+        """Test that /metrics reports route latencies and search stages"""
+        requests.get(f"{self.base_url}/search_recipes", params={"diet": "vegan", "name": "metrics-test"})
+        response = requests.get(f"{self.base_url}/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('http_request_duration_seconds_count{route="/search_recipes",method="GET",status="200"}',
+                      response.text)
+        self.assertIn('search_stage_candidates_count{stage="diet"}', response.text)
+        self.assertIn('startup_phase_duration_seconds{phase="total"}', response.text)
+        self.assertIn("catalog_recipes ", response.text)
+
+    def test_profiling(self):
+        """Test turning sampled profiling on and off at runtime"""
+        response = requests.post(f"{self.base_url}/admin/profiling", json={"sample_rate": 1, "reset": True})
+        self.assertEqual(response.json(), {"sample_rate": 1.0, "profiled_requests": 0})
+        requests.get(f"{self.base_url}/get_all_diets")
+        response = requests.post(f"{self.base_url}/admin/profiling", json={"sample_rate": 0})
+        self.assertGreaterEqual(response.json()["profiled_requests"], 1)
+
+        response = requests.get(f"{self.base_url}/admin/profile", params={"sort": "tottime", "limit": 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("requests profiled", response.text)
+        self.assertEqual(requests.get(f"{self.base_url}/admin/profile", params={"sort": "x"}).status_code, 400)
+        self.assertEqual(requests.post(f"{self.base_url}/admin/profiling", json={"sample_rate": "x"}).status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
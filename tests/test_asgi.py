@@ -0,0 +1,103 @@
+import asyncio
+import json
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from asgi import WsgiToAsgi
+import server
+from server import app as flask_app
+
+
+def call(asgi_app, method, path, query=b'', body=b'', headers=()):
+    """Run one request through the ASGI app and return (status, headers, body)."""
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query,
+        'headers': [(b'host', b'testserver')] + list(headers), 'http_version': '1.1',
+    }
+    messages = []
+
+    async def run():
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                await asyncio.sleep(3600)
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await asgi_app(scope, receive, send)
+
+    asyncio.run(run())
+    start = messages[0]
+    response_body = b''.join(m.get('body', b'') for m in messages[1:])
+    return start['status'], dict(start['headers']), response_body
+
+
+class TestAsgiAdapter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = WsgiToAsgi(flask_app, max_workers=4)
+        cls.client = flask_app.test_client()
+
+    def test_same_response_as_wsgi(self):
+        status, headers, body = call(self.app, 'GET', '/get_recipes', b'per_page=3&fields=id,name')
+        expected = self.client.get('/get_recipes?per_page=3&fields=id,name')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        self.assertEqual(json.loads(body), expected.get_json())
+
+    def test_error_status(self):
+        status, _, body = call(self.app, 'GET', '/search_recipes')
+        self.assertEqual(status, 400)
+        self.assertIn('error', json.loads(body))
+
+    def test_post_body_and_session_header(self):
+        headers = [(b'content-type', b'application/json'), (b'x-session-id', b'asgi-test')]
+        payload = json.dumps({'ingredients': ["Mléko", "Cibule"]}).encode('utf-8')
+        status, _, _ = call(self.app, 'POST', '/add_ingredients', body=payload, headers=headers)
+        self.assertEqual(status, 200)
+        status, _, body = call(self.app, 'GET', '/get_shopping_list', headers=headers)
+        self.assertEqual(json.loads(body)['shopping_list'], ["Cibule", "Mléko"])
+        call(self.app, 'POST', '/clear_shopping_list', headers=headers)
+
+    def test_stream_ends_when_client_disconnects(self):
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/shopping_list_changes/stream', 'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'x-session-id', b'asgi-stream')], 'http_version': '1.1',
+        }
+        messages = []
+
+        async def run():
+            received = False
+
+            async def receive():
+                nonlocal received
+                if received:
+                    await asyncio.sleep(0.2)
+                    return {'type': 'http.disconnect'}
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await self.app(scope, receive, send)
+
+        started = time.monotonic()
+        asyncio.run(run())
+        # Well before the first keep-alive, let alone the end of the stream
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(server.change_waits.running, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
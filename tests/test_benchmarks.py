@@ -0,0 +1,55 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+sys.path.insert(0, str(Path(__file__).parent.parent / 'benchmarks'))
+
+from generate_catalog import write_catalog
+from recipe_loader import IngestReport, load_recipes
+from stats import percentile, summarize
+
+
+class TestGenerateCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def generate(self, name, count, seed=0):
+        path = os.path.join(self.temp_dir, name)
+        write_catalog(path, count, seed, max_steps_chars=50)
+        return path
+
+    def test_generated_catalog_loads_cleanly(self):
+        report = IngestReport()
+        store = load_recipes(self.generate('recipes.csv', 1234), report)
+        self.assertEqual(len(store), 1234)
+        self.assertEqual(report.rejected, [])
+        self.assertEqual(len(set(store.ids)), 1234)
+        self.assertTrue(all(len(store.steps(position)) <= 50 for position in range(len(store))))
+
+    def test_output_is_reproducible(self):
+        first = Path(self.generate('a.csv', 300)).read_bytes()
+        self.assertEqual(Path(self.generate('b.csv', 300)).read_bytes(), first)
+        self.assertNotEqual(Path(self.generate('c.csv', 300, seed=1)).read_bytes(), first)
+
+
+class TestStats(unittest.TestCase):
+    def test_percentiles(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 0.5), 0.05)
+        self.assertEqual(percentile(values, 0.99), 0.099)
+        summary = summarize(reversed(values))
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['p50_ms'], 50.0)
+        self.assertAlmostEqual(summary['max_ms'], 100.0)
+        self.assertEqual(summarize([]), {'count': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from catalog import CatalogManager, load_catalog
+from recipe_loader import IngestReport, load_recipes, load_sources, resolve_sources
+
+REPO_ROOT = Path(__file__).parent.parent
+CSV_PATH = REPO_ROOT / 'data' / 'Recipes.csv'
+
+NEW_ROW = '\n999,Testovací recept,"Sůl, Pepř",Uvaříme.,vegan,polévka'
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temp_dir, 'Recipes.csv')
+        shutil.copy(CSV_PATH, self.csv_path)
+        self.snapshot_path = os.path.join(self.temp_dir, 'Recipes.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def append(self, text):
+        with open(self.csv_path, 'a', encoding='utf-8') as file:
+            file.write(text)
+
+    def test_load_catalog_builds_and_reuses_snapshot(self):
+        catalog = load_catalog(self.csv_path, self.snapshot_path)
+        self.assertTrue(os.path.exists(self.snapshot_path))
+        mtime = os.path.getmtime(self.snapshot_path)
+
+        reloaded = load_catalog(self.csv_path, self.snapshot_path)
+        self.assertEqual(os.path.getmtime(self.snapshot_path), mtime)
+        self.assertEqual(len(reloaded.store), len(catalog.store))
+        self.assertEqual(reloaded.version, catalog.version)
+        self.assertEqual(reloaded.report, catalog.report)
+
+    def test_recipe_lookup_and_ingredient_merge(self):
+        self.append(NEW_ROW)
+        catalog = load_catalog(self.csv_path, self.snapshot_path)
+        position = catalog.position_of('999')
+        self.assertEqual(catalog.position_of_name(' TESTOVACÍ RECEPT '), position)
+        self.assertIsNone(catalog.position_of_name('Neexistuje'))
+
+        other = catalog.position_of(catalog.store.ids[0])
+        expected = sorted(set(catalog.store[other]['ingredients']) | {'Sůl', 'Pepř'})
+        self.assertEqual(catalog.ingredients_of([position, other, position]), expected)
+        self.assertEqual(catalog.ingredients_of([]), [])
+
+    def test_stale_snapshot_is_rebuilt(self):
+        load_catalog(self.csv_path, self.snapshot_path)
+        self.append(NEW_ROW)
+
+        catalog = load_catalog(self.csv_path, self.snapshot_path)
+        self.assertEqual(catalog.store[-1]['name'], 'Testovací recept')
+        self.assertEqual(catalog.index.search(name='testovací'), [len(catalog.store) - 1])
+
+    def test_bad_rows_are_rejected_individually(self):
+        self.append('\n,Bez id,Sůl,Uvaříme.,vegan,polévka'
+                    '\n10,Duplicitní,Sůl,Uvaříme.,vegan,polévka'
+                    '\n998,Málo polí'
+                    + NEW_ROW)
+        report = IngestReport()
+        store = load_recipes(self.csv_path, report)
+
+        self.assertEqual(store[-1]['name'], 'Testovací recept')
+        self.assertEqual(report.loaded, len(store))
+        self.assertEqual([row['reason'] for row in report.rejected],
+                         ["Missing id", "Duplicate id", "Too few fields"])
+
+    def test_missing_file_loads_empty_store(self):
+        self.assertEqual(len(load_recipes(os.path.join(self.temp_dir, 'missing.csv'))), 0)
+
+    def test_reload_swaps_generation_and_reports_changes(self):
+        manager = CatalogManager(self.csv_path, self.snapshot_path)
+        old = manager.current
+        published = []
+        manager.on_reload(published.append)
+
+        self.assertFalse(manager.reload()['reloaded'])
+        self.assertIs(manager.current, old)
+
+        self.append(NEW_ROW)
+        result = manager.reload()
+        self.assertTrue(result['reloaded'])
+        self.assertEqual(result['changes'], {'added': 1, 'removed': 0, 'changed': 0})
+        self.assertIsNot(manager.current, old)
+        self.assertEqual(published, [manager.current])
+        # The old generation stays intact for requests still using it
+        self.assertEqual(len(old.store), len(manager.current.store) - 1)
+
+    def test_reload_maps_snapshot_of_another_process(self):
+        first = CatalogManager(self.csv_path, self.snapshot_path)
+        second = CatalogManager(self.csv_path, self.snapshot_path)
+        self.append(NEW_ROW)
+        self.assertTrue(first.reload()['reloaded'])
+        self.assertIn('parse_csv', first.current.load_timings)
+
+        result = second.reload()
+        self.assertTrue(result['reloaded'])
+        self.assertEqual(second.current.version, first.current.version)
+        # Mapped from the snapshot the first one wrote, not parsed again
+        self.assertNotIn('parse_csv', second.current.load_timings)
+
+    def test_reload_counts_changed_fields(self):
+        manager = CatalogManager(self.csv_path, self.snapshot_path)
+        with open(self.csv_path, encoding='utf-8', newline='') as file:
+            header, *rows = csv.reader(file)
+        columns = {name: column for column, name in enumerate(header)}
+        rows[0][columns['steps']] += ' Podáváme teplé.'
+        rows[1][columns['diet']] = 'vegan'
+        rows[2][columns['name']] += ' II'
+        # Reordered rows with unchanged fields don't count as changed
+        rows[3], rows[4] = rows[4], rows[3]
+        with open(self.csv_path, 'w', encoding='utf-8', newline='') as file:
+            csv.writer(file).writerows([header] + rows)
+
+        result = manager.reload()
+        self.assertEqual(result['changes'], {'added': 0, 'removed': 0, 'changed': 3})
+
+    def test_reload_keeps_catalog_when_csv_is_unusable(self):
+        manager = CatalogManager(self.csv_path, self.snapshot_path)
+        old = manager.current
+        with open(self.csv_path, 'w', encoding='utf-8') as file:
+            file.write('nothing,useful\n1,2\n')
+
+        result = manager.reload()
+        self.assertFalse(result['reloaded'])
+        self.assertIn('error', result)
+        self.assertIs(manager.current, old)
+
+
+class TestMultiSourceCatalog(unittest.TestCase):
+    """The CSV split into regional files, the last one repeating a recipe of the first."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.sources_dir = os.path.join(self.temp_dir, 'sources')
+        os.mkdir(self.sources_dir)
+        with open(CSV_PATH, encoding='utf-8', newline='') as file:
+            header, *rows = csv.reader(file)
+        self.expected = load_recipes(CSV_PATH)
+        copy = [rows[0][0], 'Kopie ' + rows[0][1]] + rows[0][2:]
+        for number, part in enumerate([rows[:30], rows[30:60], rows[60:] + [copy]]):
+            with open(os.path.join(self.sources_dir, f'region_{number}.csv'), 'w', encoding='utf-8',
+                      newline='') as file:
+                csv.writer(file).writerows([header] + part)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_directory_is_merged_in_name_order(self):
+        catalog = load_catalog(self.sources_dir, workers=2)
+        self.assertEqual(list(catalog.store), list(self.expected))
+        self.assertEqual(catalog.all_ingredients, set(self.expected.ingredient_vocab.terms))
+        self.assertEqual(catalog.all_diet_types, set(self.expected.diet_vocab.terms))
+        self.assertEqual(catalog.report['loaded'], len(self.expected))
+        self.assertEqual([row['reason'] for row in catalog.report['rejected_rows']], ["Duplicate id"])
+        self.assertEqual(catalog.report['rejected_rows'][0]['source'],
+                         os.path.relpath(os.path.join(self.sources_dir, 'region_2.csv'), REPO_ROOT))
+        self.assertEqual([source['loaded'] for source in catalog.report['sources']], [30, 30, 40])
+        self.assertTrue(os.path.exists(self.sources_dir + '.snapshot'))
+        self.assertEqual(catalog.index.search(name='gulas'), load_catalog(CSV_PATH, os.path.join(
+            self.temp_dir, 'single.snapshot')).index.search(name='gulas'))
+
+    def test_parallel_and_serial_loading_agree(self):
+        sources = resolve_sources(self.sources_dir)
+        parallel, serial = IngestReport(), IngestReport()
+        self.assertEqual(list(load_sources(sources, parallel, workers=3)),
+                         list(load_sources(sources, serial, workers=1)))
+        self.assertEqual(parallel.to_dict(), serial.to_dict())
+
+    def test_manifest_order_decides_duplicates(self):
+        manifest = os.path.join(self.temp_dir, 'sources.manifest')
+        with open(manifest, 'w', encoding='utf-8') as file:
+            file.write('# Partner files first\nsources/region_2.csv\n\nsources\n')
+        sources = resolve_sources(manifest)
+        self.assertEqual([os.path.basename(path) for path in sources],
+                         ['region_2.csv', 'region_0.csv', 'region_1.csv', 'region_2.csv'])
+
+        catalog = load_catalog(manifest)
+        first = self.expected.ids[0]
+        self.assertTrue(catalog.store[catalog.position_of(first)]['name'].startswith('Kopie '))
+        self.assertEqual(len(catalog.store), len(self.expected))
+
+    def test_missing_manifest_source_is_skipped(self):
+        manifest = os.path.join(self.temp_dir, 'sources.manifest')
+        with open(manifest, 'w', encoding='utf-8') as file:
+            file.write('sources/region_0.csv\nsources/missing.csv\n')
+        catalog = load_catalog(manifest)
+        self.assertEqual(len(catalog.store), 30)
+        self.assertEqual(catalog.report['rejected_rows'], [{
+            'line': None, 'id': None, 'reason': "Source file not found",
+            'source': os.path.relpath(os.path.join(self.sources_dir, 'missing.csv'), REPO_ROOT)
+        }])
+
+    def test_unreadable_manifest_loads_empty_catalog(self):
+        catalog = load_catalog(os.path.join(self.temp_dir, 'missing.manifest'))
+        self.assertEqual(len(catalog.store), 0)
+        self.assertEqual(catalog.report['rejected'], 1)
+
+    def test_changed_source_is_reloaded(self):
+        manager = CatalogManager(self.sources_dir)
+        self.assertFalse(manager.reload()['reloaded'])
+        with open(os.path.join(self.sources_dir, 'region_3.csv'), 'w', encoding='utf-8') as file:
+            file.write('id,name,ingredients,steps,diet,meal_type' + NEW_ROW)
+        result = manager.reload()
+        self.assertTrue(result['reloaded'])
+        self.assertEqual(result['changes'], {'added': 1, 'removed': 0, 'changed': 0})
+        self.assertEqual(manager.current.store[-1]['name'], 'Testovací recept')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from metrics import MetricsRegistry, Profiler, process_memory_bytes
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.metrics.histogram('latency_seconds', "Latency", ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, '/search')
+        lines = self.metrics.render().splitlines()
+        self.assertEqual(lines[:2], ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram'])
+        self.assertIn('latency_seconds_bucket{route="/search",le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{route="/search",le="1"} 3', lines)
+        self.assertIn('latency_seconds_bucket{route="/search",le="+Inf"} 4', lines)
+        self.assertIn('latency_seconds_sum{route="/search"} 4.05', lines)
+        self.assertIn('latency_seconds_count{route="/search"} 4', lines)
+
+    def test_histogram_time(self):
+        histogram = self.metrics.histogram('work_seconds', "Work")
+        with histogram.time():
+            pass
+        counts, total = histogram.snapshot()[()]
+        self.assertEqual(sum(counts), 1)
+        self.assertGreaterEqual(total, 0)
+
+    def test_counter_and_gauges(self):
+        counter = self.metrics.counter('requests_total', "Requests", ('status',))
+        counter.inc('200')
+        counter.inc('200', amount=2)
+        self.metrics.gauge('entries', "Entries", lambda: 7)
+        self.metrics.gauge('ratio', "Ratio", lambda: {('a',): 0.5, ('b"',): 1.0}, ('cache',))
+        text = self.metrics.render()
+        self.assertIn('requests_total{status="200"} 3\n', text)
+        self.assertIn('entries 7\n', text)
+        self.assertIn('ratio{cache="a"} 0.5\n', text)
+        self.assertIn('ratio{cache="b\\""} 1\n', text)
+
+    def test_failing_gauge_is_skipped(self):
+        self.metrics.gauge('broken', "Broken", lambda: 1 / 0)
+        self.metrics.gauge('working', "Working", lambda: 1)
+        text = self.metrics.render()
+        self.assertNotIn('broken', text)
+        self.assertIn('working 1\n', text)
+
+    def test_duplicate_name(self):
+        self.metrics.counter('requests_total', "Requests")
+        with self.assertRaises(ValueError):
+            self.metrics.gauge('requests_total', "Requests", lambda: 0)
+
+    def test_process_memory(self):
+        self.assertGreater(process_memory_bytes(), 0)
+
+
+class TestProfiler(unittest.TestCase):
+    def test_disabled_by_default(self):
+        profiler = Profiler()
+        self.assertIsNone(profiler.start())
+        self.assertEqual(profiler.report(), "No requests profiled yet\n")
+
+    def test_profiles_sampled_requests(self):
+        profiler = Profiler(1.0)
+        profile = profiler.start()
+        # Nested requests belong to the outer profile
+        self.assertIsNone(profiler.start())
+        sorted(range(1000), key=str)
+        profiler.stop(profile)
+        self.assertEqual(profiler.profiled, 1)
+        self.assertIn("1 requests profiled", profiler.report('tottime', 5))
+
+        # Only one request per process is profiled at a time
+        profile = profiler.start()
+        self.assertIsNotNone(profile)
+        results = []
+        other = threading.Thread(target=lambda: results.append(profiler.start()))
+        other.start()
+        other.join()
+        self.assertEqual(results, [None])
+        profiler.stop(profile)
+
+        profiler.configure(sample_rate=2, reset=True)
+        self.assertEqual(profiler.sample_rate, 1.0)
+        self.assertEqual(profiler.profiled, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
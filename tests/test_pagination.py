@@ -0,0 +1,35 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from pagination import CursorError, decode_cursor, encode_cursor, paginate
+
+
+class TestPagination(unittest.TestCase):
+    def test_cursor_round_trip(self):
+        token = encode_cursor('abc', 42)
+        self.assertEqual(decode_cursor(token, 'abc'), 42)
+
+    def test_cursor_from_other_catalog_version_is_rejected(self):
+        with self.assertRaises(CursorError):
+            decode_cursor(encode_cursor('abc', 42), 'def')
+
+    def test_cursor_resumes_after_last_position(self):
+        positions = [3, 8, 15, 16, 23, 42]
+        page, info = paginate(positions, 'v', per_page=4)
+        self.assertEqual(page, [3, 8, 15, 16])
+        page, info = paginate(positions, 'v', per_page=4, cursor=info['next_cursor'])
+        self.assertEqual(page, [23, 42])
+        self.assertFalse(info['has_next'])
+        self.assertIsNone(info['next_cursor'])
+
+    def test_page_numbers_keep_working(self):
+        page, info = paginate(range(25), 'v', page=3, per_page=10)
+        self.assertEqual(list(page), list(range(20, 25)))
+        self.assertEqual((info['total_pages'], info['has_next'], info['has_prev']), (3, False, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
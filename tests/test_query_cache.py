@@ -0,0 +1,58 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from query_cache import QueryCache, normalize_filters
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_normalized_key_ignores_case_and_fragment_order(self):
+        self.assertEqual(
+            normalize_filters(diet="Vegan", includes_ingredients=["cibule", "sůl"]),
+            normalize_filters(diet="vegan", includes_ingredients=["sůl", "cibule", "sůl"])
+        )
+        self.assertNotEqual(
+            normalize_filters(excludes_ingredients=[]),
+            normalize_filters()
+        )
+
+    def test_hits_misses_and_lru_eviction(self):
+        cache = QueryCache(max_entries=2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', [1, 2])
+        cache.put('b', [3])
+        self.assertEqual(list(cache.get('a')), [1, 2])
+        cache.put('c', [4])  # evicts 'b', the least recently used
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(list(cache.get('c')), [4])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (2, 2, 1))
+        self.assertEqual(stats['entries'], 2)
+
+    def test_total_positions_are_bounded(self):
+        cache = QueryCache(max_positions=5)
+        cache.put('a', [1, 2, 3])
+        cache.put('b', [4, 5, 6])
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['positions'], 3)
+        # Results larger than the whole budget are returned but not cached
+        self.assertEqual(list(cache.put('c', range(10))), list(range(10)))
+        self.assertIsNone(cache.get('c'))
+
+    def test_get_or_compute_and_clear(self):
+        cache = QueryCache()
+        calls = []
+        compute = lambda: calls.append(1) or [7]
+        self.assertEqual(list(cache.get_or_compute('k', compute)), [7])
+        self.assertEqual(list(cache.get_or_compute('k', compute)), [7])
+        self.assertEqual(len(calls), 1)
+        cache.clear()
+        cache.get_or_compute('k', compute)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+import itertools
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from recipe_loader import fold, fold_tokens, load_recipes
+import recipe_index
+from recipe_index import DeadlineExceeded, RecipeIndex, StageTimings
+
+
+def name_matches(query, name):
+    """Reference name filter: a substring, or every query word starting a different word of the name."""
+    query, name = fold(query), fold(name)
+    if query in name:
+        return True
+    words, tokens = fold_tokens(query), fold_tokens(name)
+    if len(words) < 2:
+        return False
+    return any(all(tokens[t].startswith(word) for t, word in zip(chosen, words))
+               for chosen in itertools.permutations(range(len(tokens)), len(words)))
+
+
+def linear_search(recipes, diet=None, meal_type=None, name=None,
+                  includes_ingredients=None, excludes_ingredients=None):
+    """Reference implementation: the original list-scanning filters, matching folded strings."""
+    filtered = list(range(len(recipes)))
+    if diet:
+        filtered = [i for i in filtered if recipes[i].get('diet')
+                    and any(fold(d) == fold(diet) for d in recipes[i]['diet'])]
+    if meal_type:
+        filtered = [i for i in filtered if recipes[i].get('meal_type')
+                    and any(fold(m) == fold(meal_type) for m in recipes[i]['meal_type'])]
+    if name:
+        filtered = [i for i in filtered if recipes[i].get('name')
+                    and name_matches(name, recipes[i]['name'])]
+    if includes_ingredients is not None:
+        filtered = [i for i in filtered if recipes[i].get('ingredients') and all(
+            any(req in fold(ing) for ing in recipes[i]['ingredients'])
+            for req in includes_ingredients)]
+    if excludes_ingredients is not None:
+        filtered = [i for i in filtered if recipes[i].get('ingredients') and not any(
+            any(excl in fold(ing) for ing in recipes[i]['ingredients'])
+            for excl in excludes_ingredients)]
+    return filtered
+
+
+class TestRecipeIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.recipes = load_recipes('data/Recipes.csv')
+        cls.index = RecipeIndex.build(cls.recipes)
+
+    def assertSameAsLinear(self, **filters):
+        self.assertEqual(
+            self.index.search(**filters),
+            linear_search(self.recipes, **filters),
+            filters
+        )
+
+    def test_single_filters(self):
+        for diet in ["vegetarian", "VEGAN", "masité", "neexistuje"]:
+            self.assertSameAsLinear(diet=diet)
+        for meal_type in ["polévka", "Hlavní chod", "desert"]:
+            self.assertSameAsLinear(meal_type=meal_type)
+        for name in ["guláš", "gulas", "a", "Po", "polévka", "POLEVKA", "xyz"]:
+            self.assertSameAsLinear(name=name)
+
+    def test_stage_timings(self):
+        stages = StageTimings()
+        positions = self.index.search(diet="vegan", includes_ingredients=["cibule"], stages=stages)
+        self.assertEqual(positions, self.index.search(diet="vegan", includes_ingredients=["cibule"]))
+        names = [stage for stage, seconds, candidates in stages.stages]
+        self.assertEqual(names, ["diet", "includes_ingredients", "intersect", "sort"])
+        self.assertEqual(stages.stages[-1][2], len(positions))
+        self.assertTrue(all(seconds >= 0 for stage, seconds, candidates in stages.stages))
+
+    def test_deadline(self):
+        with self.assertRaises(DeadlineExceeded):
+            self.index.search(diet="vegan", includes_ingredients=["cibule"], stages=StageTimings(deadline=0))
+        with self.assertRaises(DeadlineExceeded):
+            self.index.rank(name="gulas", stages=StageTimings(deadline=0))
+
+    def test_estimate_cost(self):
+        total = len(self.index.ingredients.postings.values)
+        self.assertEqual(self.index.estimate_cost(), 0)
+        self.assertEqual(self.index.estimate_cost(diet="vegan"), len(self.index.search(diet="vegan")))
+        # Short fragments scan everything, rare ones are cheap, unknown ones free
+        self.assertEqual(self.index.estimate_cost(includes_ingredients=["s"]), total)
+        self.assertLess(self.index.estimate_cost(includes_ingredients=["kmin"]), total)
+        self.assertEqual(self.index.estimate_cost(includes_ingredients=["xyzxyz"]), 0)
+        self.assertGreater(self.index.estimate_cost(includes_ingredients=["cibule", "s"]),
+                           self.index.estimate_cost(includes_ingredients=["cibule"]))
+        self.assertEqual(self.index.estimate_cost(includes_ingredients=["kmin"], fuzzy=True), total)
+
+    def test_multi_word_fragments(self):
+        names = sorted({n for n in self.recipes.names if len(fold_tokens(fold(n))) > 1})
+        queries = ["bramborove bramboro", "bramboro bramboro", "noky bramb", "kur paprik", "s s", "a b"]
+        for name in names[:40]:
+            words = fold_tokens(fold(name))
+            queries.append(f"{words[1][:3]} {words[0][:2]}")
+            # Two query words may not share one word of the name
+            queries.append(f"{words[0]} {words[0][:3]}")
+        for query in queries:
+            self.assertSameAsLinear(name=query)
+        # Ingredient filters stay plain substrings, a few words included
+        ingredients = sorted({i for i in self.recipes.ingredient_vocab.terms if len(i.split()) > 1})
+        fragments = ["bramborove bramboro", "s s"] + [
+            f"{fold_tokens(fold(i))[-1][:3]} {fold_tokens(fold(i))[0][:3]}" for i in ingredients[:30]
+        ] + [fold(i) for i in ingredients[:10]]
+        for fragment in fragments:
+            self.assertSameAsLinear(includes_ingredients=[fragment])
+            self.assertSameAsLinear(excludes_ingredients=[fragment])
+
+    def test_ingredient_filters(self):
+        fragments = [[], ["cibule"], ["brambory", "cibule"], ["s"], ["ml"], ["mleko", "vejce"]]
+        for fragments_in, fragments_out in itertools.product(fragments + [None], repeat=2):
+            self.assertSameAsLinear(includes_ingredients=fragments_in,
+                                    excludes_ingredients=fragments_out)
+
+    def test_combined_filters(self):
+        self.assertSameAsLinear(diet="vegetarian", meal_type="desert")
+        self.assertSameAsLinear(diet="vegetarian", name="e", excludes_ingredients=["mléko"])
+        self.assertSameAsLinear(meal_type="hlavni chod", includes_ingredients=["cibule"],
+                                excludes_ingredients=["maslo"])
+
+    def test_accents_and_case_are_ignored(self):
+        self.assertEqual(self.index.search(includes_ingredients=[fold("MÁSLO")]),
+                         self.index.search(includes_ingredients=["maslo"]))
+        self.assertTrue(self.index.search(includes_ingredients=["maslo"]))
+        self.assertEqual(self.index.search(diet="bezlepkove"), self.index.search(diet="Bezlepkové"))
+
+    def test_words_match_word_prefixes(self):
+        name = next(n for n in self.recipes.names if len(fold(n).split()) > 1)
+        first, second = fold(name).split()[:2]
+        # Both words, shortened and swapped, aren't a substring but still match
+        query = f"{second[:3]} {first[:3]}"
+        self.assertNotIn(query, fold(name))
+        self.assertIn(self.recipes.names.index(name), self.index.search(name=query))
+
+    def test_no_filters_returns_everything(self):
+        self.assertEqual(self.index.search(), list(range(len(self.recipes))))
+
+    def test_concurrent_first_short_queries(self):
+        # The joined vocabulary text is built lazily by whichever query comes first
+        index = RecipeIndex.build(self.recipes)
+        expected = linear_search(self.recipes, includes_ingredients=["s"])
+        barrier = threading.Barrier(8)
+        results = []
+
+        def query():
+            barrier.wait()
+            results.append(index.search(includes_ingredients=["s"]))
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [expected] * 8)
+
+
+class TestRankedSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.recipes = load_recipes('data/Recipes.csv')
+        cls.index = RecipeIndex.build(cls.recipes)
+
+    def names(self, ranked):
+        return [self.recipes.names[position] for position, _ in ranked]
+
+    def test_typos_are_tolerated(self):
+        ranked, _ = self.index.rank(name="gulsh")
+        self.assertTrue(ranked)
+        self.assertTrue(all("guláš" in name for name in self.names(ranked)))
+        ranked, _ = self.index.rank(includes_ingredients=["cibul", "mlekko"])
+        best = [fold(i) for i in self.recipes[ranked[0][0]]['ingredients']]
+        self.assertTrue(any("cibule" in i for i in best) and any("mleko" in i for i in best))
+
+    def test_exact_name_ranks_first(self):
+        name = self.recipes.names[0]
+        ranked, _ = self.index.rank(name=name.upper())
+        self.assertEqual(ranked[0], (0, 1.0))
+
+    def test_top_k_is_the_head_of_the_full_ranking(self):
+        query = {"name": "polevka", "includes_ingredients": ["cibule", "sul", "pepr"]}
+        everything, total = self.index.rank(**query, limit=len(self.recipes))
+        self.assertEqual(len(everything), total)
+        scores = [score for _, score in everything]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        top, top_total = self.index.rank(**query, limit=5)
+        self.assertEqual(top, everything[:5])
+        self.assertEqual(top_total, total)
+
+    def test_exact_filters_still_apply(self):
+        ranked, total = self.index.rank(diet="vegetarian", includes_ingredients=["cibule"],
+                                        excludes_ingredients=["maslo"], limit=len(self.recipes))
+        allowed = set(self.index.search(diet="vegetarian", excludes_ingredients=["maslo"]))
+        self.assertTrue(ranked)
+        self.assertTrue({position for position, _ in ranked} <= allowed)
+
+    def test_without_fuzzy_filters_catalog_order_is_kept(self):
+        ranked, total = self.index.rank(diet="vegetarian", limit=1000)
+        self.assertEqual([position for position, _ in ranked], self.index.search(diet="vegetarian"))
+
+
+class TestPantryCoverage(unittest.TestCase):
+    PANTRY = ["Cibule", "mleko", "Sůl", "Vejce", "Máslo", "Hladká mouka", "neexistuje"]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.recipes = load_recipes('data/Recipes.csv')
+        cls.index = RecipeIndex.build(cls.recipes)
+        cls.keys = {fold(item) for item in cls.PANTRY}
+        cls.rows = sorted({cls.index.ingredient_row(key) for key in cls.keys} - {None})
+
+    def brute_force(self, limit):
+        scored = []
+        for position in range(len(self.recipes)):
+            keys = {fold(ingredient) for ingredient in self.recipes[position]['ingredients']}
+            available = len(keys & self.keys)
+            if available:
+                scored.append((len(keys) - available, -available / len(keys), position, available, len(keys)))
+        scored.sort()
+        return [(position, available, total) for _, _, position, available, total in scored[:limit]], len(scored)
+
+    def test_unknown_ingredients_have_no_row(self):
+        self.assertIsNone(self.index.ingredient_row("neexistuje"))
+        self.assertEqual(len(self.rows), len(self.PANTRY) - 1)
+
+    def test_matches_brute_force(self):
+        for limit in (1, 5, 1000):
+            self.assertEqual(self.index.pantry_coverage(self.rows, limit), self.brute_force(limit))
+
+    def test_pure_python_fallback_matches(self):
+        numpy = recipe_index.numpy
+        recipe_index.numpy = None
+        try:
+            self.assertEqual(self.index.pantry_coverage(self.rows, 5), self.brute_force(5))
+        finally:
+            recipe_index.numpy = numpy
+
+    def test_empty_pantry(self):
+        self.assertEqual(self.index.pantry_coverage([], 5), ([], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import gzip
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from werkzeug.http import parse_accept_header
+
+import recipe_json
+from compression import choose_encoding, compress
+from recipe_json import RecipeFragments, dumps, listing
+from recipe_loader import load_recipes
+
+
+class TestRecipeFragments(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.recipes = load_recipes('data/Recipes.csv')
+
+    def assertSameRecipes(self, fragments):
+        for fields in (None, ['name'], ['steps', 'id'], ['ingredients', 'diet', 'meal_type']):
+            for position in range(len(self.recipes)):
+                self.assertEqual(json.loads(fragments.recipe(position, fields)),
+                                 self.recipes.recipe(position, fields))
+                # Served again from the stored fragments
+                self.assertEqual(json.loads(fragments.recipe(position, fields)),
+                                 self.recipes.recipe(position, fields))
+
+    def test_matches_recipe_dicts(self):
+        self.assertSameRecipes(RecipeFragments(self.recipes))
+
+    def test_steps_are_not_cached(self):
+        fragments = RecipeFragments(self.recipes)
+        self.assertSameRecipes(fragments)
+        self.assertNotIn('steps', fragments._columns)
+
+    def test_without_orjson(self):
+        orjson = recipe_json.orjson
+        recipe_json.orjson = None
+        try:
+            self.assertSameRecipes(RecipeFragments(self.recipes))
+        finally:
+            recipe_json.orjson = orjson
+
+    def test_extra_members(self):
+        fragment = RecipeFragments(self.recipes).recipe(0, ['id'], {'score': 0.5, 'missing': ['Sůl']})
+        self.assertEqual(json.loads(fragment), {'id': self.recipes.ids[0], 'score': 0.5, 'missing': ['Sůl']})
+
+    def test_listing(self):
+        fragments = RecipeFragments(self.recipes)
+        body = listing((fragments.recipe(position, ['id']) for position in range(3)), pagination={'page': 1})
+        self.assertEqual(json.loads(body), {
+            'recipes': [{'id': recipe_id} for recipe_id in self.recipes.ids[:3]],
+            'pagination': {'page': 1}
+        })
+        self.assertEqual(json.loads(listing([])), {'recipes': []})
+        self.assertEqual(dumps({'name': 'Guláš'}), '{"name":"Guláš"}'.encode('utf-8'))
+
+
+class TestCompression(unittest.TestCase):
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding(parse_accept_header('gzip, deflate')), 'gzip')
+        self.assertIsNone(choose_encoding(parse_accept_header('identity')))
+        self.assertIsNone(choose_encoding(parse_accept_header('gzip;q=0')))
+        self.assertIsNone(choose_encoding(parse_accept_header('')))
+
+    def test_gzip_is_deterministic(self):
+        body = dumps({'recipes': ['Guláš'] * 100})
+        self.assertEqual(gzip.decompress(compress(body, 'gzip')), body)
+        self.assertEqual(compress(body, 'gzip'), compress(body, 'gzip'))
+
+
+if __name__ == '__main__':
+    unittest.main()
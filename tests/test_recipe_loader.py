@@ -0,0 +1,82 @@
+import csv
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from recipe_loader import Vocabulary, fold, fold_tokens, load_recipes
+
+CSV_PATH = Path(__file__).parent.parent / 'data' / 'Recipes.csv'
+
+
+def split_field(value):
+    return [item.strip() for item in value.split(',')] if value else []
+
+
+class TestRecipeStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = load_recipes('data/Recipes.csv')
+        with open(CSV_PATH, encoding='utf-8') as file:
+            cls.rows = list(csv.DictReader(file))
+
+    def test_recipes_match_csv_rows(self):
+        self.assertEqual(len(self.store), len(self.rows))
+        for recipe, row in zip(self.store, self.rows):
+            self.assertEqual(recipe, {
+                'id': row['id'],
+                'name': row['name'],
+                'ingredients': split_field(row['ingredients']) or '',
+                'steps': row['steps'],
+                'diet': split_field(row['diet']),
+                'meal_type': split_field(row['meal_type'])
+            })
+
+    def test_slicing_behaves_like_a_list(self):
+        self.assertEqual([r['id'] for r in self.store[:3]], [r['id'] for r in self.rows[:3]])
+        self.assertEqual([r['id'] for r in self.store[-10:0]], [])
+        self.assertEqual(self.store[-1]['id'], self.rows[-1]['id'])
+        with self.assertRaises(IndexError):
+            self.store[len(self.rows)]
+
+    def test_vocabularies_are_interned(self):
+        ingredients = {i for row in self.rows for i in split_field(row['ingredients'])}
+        self.assertEqual(set(self.store.ingredient_vocab.terms), ingredients)
+        self.assertEqual(len(self.store.ingredient_vocab), len(ingredients))
+
+    def test_vocabulary_keys_are_folded(self):
+        vocab = self.store.ingredient_vocab
+        self.assertEqual(vocab.keys(), [fold(term) for term in vocab.terms])
+
+    def test_concurrent_first_keys(self):
+        # Snapshot-loaded vocabularies start without keys, so concurrent requests fold them first
+        terms = [f"Ingredience {i}" for i in range(20_000)]
+        vocab = Vocabulary.from_terms(terms)
+        barrier = threading.Barrier(4)
+        threads = [threading.Thread(target=lambda: (barrier.wait(), vocab.keys())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(vocab.keys(), [fold(term) for term in terms])
+
+    def test_memory_usage_is_reported(self):
+        self.assertGreater(self.store.memory_usage(), 0)
+
+
+class TestFold(unittest.TestCase):
+    def test_case_and_diacritics_are_removed(self):
+        self.assertEqual(fold("Máslo"), "maslo")
+        self.assertEqual(fold("ŽLUTÝ MELOUN"), "zluty meloun")
+        self.assertEqual(fold("Kuřecí prsa"), fold("kureci PRSA"))
+        self.assertEqual(fold(fold("Čočka")), fold("Čočka"))
+
+    def test_tokens(self):
+        self.assertEqual(fold_tokens(fold("Smetana ke šlehání (min. 31%)")),
+                         ["smetana", "ke", "slehani", "min", "31"])
+
+
+if __name__ == '__main__':
+    unittest.main()
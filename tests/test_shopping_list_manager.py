@@ -0,0 +1,120 @@
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from shopping_list_manager import ShoppingListManager, ShoppingListRegistry
+
+
+class TestShoppingListManager(unittest.TestCase):
+    def test_list_stays_sorted_through_changes(self):
+        manager = ShoppingListManager()
+        for ingredient in ["Mléko", " Cibule ", "Chléb", "Cibule", "Žampiony", "Avokádo"]:
+            manager.add_ingredient(ingredient)
+        self.assertEqual(manager.get_list(), ["Avokádo", "Chléb", "Cibule", "Mléko", "Žampiony"])
+
+        manager.remove_ingredients(["Chléb", "Neexistuje", "Žampiony"])
+        self.assertEqual(manager.get_list(), ["Avokádo", "Cibule", "Mléko"])
+
+    def test_get_list_returns_a_copy(self):
+        manager = ShoppingListManager()
+        manager.add_ingredient("Sůl")
+        manager.get_list().append("Pepř")
+        self.assertEqual(manager.get_list(), ["Sůl"])
+
+    def test_concurrent_mutation(self):
+        manager = ShoppingListManager()
+        ingredients = [f"Ingredience {i:04d}" for i in range(2000)]
+
+        def add(chunk):
+            for ingredient in chunk:
+                manager.add_ingredient(ingredient)
+
+        def remove(chunk):
+            manager.remove_ingredients(chunk)
+
+        threads = [threading.Thread(target=add, args=(ingredients[i::8],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(manager.get_list(), ingredients)
+
+        threads = [threading.Thread(target=remove, args=(ingredients[i:1000:4],)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(manager.get_list(), ingredients[1000:])
+
+    def test_changes_since_is_the_net_change(self):
+        manager = ShoppingListManager()
+        manager.add_ingredients(["Mléko", "Cibule"])
+        revision = manager.revision()
+        manager.add_ingredients(["Sůl", "Pepř"])
+        manager.remove_ingredients(["Pepř", "Mléko"])
+        manager.add_ingredients(["Mléko"])
+        self.assertEqual(manager.changes_since(revision), {
+            "revision": revision + 3, "added": ["Sůl"], "removed": []
+        })
+        manager.clear_list()
+        self.assertEqual(manager.changes_since(revision), {
+            "revision": revision + 4, "added": [], "removed": ["Cibule", "Mléko"]
+        })
+        self.assertEqual(manager.changes_since(revision + 4), {"revision": revision + 4, "added": [], "removed": []})
+
+    def test_unknown_revision_resets(self):
+        manager = ShoppingListManager()
+        manager.add_ingredient("Sůl")
+        self.assertEqual(manager.changes_since(99), {"revision": 1, "reset": True, "shopping_list": ["Sůl"]})
+
+    def test_wait_for_change(self):
+        manager = ShoppingListManager()
+        self.assertEqual(manager.wait_for_change(0, 0.01), 0)
+        threading.Timer(0.05, manager.add_ingredient, args=("Sůl",)).start()
+        self.assertEqual(manager.wait_for_change(0, 10), 1)
+        # Timeouts that never expire or are already over return at once
+        self.assertEqual(manager.wait_for_change(1, float('nan')), 1)
+        self.assertEqual(manager.wait_for_change(1, -1), 1)
+
+
+class TestShoppingListRegistry(unittest.TestCase):
+    def test_sessions_are_isolated(self):
+        registry = ShoppingListRegistry()
+        registry.get("alice").add_ingredient("Mléko")
+        registry.get("bob").add_ingredient("Cibule")
+        self.assertEqual(registry.get("alice").get_list(), ["Mléko"])
+        self.assertEqual(registry.get("bob").get_list(), ["Cibule"])
+        self.assertIs(registry.get("alice"), registry.get("alice"))
+
+    def test_forgets_least_recent_sessions(self):
+        registry = ShoppingListRegistry(max_sessions=2)
+        alice = registry.get("alice")
+        alice.add_ingredient("Mléko")
+        registry.get("bob")
+        registry.get("carol")
+        self.assertEqual(len(registry), 2)
+        # The list outlives its manager
+        self.assertIsNot(registry.get("alice"), alice)
+        self.assertEqual(registry.get("alice").get_list(), ["Mléko"])
+
+    def test_reads_create_no_state(self):
+        registry = ShoppingListRegistry()
+        shopping_list = registry.get("reader")
+        self.assertEqual(shopping_list.get_list(), [])
+        self.assertEqual(shopping_list.revision(), 0)
+        self.assertEqual(shopping_list.changes_since(0), {"revision": 0, "added": [], "removed": []})
+        self.assertTrue(shopping_list.changes_since(3)["reset"])
+        self.assertEqual(len(registry.backend._lists), 0)
+
+    def test_session_id_validation(self):
+        self.assertTrue(ShoppingListRegistry.is_valid_session_id("conversation-42_a.b"))
+        self.assertFalse(ShoppingListRegistry.is_valid_session_id(""))
+        self.assertFalse(ShoppingListRegistry.is_valid_session_id("a/b"))
+        self.assertFalse(ShoppingListRegistry.is_valid_session_id("x" * 129))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+from recipe_loader import load_recipes
+from recipe_index import RecipeIndex
+from snapshot import SnapshotError, file_sha256, read_snapshot, write_snapshot
+
+CSV_PATH = Path(__file__).parent.parent / 'data' / 'Recipes.csv'
+
+QUERIES = [
+    {"diet": "vegetarian"},
+    {"meal_type": "polévka", "name": "a"},
+    {"name": "guláš"},
+    {"includes_ingredients": ["cibule", "máslo"], "excludes_ingredients": ["mléko"]},
+    {"excludes_ingredients": []},
+]
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temp_dir, 'Recipes.csv')
+        shutil.copy(CSV_PATH, self.csv_path)
+        self.snapshot_path = os.path.join(self.temp_dir, 'Recipes.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_round_trip(self):
+        store = load_recipes(self.csv_path)
+        index = RecipeIndex.build(store)
+        write_snapshot(self.snapshot_path, store, index, b'\0' * 32)
+
+        mapped_store, mapped_index, meta = read_snapshot(self.snapshot_path)
+        self.assertEqual(list(mapped_store), list(store))
+        self.assertEqual(mapped_store.ingredient_vocab.terms, store.ingredient_vocab.terms)
+        for query in QUERIES:
+            self.assertEqual(mapped_index.search(**query), index.search(**query), query)
+
+    def test_stale_snapshot_is_rejected(self):
+        store = load_recipes(self.csv_path)
+        write_snapshot(self.snapshot_path, store, RecipeIndex.build(store), file_sha256(self.csv_path))
+        with open(self.csv_path, 'a', encoding='utf-8') as file:
+            file.write('\n999,Testovací recept,"Sůl, Pepř",Uvaříme.,vegan,polévka')
+
+        with self.assertRaises(SnapshotError):
+            read_snapshot(self.snapshot_path, expected_digest=file_sha256(self.csv_path))
+
+    def test_rejects_foreign_file(self):
+        with open(self.snapshot_path, 'wb') as file:
+            file.write(b'not a snapshot at all, just some bytes')
+        with self.assertRaises(SnapshotError):
+            read_snapshot(self.snapshot_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
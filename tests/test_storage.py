@@ -0,0 +1,161 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'shopping_list_mcp_server'))
+
+import storage
+from storage import InMemoryBackend, SQLiteBackend
+
+
+class BackendContract:
+    """Behaviour every shopping list backend must provide."""
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend = self.make_backend()
+
+    def tearDown(self):
+        self.backend.close()
+
+    def test_add_returns_only_new_items_and_keeps_order(self):
+        self.assertEqual(self.backend.add('s', ["Mléko", "Cibule", "Mléko"]), ["Mléko", "Cibule"])
+        self.assertEqual(self.backend.add('s', ["Cibule", "Avokádo"]), ["Avokádo"])
+        self.assertEqual(self.backend.items('s'), sorted(["Mléko", "Cibule", "Avokádo"]))
+
+    def test_remove_and_clear(self):
+        self.backend.add('s', ["Mléko", "Cibule", "Žampiony"])
+        self.assertEqual(self.backend.remove('s', ["Cibule", "Neexistuje"]), ["Cibule"])
+        self.assertEqual(self.backend.items('s'), ["Mléko", "Žampiony"])
+        self.backend.clear('s')
+        self.assertEqual(self.backend.items('s'), [])
+
+    def test_sessions_are_isolated(self):
+        self.backend.add('a', ["Mléko"])
+        self.backend.add('b', ["Cibule"])
+        self.assertEqual(self.backend.items('a'), ["Mléko"])
+        self.assertEqual(self.backend.items('b'), ["Cibule"])
+
+    def test_sort_order_matches_python(self):
+        items = ["Šunka", "sůl", "Sůl", "Avokádo", "Česnek", "Zelí", "éčko", "10 vajec"]
+        self.backend.add('s', items)
+        self.assertEqual(self.backend.items('s'), sorted(items))
+
+    def test_changes_are_logged_by_revision(self):
+        self.assertEqual(self.backend.revision('s'), 0)
+        self.assertEqual(self.backend.changes('s', 0), (0, []))
+        self.backend.add('s', ["Mléko", "Cibule"])
+        # Writes changing nothing keep the revision
+        self.backend.add('s', ["Mléko"])
+        self.backend.remove('s', ["Neexistuje"])
+        self.backend.remove('s', ["Mléko"])
+        self.backend.clear('s')
+        self.backend.clear('s')
+        self.assertEqual(self.backend.revision('s'), 3)
+
+        revision, changes = self.backend.changes('s', 0)
+        self.assertEqual(revision, 3)
+        self.assertEqual(
+            [(change_revision, operation, sorted(items)) for change_revision, operation, items in changes],
+            [(1, 'add', ["Cibule", "Mléko"]), (2, 'remove', ["Mléko"]), (3, 'remove', ["Cibule"])]
+        )
+        self.assertEqual([change[0] for change in self.backend.changes('s', 2)[1]], [3])
+        self.assertEqual(self.backend.changes('s', 3), (3, []))
+        # A revision the list never had
+        self.assertEqual(self.backend.changes('s', 7), (3, None))
+        self.assertEqual(self.backend.revision('other'), 0)
+
+    def test_change_log_is_bounded(self):
+        size = storage.CHANGE_LOG_SIZE
+        storage.CHANGE_LOG_SIZE = 3
+        try:
+            for number in range(5):
+                self.backend.add('s', [f"Položka {number}"])
+        finally:
+            storage.CHANGE_LOG_SIZE = size
+        self.assertEqual(self.backend.changes('s', 1), (5, None))
+        self.assertEqual([change[0] for change in self.backend.changes('s', 2)[1]], [3, 4, 5])
+
+    def test_concurrent_writes(self):
+        items = [f"Ingredience {i:04d}" for i in range(400)]
+        threads = [threading.Thread(target=lambda chunk: [self.backend.add('s', [i]) for i in chunk],
+                                    args=(items[i::8],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.backend.items('s'), items)
+
+    def test_failed_write_keeps_backend_usable(self):
+        # A lone surrogate is valid JSON but can't be encoded as UTF-8
+        try:
+            self.backend.add('s', ["\ud800"])
+        except UnicodeEncodeError:
+            pass
+        result = []
+        writer = threading.Thread(target=lambda: result.append(self.backend.add('s', ["Mléko"])), daemon=True)
+        writer.start()
+        writer.join(5)
+        self.assertEqual(result, [["Mléko"]])
+        self.assertIn("Mléko", self.backend.items('s'))
+
+
+class TestInMemoryBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        return InMemoryBackend()
+
+
+class TestSQLiteBackend(BackendContract, unittest.TestCase):
+    def make_backend(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'lists.db')
+        return SQLiteBackend(self.path)
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.temp_dir)
+
+    def test_state_survives_restart(self):
+        self.backend.add('s', ["Mléko", "Cibule"])
+        self.backend.close()
+        self.backend = SQLiteBackend(self.path)
+        self.assertEqual(self.backend.items('s'), ["Cibule", "Mléko"])
+
+    def test_writes_are_visible_to_other_workers(self):
+        other = SQLiteBackend(self.path)
+        try:
+            self.backend.add('s', ["Mléko"])
+            self.assertEqual(other.items('s'), ["Mléko"])
+            other.remove('s', ["Mléko"])
+            self.assertEqual(self.backend.items('s'), [])
+        finally:
+            other.close()
+
+    def test_failed_write_leaves_its_group_committed(self):
+        batch = [storage._PendingWrite('add', 's', ["Mléko"]),
+                 storage._PendingWrite('add', 'other', ["\ud800"]),
+                 storage._PendingWrite('add', 's', ["Cibule"])]
+        connection = self.backend._connect()
+        try:
+            self.backend._commit(connection, batch)
+        finally:
+            connection.close()
+        self.assertEqual([write.result for write in batch], [["Mléko"], None, ["Cibule"]])
+        self.assertEqual([type(write.error) for write in batch], [type(None), UnicodeEncodeError, type(None)])
+        self.assertEqual(self.backend.items('s'), ["Cibule", "Mléko"])
+        self.assertEqual(self.backend.revision('other'), 0)
+
+    def test_concurrent_writes_are_group_committed(self):
+        self.test_concurrent_writes()
+        self.assertEqual(self.backend.writes, 400)
+        self.assertLessEqual(self.backend.commits, self.backend.writes)
+
+
+if __name__ == '__main__':
+    unittest.main()